@@ -7,6 +7,9 @@ todo: Some bugs to be fixed
 """
 
 
+import asyncio
+import multiprocessing
+import os
 import pathlib
 import sys
 
@@ -16,10 +19,12 @@ sys.path.append("..\\..")
 import typing as t
 import dataclasses
 import pyarrow as pa
+import pyarrow.dataset as pds
 import tensorflow.keras as tk
 import numpy as np
 import pandas as pd
 import time
+import threading
 import enum
 from toolcraft import settings
 from toolcraft import marshalling as m
@@ -29,6 +34,8 @@ from toolcraft import util
 settings.DEBUG_HASHABLE_STATE = False
 
 _TEMP_PATH = pathlib.Path("storage_temp")
+# shared by StoreFields that cache reads
+_READ_CACHE = s.DfFileReadCache(max_bytes=4 * 1024 * 1024)
 
 
 class NewEnum(m.FrozenEnum, enum.Enum):
@@ -311,7 +318,8 @@ class TestStorage(m.HashableClass):
     # noinspection PyUnusedLocal
     @s.StoreField(partition_cols=["a", "b"])
     def store_with_partition_cols(
-        self, mode: s.MODE_TYPE, a: int, b: int, filters: s.FILTERS_TYPE = None
+        self, mode: s.MODE_TYPE, a: int, b: int, filters: s.FILTERS_TYPE = None,
+        mode_options: t.Dict[str, t.Any] = None,
     ) -> pa.Table:
         return self.data_vector("pandas_dataframe_with_partition_cols", a, b)
 
@@ -352,6 +360,201 @@ class TestStorage(m.HashableClass):
                "list": [_ for _ in result]
             }
         )
+    @staticmethod
+    def data_for_file_formats(epoch: int) -> pa.Table:
+        return pa.table(
+            data={
+                'epoch': [epoch] * 100000,
+                'label': np.arange(100000) % 10,
+                'loss': np.zeros(100000),
+            }
+        )
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(partition_cols=['epoch'])
+    def store_ipc(self, mode: s.MODE_TYPE, epoch: int) -> pa.Table:
+        return self.data_for_file_formats(epoch)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        partition_cols=['epoch'],
+        file_format=s.DfFileFormat(name='ipc', compression='lz4'),
+    )
+    def store_ipc_lz4(self, mode: s.MODE_TYPE, epoch: int) -> pa.Table:
+        return self.data_for_file_formats(epoch)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        partition_cols=['epoch'],
+        file_format=s.DfFileFormat(
+            name='parquet', compression='zstd', row_group_size=10000,
+            use_dictionary=True,
+        )
+    )
+    def store_parquet(self, mode: s.MODE_TYPE, epoch: int) -> pa.Table:
+        return self.data_for_file_formats(epoch)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(partition_cols=['epoch'])
+    def store_for_streaming(
+        self, mode: s.MODE_TYPE, epoch: int,
+        filters: s.FILTERS_TYPE = None,
+        columns: t.List[str] = None,
+        mode_options: t.Dict[str, t.Any] = None,
+    ) -> pa.Table:
+        return self.data_for_file_formats(epoch)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField()
+    def store_steps(
+        self, mode: s.MODE_TYPE, step: int = None,
+        filters: s.FILTERS_TYPE = None,
+        mode_options: t.Dict[str, t.Any] = None,
+    ) -> pa.Table:
+        return pa.table(
+            data={
+                'step': np.full(100000, step),
+                'loss': np.random.uniform(size=100000) / (step + 1),
+            }
+        )
+
+    @staticmethod
+    def steps_generator(
+        num_steps: int, fail_at: t.Optional[int]
+    ) -> t.Iterator[pa.Table]:
+        for _step in range(num_steps):
+            if _step == fail_at:
+                raise ValueError(f"failed at step {_step}")
+            yield pa.table(
+                data={'step': [_step], 'loss': [1.0 / (_step + 1)]}
+            )
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(yields=True)
+    def store_yield_unbuffered(
+        self, mode: s.MODE_TYPE, num_steps: int,
+        fail_at: t.Optional[int] = None,
+    ) -> pa.Table:
+        yield from self.steps_generator(num_steps, fail_at)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        yields=True, write_buffer=s.DfFileWriteBuffer(max_rows=100),
+    )
+    def store_yield_buffered(
+        self, mode: s.MODE_TYPE, num_steps: int,
+        fail_at: t.Optional[int] = None,
+    ) -> pa.Table:
+        yield from self.steps_generator(num_steps, fail_at)
+
+    @staticmethod
+    def tables_generator(
+        num_tables: int, fail_at: t.Optional[int]
+    ) -> t.Iterator[pa.Table]:
+        for _i in range(num_tables):
+            if _i == fail_at:
+                raise ValueError(f"failed at table {_i}")
+            # some cpu work
+            _rng = np.random.default_rng(_i)
+            _x = np.sort(_rng.uniform(size=200000))
+            yield pa.table(
+                data={'i': np.full(len(_x), _i), 'x': _x, 'y': np.cumsum(_x)}
+            )
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        yields=True,
+        file_format=s.DfFileFormat(name='parquet', compression='zstd'),
+    )
+    def store_yield_serial(
+        self, mode: s.MODE_TYPE, num_tables: int,
+        fail_at: t.Optional[int] = None,
+    ) -> pa.Table:
+        yield from self.tables_generator(num_tables, fail_at)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        yields=True,
+        file_format=s.DfFileFormat(name='parquet', compression='zstd'),
+        write_pipeline=s.DfFileWritePipeline(workers=4, max_pending=8),
+    )
+    def store_yield_pipelined(
+        self, mode: s.MODE_TYPE, num_tables: int,
+        fail_at: t.Optional[int] = None,
+    ) -> pa.Table:
+        yield from self.tables_generator(num_tables, fail_at)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        partition_cols=['epoch'],
+        compaction_policy=s.DfFileCompactionPolicy(
+            max_files=4, small_file_size=1024 * 1024,
+            target_file_size=1024 * 1024,
+        ),
+    )
+    def store_compacted(
+        self, mode: s.MODE_TYPE, epoch: int, step: int = 0,
+        columns: t.List[str] = None,
+        mode_options: t.Dict[str, t.Any] = None,
+    ) -> pa.Table:
+        return pa.table(
+            data={
+                'epoch': [epoch] * 10,
+                'step': [step] * 10,
+                'value': np.arange(10) + step * 10,
+            }
+        )
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(partition_cols=['epoch'], read_cache=_READ_CACHE)
+    def store_cached(
+        self, mode: s.MODE_TYPE, epoch: int = None,
+        filters: s.FILTERS_TYPE = None,
+        columns: t.List[str] = None,
+    ) -> pa.Table:
+        return self.data_for_file_formats(epoch)
+
+    @staticmethod
+    def metrics(epoch: int, step: int) -> pa.Table:
+        return pa.table(
+            data={
+                'epoch': [epoch], 'step': [step], 'loss': [1.0 / (step + 1)],
+            }
+        )
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(partition_cols=['epoch'])
+    def store_metrics(
+        self, mode: s.MODE_TYPE, epoch: int, step: int = 0,
+        filters: s.FILTERS_TYPE = None,
+    ) -> pa.Table:
+        return self.metrics(epoch, step)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        partition_cols=['epoch'],
+        streamed_write=s.DfFileStreamedWrite(max_file_size=16 * 1024),
+    )
+    def store_metrics_streamed(
+        self, mode: s.MODE_TYPE, epoch: int, step: int = 0
+    ) -> pa.Table:
+        return self.metrics(epoch, step)
+
+    @staticmethod
+    def images(num_images: int) -> np.ndarray:
+        return np.random.RandomState(num_images).randint(
+            0, 256, size=(num_images, 3, 32, 32)
+        ).astype(np.uint8)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField()
+    def store_images(self, mode: s.MODE_TYPE, num_images: int) -> pa.Table:
+        _images = self.images(num_images)
+        return pa.Table.from_arrays(
+            [util.np_to_pa(_images)],
+            schema=pa.schema([util.np_to_pa_field("image", _images)]),
+        )
+
 
 def try_arrow_storage():
     ts = TestStorage(1, 2.0)
@@ -745,6 +948,899 @@ def try_arrow_storage():
     print("ts.store_fields_folder.delete()")
 
 
+def try_scans_per_call():
+    """
+    Regression benchmark that counts the scans done on disk per call to
+    StoreField. Read related modes must scan the disk only once.
+    """
+    ts = TestStorage(3, 4.0)
+    _num_calls = 20
+
+    r = ts.store_with_partition_cols(mode='w', a=1, b=22)
+    assert r
+    _df_file = ts.store_fields_folder.items[
+        "store_with_partition_cols"]  # type: s.DfFile
+
+    for _mode, _kwargs in [
+        ('r', {}), ('r', dict(a=1, b=22)), ('rw', dict(a=1, b=22)),
+        ('e', dict(a=1, b=22)),
+    ]:
+        _scans_before = _df_file.internal.scan_count
+        _start = time.time()
+        for _ in range(_num_calls):
+            ts.store_with_partition_cols(mode=_mode, **_kwargs)
+        _time_taken = (time.time() - _start) / _num_calls
+        _scans_per_call = \
+            (_df_file.internal.scan_count - _scans_before) / _num_calls
+        print(
+            f"mode={_mode!r} kwargs={_kwargs}: {_scans_per_call} scans per "
+            f"call and {_time_taken * 1000.:.3f} ms per call"
+        )
+        assert _scans_per_call <= 1, "read path must scan disk only once"
+
+    r = ts.store_with_partition_cols(mode='d')
+    assert r
+    ts.store_fields_folder.delete()
+
+
+def try_file_formats():
+    ts = TestStorage(5, 6.0)
+    for _name in ["store_ipc", "store_ipc_lz4", "store_parquet"]:
+        _method = getattr(ts, _name)
+        for _epoch in range(3):
+            assert _method(mode='w', epoch=_epoch)
+        _df_file = ts.store_fields_folder.items[_name]  # type: s.DfFile
+        _size = sum(
+            _.stat().st_size for _ in _df_file.path.glob("**/*")
+            if _.is_file()
+        )
+        r = _method(mode='r', epoch=1)
+        assert r == ts.data_for_file_formats(1)
+        print(f"{_name}: {_size / 1024:.2f} KB on disk")
+        assert _method(mode='d')
+    ts.store_fields_folder.delete()
+
+
+def try_compaction():
+    ts = TestStorage(5, 6.0)
+    for _step in range(20):
+        for _epoch in range(2):
+            assert ts.store_compacted(mode='a', epoch=_epoch, step=_step)
+        # readers always see all the rows appended so far in order even
+        # when compaction is happening in background
+        r = ts.store_compacted(mode='r', epoch=0, step=_step)
+        assert r['step'].to_pylist() == sum(
+            [[_] * 10 for _ in range(_step + 1)], []
+        )
+    _df_file = ts.store_fields_folder.items[
+        'store_compacted']  # type: s.DfFile
+    _df_file.wait_for_compaction()
+    for _dir in _df_file.path.iterdir():
+        if _dir.is_dir():
+            print(f"{_dir.name}: {len(list(_dir.iterdir()))} files")
+    # compact everything in single file per partition
+    _df_file.compact()
+    for _epoch in range(2):
+        _dir = _df_file.path / str(_epoch)
+        assert len(list(_dir.iterdir())) == 1
+        r = ts.store_compacted(mode='r', epoch=_epoch, step=0)
+        assert r['value'].to_pylist() == list(range(200))
+    assert ts.store_compacted(mode='d', epoch=0, step=0)
+    ts.store_fields_folder.delete()
+
+
+def try_stream_mode():
+    ts = TestStorage(5, 6.0)
+    for _epoch in range(3):
+        assert ts.store_for_streaming(mode='w', epoch=_epoch)
+    for _readahead in [0, 2]:
+        _iterator = ts.store_for_streaming(
+            mode='s', columns=['label', 'epoch'],
+            filters=[('label', '>', 4)],
+            mode_options={'batch_size': 1000, 'readahead': _readahead},
+        )
+        _rows = 0
+        for _batch in _iterator:
+            assert isinstance(_batch, pa.RecordBatch)
+            assert _batch.num_rows <= 1000
+            assert _batch.schema.names == ['label', 'epoch']
+            _rows += _batch.num_rows
+        assert _rows == 3 * 50000
+    # consumer can stop early ... lock and readahead thread are released
+    _iterator = ts.store_for_streaming(
+        mode='s', mode_options={'batch_size': 10}
+    )
+    assert next(_iterator).num_rows == 10
+    _iterator.close()
+    assert ts.store_for_streaming(mode='d')
+    # nothing on disk means empty iterator
+    assert list(ts.store_for_streaming(mode='s')) == []
+    ts.store_fields_folder.delete()
+
+
+def try_manifest():
+    ts = TestStorage(5, 6.0)
+    for _epoch in range(50):
+        assert ts.store_for_streaming(mode='w', epoch=_epoch)
+    _df_file = ts.store_fields_folder.items[
+        'store_for_streaming']  # type: s.DfFile
+
+    # compare reads with cached manifest and manifest parsed from scratch
+    for _cached in [False, True]:
+        _start = time.time()
+        for _ in range(20):
+            if not _cached:
+                _df_file.internal.manifest = None
+            r = ts.store_for_streaming(mode='r', epoch=7, columns=['label'])
+            assert len(r) == 100000
+        print(f"cached={_cached}: {(time.time() - _start) / 20 * 1000:.2f} "
+              f"ms per read")
+
+    # appends and deletes are recorded in manifest
+    assert ts.store_for_streaming(mode='a', epoch=7)
+    assert len(ts.store_for_streaming(mode='r', epoch=7)) == 200000
+    assert ts.store_for_streaming(mode='d', epoch=7)
+    assert not ts.store_for_streaming(mode='e', epoch=7)
+    assert not (_df_file.path / "7").exists()
+    assert len(ts.store_for_streaming(mode='r')) == 49 * 100000
+
+    # file copied by hand is not known until manifest is rebuilt
+    _table = ts.data_for_file_formats(3).drop(['epoch'])
+    with pa.OSFile((_df_file.path / "3" / f"{time.time_ns()}.0").as_posix(),
+                   'wb') as _sink:
+        with pa.ipc.new_file(_sink, _table.schema) as _writer:
+            _writer.write_table(_table)
+    assert len(ts.store_for_streaming(mode='r', epoch=3)) == 100000
+    assert _df_file.rebuild_manifest() == 50
+    assert len(ts.store_for_streaming(mode='r', epoch=3)) == 200000
+
+    # missing manifest is rebuilt on first access
+    (_df_file.path / "_manifest").unlink()
+    assert len(ts.store_for_streaming(mode='r')) == 50 * 100000
+    ts.store_fields_folder.delete()
+
+
+def try_stats_pruning():
+    ts = TestStorage(5, 6.0)
+    for _step in range(100):
+        assert ts.store_steps(mode='a', step=_step)
+
+    # selective filter on non partition column only opens few files
+    for _filters in [
+        [('step', '>=', 95)],
+        [('loss', '>', 0.5)],
+        [('step', '>=', 95), ('loss', '<', 0.001)],
+    ]:
+        _start = time.time()
+        r = ts.store_steps(mode='r', filters=_filters)
+        print(f"{_filters}: {len(r)} rows in "
+              f"{(time.time() - _start) * 1000:.2f} ms")
+    assert len(ts.store_steps(mode='r', filters=[('step', '>=', 95)])) == \
+        5 * 100000
+    assert ts.store_steps(mode='e', filters=[('step', '=', 99)])
+    assert not ts.store_steps(mode='e', filters=[('step', '>', 99)])
+    assert not ts.store_steps(mode='e', filters=[('loss', '>', 1.0)])
+    ts.store_fields_folder.delete()
+
+
+def try_write_buffer():
+    ts = TestStorage(5, 6.0)
+    for _name in ['store_yield_unbuffered', 'store_yield_buffered']:
+        _method = getattr(ts, _name)
+        _start = time.time()
+        assert _method(mode='a', num_steps=1000)
+        _time = time.time() - _start
+        _df_file = ts.store_fields_folder.items[_name]  # type: s.DfFile
+        _files = len(
+            [_ for _ in _df_file.path.iterdir() if not _.name.startswith("_")]
+        )
+        print(f"{_name}: {_files} files written in {_time * 1000:.2f} ms")
+        assert _method(mode='r', num_steps=0)['step'].to_pylist() == \
+            list(range(1000))
+        # everything yielded before exception is on disk
+        try:
+            _method(mode='a', num_steps=1000, fail_at=250)
+        except ValueError:
+            ...
+        assert len(_method(mode='r', num_steps=0)) == 1250
+    ts.store_fields_folder.delete()
+
+
+def try_write_pipeline():
+    ts = TestStorage(5, 6.0)
+    _results = []
+    for _name in ['store_yield_serial', 'store_yield_pipelined']:
+        _method = getattr(ts, _name)
+        _start = time.time()
+        assert _method(mode='a', num_tables=40)
+        print(f"{_name}: {(time.time() - _start) * 1000:.2f} ms")
+        # everything yielded before exception is on disk
+        try:
+            _method(mode='a', num_tables=40, fail_at=10)
+        except ValueError:
+            ...
+        _results.append(_method(mode='r', num_tables=0))
+    assert len(_results[0]) == 50 * 200000
+    # same rows in same order
+    assert _results[0] == _results[1]
+    ts.store_fields_folder.delete()
+
+
+def try_streamed_write():
+    ts = TestStorage(5, 6.0)
+    for _name in ['store_metrics', 'store_metrics_streamed']:
+        _method = getattr(ts, _name)
+        _start = time.time()
+        with ts():
+            for _epoch in range(2):
+                for _step in range(500):
+                    assert _method(mode='a', epoch=_epoch, step=_step)
+            # streamed rows are visible only after with context exits (or
+            # when file is rotated)
+            if _name == 'store_metrics_streamed':
+                assert len(_method(mode='r', epoch=0)) < 500
+        _time = time.time() - _start
+        _df_file = ts.store_fields_folder.items[_name]  # type: s.DfFile
+        _files = len(
+            [
+                _ for _ in _df_file.path.glob("*/*")
+                if not _.name.startswith("_")
+            ]
+        )
+        print(f"{_name}: {_files} files written in {_time * 1000:.2f} ms")
+        for _epoch in range(2):
+            assert _method(mode='r', epoch=_epoch)['step'].to_pylist() == \
+                list(range(500))
+    # outside with context it is usual append
+    assert ts.store_metrics_streamed(mode='a', epoch=0, step=500)
+    assert len(ts.store_metrics_streamed(mode='r', epoch=0)) == 501
+    ts.store_fields_folder.delete()
+
+
+def try_read_since():
+    ts = TestStorage(5, 6.0)
+    _watermark, _steps, _rows_read = 0, [], 0
+    for _step in range(20):
+        for _epoch in range(2):
+            assert ts.store_compacted(mode='a', epoch=_epoch, step=_step)
+        _df_file = ts.store_fields_folder.items[
+            'store_compacted']  # type: s.DfFile
+        # compaction merges files that were already read with new files
+        if _step % 2 == 1:
+            _df_file.wait_for_compaction()
+        # poll only new rows like dashboards do
+        _table, _watermark = _df_file.read_since(
+            _watermark, columns=['step'],
+            filter_expression=pds.field('epoch') == 0,
+            filters=[('epoch', '=', 0)],
+        )
+        _rows_read += len(_table)
+        _steps += _table['step'].to_pylist()
+        assert _steps == sum([[_] * 10 for _ in range(_step + 1)], [])
+    # nothing new
+    _table, _new_watermark = _df_file.read_since(_watermark)
+    assert len(_table) == 0 and _new_watermark == _watermark
+    # same via StoreField mode
+    _table, _new_watermark = ts.store_compacted(
+        mode='rs', epoch=1, columns=['step'], mode_options={'watermark': 0})
+    assert _new_watermark == _watermark
+    assert sorted(_table['step'].to_pylist()) == sorted(_steps)
+    print(f"read_since: {_rows_read} rows read while polling 20 times")
+    ts.store_fields_folder.delete()
+
+
+def try_aggregate():
+    ts = TestStorage(5, 6.0)
+    for _step in range(20):
+        assert ts.store_steps(mode='a', step=_step)
+    _aggregations = {
+        'loss_mean': ('loss', 'mean'), 'loss_min': ('loss', 'min'),
+        'loss_max': ('loss', 'max'), 'rows': ('loss', 'count'),
+    }
+    # expected from full read
+    _df = ts.store_steps(mode='r').to_pandas().groupby('step')['loss'].agg(
+        ['mean', 'min', 'max', 'count'])
+    for _threads in [1, 4]:
+        _start = time.time()
+        r = ts.store_steps(
+            mode='agg', filters=[('step', '>=', 10)],
+            mode_options={
+                'group_by': ['step'], 'aggregations': _aggregations,
+                'threads': _threads, 'batch_size': 10000,
+            },
+        )
+        print(f"aggregate with {_threads} threads: "
+              f"{(time.time() - _start) * 1000:.2f} ms")
+        assert r['step'].to_pylist() == list(range(10, 20))
+        assert r['rows'].to_pylist() == [100000] * 10
+        assert np.allclose(
+            r['loss_mean'].to_numpy(), _df['mean'].to_numpy()[10:])
+        assert r['loss_min'].to_pylist() == _df['min'].tolist()[10:]
+        assert r['loss_max'].to_pylist() == _df['max'].tolist()[10:]
+    # without group_by there is always one row
+    r = ts.store_steps(
+        mode='agg', filters=[('step', '>', 99)],
+        mode_options={'aggregations': {'rows': ('loss', 'count')}},
+    )
+    assert r.to_pydict() == {'rows': [0]}
+    ts.store_fields_folder.delete()
+
+
+def try_read_cache():
+    ts = TestStorage(5, 6.0)
+    for _epoch in range(3):
+        assert ts.store_cached(mode='a', epoch=_epoch)
+    _df_file = ts.store_fields_folder.items['store_cached']  # type: s.DfFile
+    _READ_CACHE.clear()
+    _stats = _READ_CACHE.stats
+    # same read ... note that order of filters does not matter
+    _scan_count = _df_file.internal.scan_count
+    r1 = ts.store_cached(
+        mode='r', filters=[('label', '>', 4), ('epoch', 'in', [0, 1])])
+    r2 = ts.store_cached(
+        mode='r', filters=[('epoch', 'in', [1, 0]), ('label', '>', 4)])
+    assert r1 == r2 and len(r1) == 100000
+    assert _df_file.internal.scan_count == _scan_count + 1
+    assert _READ_CACHE.stats['hits'] == _stats['hits'] + 1
+    # append invalidates entries of this DfFile only
+    assert ts.store_cached(mode='a', epoch=0)
+    r3 = ts.store_cached(
+        mode='r', filters=[('label', '>', 4), ('epoch', 'in', [0, 1])])
+    assert len(r3) == 150000
+    assert _df_file.internal.scan_count == _scan_count + 2
+    # memory is bounded
+    for _epoch in range(3):
+        ts.store_cached(mode='r', epoch=_epoch)
+    print(f"read cache stats: {_READ_CACHE.stats}")
+    assert _READ_CACHE.stats['bytes'] <= _READ_CACHE.max_bytes
+    assert _READ_CACHE.stats['evictions'] > 0
+    ts.store_fields_folder.delete()
+
+
+def try_read_store_field():
+    # hashables of a sweep
+    _sweep = [TestStorage(_i, 0.1) for _i in range(30)]
+    for _ts in _sweep:
+        for _epoch in range(2):
+            for _step in range(5):
+                _ts.store_metrics(mode='a', epoch=_epoch, step=_step)
+    # one call per hashable
+    _start = time.time()
+    _tables = [
+        _ts.store_metrics(mode='r', filters=[('step', '>=', 3)])
+        for _ts in _sweep
+    ]
+    print(f"read per hashable: {(time.time() - _start) * 1000:.2f} ms")
+    # one scan for all
+    _start = time.time()
+    r = s.read_store_field(
+        hashables=_sweep, store_field_name='store_metrics',
+        filters=[('step', '>=', 3)],
+    )
+    print(f"read_store_field: {(time.time() - _start) * 1000:.2f} ms")
+    assert r.drop(['owner']) == pa.concat_tables(_tables)
+    assert r['owner'].to_pylist() == sum(
+        [[_ts.name] * len(_t) for _ts, _t in zip(_sweep, _tables)], []
+    )
+    # owner column can be used in filters
+    r = s.read_store_field(
+        hashables=_sweep, store_field_name='store_metrics',
+        columns=['owner', 'loss'],
+        filters=[('owner', '=', _sweep[3].name), ('epoch', '=', 1)],
+    )
+    assert r.column_names == ['owner', 'loss'] and len(r) == 5
+    for _ts in _sweep:
+        _ts.store_fields_folder.delete()
+
+
+def try_delete_rows():
+    ts = TestStorage(5, 6.0)
+    for _epoch in range(2):
+        for _step in range(40):
+            assert ts.store_metrics(mode='a', epoch=_epoch, step=_step)
+    _df_file = ts.store_fields_folder.items['store_metrics']  # type: s.DfFile
+    # merge steps 0-19 and 20-39 of each epoch in separate files
+    _df_file.compact(target_file_size=16 * 1024, small_file_size=1024 * 1024)
+
+    def _files() -> t.Set[str]:
+        return {
+            _.name for _ in _df_file.path.glob("*/*")
+            if not _.name.startswith("_")
+        }
+
+    def _steps(epoch: int) -> t.List[int]:
+        return ts.store_metrics(mode='r', epoch=epoch)['step'].to_pylist()
+
+    # delete rows on non partition column ... files that cannot match as
+    # per stats are not touched
+    _files_before = _files()
+    _start = time.time()
+    assert ts.store_metrics(mode='d', filters=[('step', '>=', 35)])
+    print(f"delete rows: {(time.time() - _start) * 1000:.2f} ms")
+    _files_after = _files()
+    print(
+        f"delete rows: rewrote {len(_files_before - _files_after)} of "
+        f"{len(_files_before)} files"
+    )
+    assert len(_files_before & _files_after) > 0
+    assert _steps(0) == _steps(1) == list(range(35))
+    # nothing more to delete
+    assert not ts.store_metrics(mode='d', filters=[('step', '>=', 35)])
+
+    # DNF filters with partition columns
+    assert ts.store_metrics(
+        mode='d',
+        filters=[
+            [('epoch', '=', 0), ('step', '<', 3)],
+            [('epoch', '=', 1), ('step', 'in', [7, 8])],
+        ]
+    )
+    assert _steps(0) == list(range(3, 35))
+    assert _steps(1) == [_ for _ in range(35) if _ not in [7, 8]]
+    # partition kwarg is `and`ed with DNF filters
+    assert ts.store_metrics(
+        mode='d', epoch=1, filters=[[('step', '=', 0)], [('step', '=', 1)]],
+    )
+    assert _steps(0) == list(range(3, 35))
+    assert _steps(1) == [_ for _ in range(2, 35) if _ not in [7, 8]]
+
+    # deleting all rows of file removes the file and manifest still agrees
+    # with files on disk (i.e. files replaced by rewritten files are gone)
+    assert ts.store_metrics(mode='d', filters=[('loss', '>', 0.0)])
+    assert not ts.store_metrics(mode='e')
+    assert _df_file.rebuild_manifest() == 0
+    ts.store_fields_folder.delete()
+
+
+def try_parallel_delete():
+    ts = TestStorage(5, 6.0)
+    for _threads in [1, 8]:
+        for _a in range(10):
+            for _b in range(30):
+                assert ts.store_with_partition_cols(mode='w', a=_a, b=_b)
+        # dry run reports files without deleting them
+        _files = ts.store_with_partition_cols(
+            mode='d', filters=[('b', '>', 10)],
+            mode_options={'dry_run': True, 'threads': _threads},
+        )
+        assert len(_files) == 10 * 19
+        assert len(ts.store_with_partition_cols(mode='r')) == 10 * 30 * 4
+        # delete all epochs > 10 across all seeds
+        _start = time.time()
+        assert ts.store_with_partition_cols(
+            mode='d', filters=[('b', '>', 10)],
+            mode_options={'threads': _threads},
+        )
+        print(
+            f"threads={_threads}: deleted {len(_files)} partitions in "
+            f"{(time.time() - _start) * 1000:.2f} ms"
+        )
+        assert len(ts.store_with_partition_cols(mode='r')) == 10 * 11 * 4
+        assert not ts.store_with_partition_cols(
+            mode='e', filters=[('b', '>', 10)])
+        # empty partition folders are removed
+        _df_file = ts.store_fields_folder.items[
+            'store_with_partition_cols']  # type: s.DfFile
+        assert len(list(_df_file.path.glob("*/*"))) == 10 * 11
+        assert ts.store_with_partition_cols(
+            mode='d', mode_options={'threads': _threads})
+    ts.store_fields_folder.delete()
+
+
+def try_aio():
+    _hashables = [TestStorage(_, 6.0) for _ in range(4)]
+    for _ts in _hashables:
+        for _epoch in range(2):
+            assert _ts.store_for_streaming(mode='w', epoch=_epoch)
+
+    async def _heartbeat(_stop: asyncio.Event, _ticks: t.List[float]):
+        while not _stop.is_set():
+            _ticks.append(time.time())
+            await asyncio.sleep(0.001)
+
+    async def _main():
+        # event loop keeps running while reads happen in thread pool
+        _stop, _ticks = asyncio.Event(), []
+        _beat = asyncio.ensure_future(_heartbeat(_stop, _ticks))
+        _start = time.time()
+        _tables = await asyncio.gather(
+            *[
+                _ts.aio.store_for_streaming(mode='r')
+                for _ts in _hashables
+            ]
+        )
+        _time = time.time() - _start
+        _stop.set()
+        await _beat
+        assert [len(_) for _ in _tables] == [200000] * 4
+        assert len(_ticks) > 1
+        print(
+            f"aio: 4 concurrent reads in {_time * 1000:.2f} ms while event "
+            f"loop ticked {len(_ticks)} times (max gap "
+            f"{np.diff(_ticks).max() * 1000:.2f} ms)"
+        )
+
+        # appends to same DfFile are written in the order of calls
+        _ts = _hashables[0]
+        assert all(
+            await asyncio.gather(
+                *[
+                    _ts.aio.store_metrics(mode='a', epoch=0, step=_step)
+                    for _step in range(30)
+                ]
+            )
+        )
+        assert await _ts.aio.store_metrics(mode='e', epoch=0)
+        _table = await _ts.aio.store_metrics(mode='r', epoch=0)
+        assert _table['step'].to_pylist() == list(range(30))
+
+        # streaming reads give async iterator
+        _rows = 0
+        async for _batch in await _ts.aio.store_for_streaming(
+            mode='s', epoch=0, mode_options={'batch_size': 10000},
+        ):
+            _rows += _batch.num_rows
+        assert _rows == 100000
+
+    asyncio.get_event_loop().run_until_complete(_main())
+    for _ts in _hashables:
+        _ts.store_fields_folder.delete()
+
+
+def try_np_to_pa():
+    _images = TestStorage.images(10000)
+
+    # nested python lists (older `util.np_to_pa`) vs fixed size lists
+    _start = time.time()
+    _old = pa.array(util.np_to_lnp(_images))
+    _old_to_pa = time.time() - _start
+    _start = time.time()
+    assert np.array_equal(util.pa_to_np(_old), _images)
+    _old_to_np = time.time() - _start
+    _start = time.time()
+    _new = util.np_to_pa(_images)
+    _new_to_pa = time.time() - _start
+    _start = time.time()
+    _images_back = util.pa_to_np(_new)
+    _new_to_np = time.time() - _start
+    assert np.array_equal(_images_back, _images)
+    print(
+        f"np_to_pa {_images.shape}: nested lists "
+        f"{_old_to_pa * 1000:.2f} ms / {_old_to_np * 1000:.2f} ms, fixed "
+        f"size lists {_new_to_pa * 1000:.2f} ms / {_new_to_np * 1000:.2f} ms"
+    )
+
+    # round trip shares memory with source array
+    assert np.shares_memory(_images_back, _images)
+
+    # dtype and byte order restored from field metadata
+    _floats = _images.astype(">f4")
+    _field = util.np_to_pa_field("image", _floats)
+    _floats_back = util.pa_to_np(
+        pa.chunked_array([util.np_to_pa(_floats)] * 2), field=_field
+    )
+    assert _floats_back.dtype == _floats.dtype
+    assert np.array_equal(_floats_back[10000:], _floats)
+
+    # metadata survives in StoreField
+    ts = TestStorage(5, 6.0)
+    assert ts.store_images(mode='w', num_images=1000)
+    _table = ts.store_images(mode='r', num_images=0)
+    assert np.array_equal(
+        util.pa_to_np(_table['image'], field=_table.schema.field('image')),
+        TestStorage.images(1000),
+    )
+    ts.store_fields_folder.delete()
+
+
+def _evict_from_page_cache(file: pathlib.Path):
+    # so that benchmarks read from disk ... only possible on posix and dirty
+    # pages need to be flushed first
+    if hasattr(os, "posix_fadvise"):
+        _fd = os.open(file, os.O_RDONLY)
+        os.fsync(_fd)
+        os.posix_fadvise(_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(_fd)
+
+
+@dataclasses.dataclass(frozen=True)
+class NpyTestFileGroup(s.NpyFileGroup):
+    num_examples: int = 10000
+
+    @property
+    @util.CacheResult
+    def path(self) -> pathlib.Path:
+        return _TEMP_PATH / self.group_by_name / self.name
+
+    @property
+    @util.CacheResult
+    def file_keys(self) -> t.List[str]:
+        return ["image", "label", "mean"]
+
+    @property
+    def shape(self) -> t.Dict[str, t.Tuple]:
+        return {
+            "image": (self.num_examples, 3, 32, 32),
+            "label": (self.num_examples, ),
+            "mean": (1, 3),
+        }
+
+    @property
+    def dtype(self) -> t.Dict[str, t.Any]:
+        return {"image": np.uint8, "label": np.int64, "mean": np.float32}
+
+    @property
+    def is_auto_hash(self) -> bool:
+        return True
+
+    def create_file(self, *, file_key: str) -> pathlib.Path:
+        return self.save_npy_data(
+            file_key=file_key,
+            npy_data={
+                # label is row number so that alignment can be checked
+                "image": lambda: TestStorage.images(self.num_examples),
+                "label": lambda: np.arange(self.num_examples),
+                "mean": lambda: np.ones((1, 3), dtype=np.float32),
+            }[file_key](),
+        )
+
+
+def try_npy_mem_map_shuffled_reads():
+    _file = _TEMP_PATH / "npy_mem_map_shuffled_reads.npy"
+    np.save(_file, TestStorage.images(50000))
+    _npy_mem_map = s.NpyMemMap(file_path=_file)
+    # rows fully shuffled and rows shuffled in blocks of 100
+    _shuffles = {
+        "permutation": np.random.RandomState(0).permutation(50000),
+        "blocks": (
+            np.random.RandomState(1).permutation(500)[:, None] * 100 +
+            np.arange(100)[None, :]
+        ).reshape(-1),
+    }
+    for _name, _indices in _shuffles.items():
+        for _batch_size in [256, 4096]:
+            _slices = [
+                slice(_, _ + _batch_size) for _ in range(0, 20000, _batch_size)
+            ]
+            # fancy index with shuffled indices (older `__getitem__`)
+            _evict_from_page_cache(_file)
+            with _npy_mem_map(shuffle_seed=_indices) as _mm:
+                _start = time.time()
+                _expected = [
+                    _mm.call_helper.memmap[_indices[_]] for _ in _slices
+                ]
+                _fancy_time = time.time() - _start
+            # rows read in ascending order
+            _evict_from_page_cache(_file)
+            with _npy_mem_map(shuffle_seed=_indices) as _mm:
+                _start = time.time()
+                _batches = [_mm[_] for _ in _slices]
+                _ordered_time = time.time() - _start
+            assert all(
+                np.array_equal(_a, _b) for _a, _b in zip(_expected, _batches)
+            )
+            print(
+                f"{_name} shuffled reads with batch_size={_batch_size}: "
+                f"fancy index {_fancy_time * 1000:.2f} ms, ascending order "
+                f"{_ordered_time * 1000:.2f} ms"
+            )
+    del _npy_mem_map
+    _file.unlink()
+
+
+def try_npy_mem_map_shuffle_modes():
+    _file = _TEMP_PATH / "npy_mem_map_shuffle_modes.npy"
+    np.save(_file, np.arange(50000 * 256, dtype=np.int64).reshape(50000, 256))
+    _npy_mem_map = s.NpyMemMap(file_path=_file)
+    for _shuffle_seed in [
+        s.DETERMINISTIC_SHUFFLE,
+        s.BlockShuffle(block_size=1000, buffer_size=256),
+        s.WindowedShuffle(buffer_size=4096),
+    ]:
+        _evict_from_page_cache(_file)
+        with _npy_mem_map(shuffle_seed=_shuffle_seed) as _mm:
+            _start = time.time()
+            _rows = np.concatenate(
+                [_mm[_:_ + 256, 0] // 256 for _ in range(0, len(_mm), 256)]
+            )
+            _time = time.time() - _start
+        print(
+            f"{_shuffle_seed}: read in {_time * 1000:.2f} ms with mean jump "
+            f"of {np.abs(np.diff(_rows)).mean():.2f} rows"
+        )
+    del _npy_mem_map
+    _file.unlink()
+
+
+def try_npy_mem_map_feistel_shuffle():
+    _file = _TEMP_PATH / "npy_mem_map_feistel_shuffle.npy"
+    np.save(_file, np.arange(10000000, dtype=np.int64))
+    _npy_mem_map = s.NpyMemMap(file_path=_file)
+    # opening with full permutation vs feistel shuffle
+    for _shuffle_seed in [s.DETERMINISTIC_SHUFFLE, s.FeistelShuffle()]:
+        _start = time.time()
+        with _npy_mem_map(shuffle_seed=_shuffle_seed) as _mm:
+            _open_time = time.time() - _start
+            _start = time.time()
+            for _ in range(0, 1000000, 4096):
+                _mm[_:_ + 4096]
+            _read_time = time.time() - _start
+        print(
+            f"{_shuffle_seed}: opened in {_open_time * 1000:.2f} ms and "
+            f"read 1M shuffled rows in {_read_time * 1000:.2f} ms"
+        )
+    # indices for two billion rows without allocating them
+    _indices = s.FeistelShuffle().indices(2000000000)
+    _start = time.time()
+    _indices[np.arange(0, 2000000000, 2000)]
+    print(
+        f"1M shuffle indices for 2B rows computed in "
+        f"{(time.time() - _start) * 1000:.2f} ms"
+    )
+    del _npy_mem_map
+    _file.unlink()
+
+
+def try_npy_file_group_batches():
+    _fg = NpyTestFileGroup(parent_folder=None, num_examples=10000)
+    if not _fg.is_created:
+        _fg.create()
+    _images = TestStorage.images(10000)
+
+    # batches are aligned across files and follow shuffle seed of __call__
+    with _fg(shuffle_seed=s.DETERMINISTIC_SHUFFLE) as _opened:
+        _expected_labels = _opened.get_file("label")[:]
+    for _shuffle_seed in [
+        s.DETERMINISTIC_SHUFFLE, s.NON_DETERMINISTIC_SHUFFLE,
+        s.FeistelShuffle(seed=None), s.NO_SHUFFLE,
+    ]:
+        _labels = []
+        for _batch in _fg(
+            shuffle_seed=_shuffle_seed, batch_size=1000, num_threads=2,
+            on_iter_show_progress_bar=False,
+        ):
+            assert np.array_equal(_batch["image"], _images[_batch["label"]])
+            assert _batch["mean"].shape == (1, 3)
+            _labels.append(_batch["label"])
+        _labels = np.concatenate(_labels)
+        assert np.array_equal(np.sort(_labels), np.arange(10000))
+        if _shuffle_seed == s.DETERMINISTIC_SHUFFLE:
+            assert np.array_equal(_labels, _expected_labels)
+
+    # drop last
+    _sizes = [
+        len(_["label"]) for _ in _fg(
+            shuffle_seed=s.NO_SHUFFLE, batch_size=3000, drop_last=True,
+            on_iter_show_progress_bar=False,
+        )
+    ]
+    assert _sizes == [3000] * 3
+    _sizes = [
+        len(_["label"]) for _ in _fg(
+            shuffle_seed=s.NO_SHUFFLE, batch_size=3000,
+            on_iter_show_progress_bar=False,
+        )
+    ]
+    assert _sizes == [3000] * 3 + [1000]
+
+    # breaking early closes memmaps and worker threads
+    _threads = threading.active_count()
+    for _batch in _fg(
+        shuffle_seed=s.DETERMINISTIC_SHUFFLE, batch_size=100, prefetch=8,
+        on_iter_show_progress_bar=False,
+    ):
+        break
+    assert not _fg.is_called
+    assert threading.active_count() == _threads
+
+    # reads overlap with compute on the consumer side ... note that time
+    # is measured from first to last batch so that opening and closing
+    # memmaps is not included
+    for _prefetch in [0, 4]:
+        _evict_from_page_cache(_fg.path / "image")
+        _start = None
+        for _batch in _fg(
+            shuffle_seed=s.DETERMINISTIC_SHUFFLE, batch_size=500,
+            prefetch=_prefetch, on_iter_show_progress_bar=False,
+        ):
+            _start = _start or time.time()
+            time.sleep(0.005)  # fake model compute
+            _end = time.time()
+        print(
+            f"prefetch={_prefetch}: 20 batches with 5 ms compute each in "
+            f"{(_end - _start) * 1000:.2f} ms"
+        )
+    _group_path = _fg.path.parent
+    _fg.delete(force=True)
+    _group_path.rmdir()
+
+
+def _normalize_images(batch: t.Dict[str, np.ndarray]):
+    # some cpu heavy transform for loader workers
+    _images = batch["image"].astype(np.float32) / 255.0
+    for _ in range(5):
+        _images = np.sqrt(_images * _images + 1e-6)
+    return {
+        **batch, "image": _images - _images.mean(axis=(2, 3), keepdims=True)
+    }
+
+
+def _failing_transform(batch: t.Dict[str, np.ndarray]):
+    if batch["label"].min() >= 5000:
+        raise ValueError("some rows are corrupt")
+    return batch
+
+
+def try_npy_file_group_loader():
+    _fg = NpyTestFileGroup(parent_folder=None, num_examples=10000)
+    if not _fg.is_created:
+        _fg.create()
+
+    # same batches in same order as with threads
+    _expected = [
+        {_k: _v.copy() for _k, _v in _.items()} for _ in _fg(
+            shuffle_seed=s.DETERMINISTIC_SHUFFLE, batch_size=768,
+            transform=_normalize_images, on_iter_show_progress_bar=False,
+        )
+    ]
+    _batches = [
+        {_k: _v.copy() for _k, _v in _.items()} for _ in _fg(
+            shuffle_seed=s.DETERMINISTIC_SHUFFLE, batch_size=768,
+            transform=_normalize_images, num_workers=2, prefetch=4,
+            on_iter_show_progress_bar=False,
+        )
+    ]
+    assert len(_batches) == len(_expected) == 14
+    for _a, _b in zip(_expected, _batches):
+        assert _a.keys() == _b.keys()
+        assert all(np.array_equal(_a[_k], _b[_k]) for _k in _a.keys())
+
+    # cpu heavy transform in threads vs worker processes
+    for _kwargs in [dict(num_threads=2), dict(num_workers=2)]:
+        _start = None
+        for _batch in _fg(
+            shuffle_seed=s.DETERMINISTIC_SHUFFLE, batch_size=500,
+            transform=_normalize_images, prefetch=4,
+            on_iter_show_progress_bar=False, **_kwargs
+        ):
+            _start = _start or time.time()
+            time.sleep(0.005)  # fake model compute
+            _end = time.time()
+        print(
+            f"{_kwargs}: 20 transformed batches with 5 ms compute each in "
+            f"{(_end - _start) * 1000:.2f} ms"
+        )
+
+    # worker exceptions are raised in main process
+    try:
+        for _batch in _fg(
+            shuffle_seed=s.NO_SHUFFLE, batch_size=500, num_workers=2,
+            transform=_failing_transform, on_iter_show_progress_bar=False,
+        ):
+            ...
+        raise AssertionError("expected error")
+    except ValueError as _exc:
+        assert "corrupt" in str(_exc)
+        print(f"worker error: {_exc!r} caused by {type(_exc.__cause__)}")
+
+    # breaking early shuts down workers and releases shared memory
+    _start = time.time()
+    for _batch in _fg(
+        shuffle_seed=s.DETERMINISTIC_SHUFFLE, batch_size=100, num_workers=2,
+        transform=_normalize_images, prefetch=8,
+        on_iter_show_progress_bar=False,
+    ):
+        if _batch["label"][0] != 0:
+            _start = time.time()
+            break
+    print(f"shut down workers in {(time.time() - _start) * 1000:.2f} ms")
+    assert not multiprocessing.active_children()
+    assert not _fg.is_called
+    _group_path = _fg.path.parent
+    _fg.delete(force=True)
+    _group_path.rmdir()
+
+
 def try_main():
     global _TEMP_PATH
     # if _TEMP_PATH.exists():
@@ -757,6 +1853,28 @@ def try_main():
     try_metainfo_file()
     try_creating_folders()
     try_arrow_storage()
+    try_scans_per_call()
+    try_file_formats()
+    try_compaction()
+    try_stream_mode()
+    try_manifest()
+    try_stats_pruning()
+    try_write_buffer()
+    try_write_pipeline()
+    try_streamed_write()
+    try_read_since()
+    try_aggregate()
+    try_read_cache()
+    try_read_store_field()
+    try_delete_rows()
+    try_parallel_delete()
+    try_aio()
+    try_np_to_pa()
+    try_npy_mem_map_shuffled_reads()
+    try_npy_mem_map_shuffle_modes()
+    try_npy_mem_map_feistel_shuffle()
+    try_npy_file_group_batches()
+    try_npy_file_group_loader()
     _TEMP_PATH.rmdir()
 
 
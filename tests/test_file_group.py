@@ -0,0 +1,155 @@
+"""Tests for `toolcraft.storage.file_group` NpyMemMap shuffling."""
+# pylint: disable=redefined-outer-name
+
+import numpy as np
+import pytest
+
+from toolcraft import storage as s
+
+_ROWS = 10000
+
+
+@pytest.fixture
+def npy_mem_map(tmp_path) -> s.NpyMemMap:
+    # first column is row number so that rows read can be identified
+    _file = tmp_path / "rows.npy"
+    np.save(_file, np.arange(_ROWS * 4, dtype=np.int64).reshape(_ROWS, 4) // 4)
+    return s.NpyMemMap(file_path=_file)
+
+
+def _read_all(npy_mem_map: s.NpyMemMap, shuffle_seed, batch_size: int):
+    with npy_mem_map(shuffle_seed=shuffle_seed) as _mm:
+        return np.concatenate(
+            [
+                _mm[_:_ + batch_size, 0]
+                for _ in range(0, len(_mm), batch_size)
+            ]
+        )
+
+
+@pytest.mark.parametrize(
+    "indices",
+    [
+        np.random.RandomState(0).permutation(_ROWS),
+        # shuffled blocks of 100 rows i.e. long ascending runs
+        (
+            np.random.RandomState(1).permutation(_ROWS // 100)[:, None] * 100
+            + np.arange(100)[None, :]
+        ).reshape(-1),
+        np.arange(_ROWS)[::-1].copy(),
+    ]
+)
+@pytest.mark.parametrize("batch_size", [1, 7, 256, _ROWS])
+def test_shuffled_reads_match_fancy_index(npy_mem_map, indices, batch_size):
+    with npy_mem_map(shuffle_seed=indices) as _mm:
+        _memmap = _mm.call_helper.memmap
+        for _start in range(0, _ROWS, batch_size):
+            _slice = slice(_start, _start + batch_size)
+            assert np.array_equal(_mm[_slice], _memmap[indices[_slice]])
+
+
+def test_shuffled_reads_index_types(npy_mem_map):
+    with npy_mem_map(shuffle_seed=s.DETERMINISTIC_SHUFFLE) as _mm:
+        _memmap = _mm.call_helper.memmap
+        _indices = _mm.call_helper.shuffle_indices
+        assert np.array_equal(_mm[5], _memmap[_indices[5]])
+        # duplicates and negative indices
+        _items = [5, 3, 3, 1000, -1]
+        assert np.array_equal(_mm[_items], _memmap[_indices[_items]])
+        assert np.array_equal(
+            _mm[np.asarray([[3, 4], [4, 3]])],
+            _memmap[_indices[np.asarray([[3, 4], [4, 3]])]],
+        )
+        # tuple indexing
+        assert np.array_equal(
+            _mm[[5, 3, 3, 1000], 1], _memmap[_indices[[5, 3, 3, 1000]]][:, 1]
+        )
+
+
+@pytest.mark.parametrize(
+    "shuffle_seed",
+    [
+        s.DETERMINISTIC_SHUFFLE,
+        s.BlockShuffle(block_size=1000),
+        s.BlockShuffle(block_size=1000, buffer_size=256),
+        # partial last block and buffer
+        s.BlockShuffle(block_size=333, buffer_size=77),
+        s.WindowedShuffle(buffer_size=1),
+        s.WindowedShuffle(buffer_size=4096),
+        s.WindowedShuffle(buffer_size=2 * _ROWS),
+    ]
+)
+def test_shuffle_modes_are_permutations(npy_mem_map, shuffle_seed):
+    _rows = _read_all(npy_mem_map, shuffle_seed, batch_size=256)
+    # every row exactly once and not in sequential order
+    assert np.array_equal(np.sort(_rows), np.arange(_ROWS))
+    if shuffle_seed != s.WindowedShuffle(buffer_size=1):
+        assert not np.array_equal(_rows, np.arange(_ROWS))
+    # same seed gives same order irrespective of batch size
+    assert np.array_equal(
+        _read_all(npy_mem_map, shuffle_seed, batch_size=1000), _rows)
+
+
+def test_block_shuffle_keeps_blocks():
+    _indices = s.BlockShuffle(block_size=100).indices(_ROWS)
+    assert np.array_equal(np.sort(_indices), np.arange(_ROWS))
+    # rows within block stay contiguous and blocks start at block boundary
+    _blocks = _indices.reshape(-1, 100)
+    assert (_blocks[:, 0] % 100 == 0).all()
+    assert (np.diff(_blocks, axis=1) == 1).all()
+
+
+def test_windowed_shuffle_bounds_moves():
+    for _seed in [None, 1, 2]:
+        _indices = s.WindowedShuffle(buffer_size=512, seed=_seed).indices(
+            _ROWS)
+        assert np.array_equal(np.sort(_indices), np.arange(_ROWS))
+        # rows move at most buffer_size positions ahead
+        assert (_indices - np.arange(_ROWS) <= 512).all()
+
+
+@pytest.mark.parametrize("rounds", [3, 4, 8])
+@pytest.mark.parametrize("length", [1, 2, 3, 1000, _ROWS, 65537])
+def test_feistel_shuffle_is_permutation(rounds, length):
+    _indices = s.FeistelShuffle(rounds=rounds).indices(length)
+    assert len(_indices) == length
+    _all = _indices[np.arange(length)]
+    assert np.array_equal(np.sort(_all), np.arange(length))
+    if length > 3:
+        assert not np.array_equal(_all, np.arange(length))
+    # same seed gives same order while other seed gives other order
+    assert np.array_equal(
+        s.FeistelShuffle(rounds=rounds).indices(length)[np.arange(length)],
+        _all,
+    )
+    if length > 3:
+        assert not np.array_equal(
+            s.FeistelShuffle(rounds=rounds, seed=5).indices(length)[
+                np.arange(length)],
+            _all,
+        )
+
+
+def test_feistel_shuffle_huge_length():
+    # indices are computed without allocating them for all rows
+    _length = 2000000000
+    _some = s.FeistelShuffle().indices(_length)[np.arange(0, _length, 2000)]
+    assert (_some >= 0).all() and (_some < _length).all()
+    assert len(np.unique(_some)) == len(_some)
+
+
+def test_feistel_shuffle_reads(npy_mem_map):
+    _shuffle_seed = s.FeistelShuffle(seed=5)
+    _rows = _read_all(npy_mem_map, _shuffle_seed, batch_size=256)
+    assert np.array_equal(np.sort(_rows), np.arange(_ROWS))
+    assert np.array_equal(
+        _read_all(npy_mem_map, _shuffle_seed, batch_size=999), _rows)
+    # int, slice, list and array indexing agree
+    with npy_mem_map(shuffle_seed=_shuffle_seed) as _mm:
+        assert _mm[4096][0] == _rows[4096]
+        assert np.array_equal(_mm[[7, 1, -1]][:, 0], _rows[[7, 1, -1]])
+        assert np.array_equal(
+            _mm[np.asarray([[3, 4], [5, 6]])][..., 0],
+            _rows[np.asarray([[3, 4], [5, 6]])],
+        )
+        assert np.array_equal(_mm[[5, 3, 3], 0], _rows[[5, 3, 3]])
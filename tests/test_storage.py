@@ -0,0 +1,954 @@
+"""Tests for `toolcraft.storage` StoreFields and DfFile."""
+# pylint: disable=redefined-outer-name
+
+import asyncio
+import dataclasses
+import multiprocessing
+import pathlib
+import typing as t
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from toolcraft import settings
+from toolcraft import util
+from toolcraft import marshalling as m
+from toolcraft import storage as s
+from toolcraft.storage import df_file
+
+settings.DEBUG_HASHABLE_STATE = False
+
+_READ_CACHE = s.DfFileReadCache(max_entries=3)
+
+
+@dataclasses.dataclass(frozen=True)
+class Storage(m.HashableClass):
+    root: str
+
+    @property
+    def store_fields_location(self) -> pathlib.Path:
+        return pathlib.Path(self.root) / self.name
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(partition_cols=["a", "b"])
+    def store_with_partition_cols(
+        self, mode: s.MODE_TYPE, a: int, b: int,
+        filters: s.FILTERS_TYPE = None,
+        mode_options: t.Dict[str, t.Any] = None,
+    ) -> pa.Table:
+        return pa.table(
+            {
+                "a": np.asarray([a] * 4),
+                "b": np.asarray([b] * 4),
+                "c": np.asarray([6, 7, 8, 9]),
+            }
+        )
+
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(partition_cols=["epoch"])
+    def store_metrics(
+        self, mode: s.MODE_TYPE, epoch: int = 0, step: int = 0,
+        filters: s.FILTERS_TYPE = None,
+        columns: t.List[str] = None,
+        mode_options: t.Dict[str, t.Any] = None,
+    ) -> pa.Table:
+        return pa.table({"epoch": [epoch], "step": [step]})
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        partition_cols=["epoch"],
+        compaction_policy=s.DfFileCompactionPolicy(
+            max_files=4, small_file_size=1024 * 1024,
+            target_file_size=1024 * 1024,
+        ),
+    )
+    def store_compacted(
+        self, mode: s.MODE_TYPE, epoch: int, step: int = 0
+    ) -> pa.Table:
+        return pa.table({"epoch": [epoch] * 10, "step": [step] * 10})
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        partition_cols=["epoch"],
+        streamed_write=s.DfFileStreamedWrite(max_file_size=1024),
+    )
+    def store_metrics_streamed(
+        self, mode: s.MODE_TYPE, epoch: int, step: int = 0
+    ) -> pa.Table:
+        return pa.table({"epoch": [epoch], "step": [step]})
+
+    # noinspection PyUnusedLocal
+    @s.StoreField()
+    def store_images(
+        self, mode: s.MODE_TYPE, nested_lists: bool
+    ) -> pa.Table:
+        _images = np.arange(2 * 3 * 4, dtype=np.uint8).reshape((2, 3, 4))
+        if nested_lists:
+            # how older versions of `util.np_to_pa` stored arrays
+            return pa.table({"image": pa.array(util.np_to_lnp(_images))})
+        return pa.table({"image": util.np_to_pa(_images)})
+
+    @staticmethod
+    def losses(epoch: int) -> pa.Table:
+        return pa.table(
+            {
+                "epoch": [epoch] * 1000,
+                "label": np.arange(1000) % 10,
+                "loss": np.arange(1000) / 1000.,
+            }
+        )
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        partition_cols=["epoch"],
+        file_format=s.DfFileFormat(name='ipc', compression='lz4'),
+    )
+    def store_ipc_lz4(self, mode: s.MODE_TYPE, epoch: int) -> pa.Table:
+        return self.losses(epoch)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        partition_cols=["epoch"],
+        file_format=s.DfFileFormat(
+            name='parquet', compression='zstd', row_group_size=100,
+            use_dictionary=True,
+        ),
+    )
+    def store_parquet(
+        self, mode: s.MODE_TYPE, epoch: int, filters: s.FILTERS_TYPE = None,
+    ) -> pa.Table:
+        return self.losses(epoch)
+
+    @staticmethod
+    def steps(
+        num_steps: int, fail_at: t.Optional[int]
+    ) -> t.Iterator[pa.Table]:
+        for _step in range(num_steps):
+            if _step == fail_at:
+                raise ValueError(f"failed at step {_step}")
+            yield pa.table({"step": [_step]})
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(yields=True)
+    def store_yield(
+        self, mode: s.MODE_TYPE, num_steps: int = 0,
+        fail_at: t.Optional[int] = None,
+    ) -> pa.Table:
+        yield from self.steps(num_steps, fail_at)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(yields=True, write_buffer=s.DfFileWriteBuffer(max_rows=10))
+    def store_yield_buffered(
+        self, mode: s.MODE_TYPE, num_steps: int = 0,
+        fail_at: t.Optional[int] = None,
+    ) -> pa.Table:
+        yield from self.steps(num_steps, fail_at)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(
+        yields=True,
+        write_pipeline=s.DfFileWritePipeline(workers=2, max_pending=2),
+    )
+    def store_yield_pipelined(
+        self, mode: s.MODE_TYPE, num_steps: int = 0,
+        fail_at: t.Optional[int] = None,
+    ) -> pa.Table:
+        yield from self.steps(num_steps, fail_at)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField()
+    def store_events(
+        self, mode: s.MODE_TYPE, data: t.Dict[str, t.List] = None,
+        filters: s.FILTERS_TYPE = None,
+        mode_options: t.Dict[str, t.Any] = None,
+    ) -> pa.Table:
+        return pa.table(data)
+
+    # noinspection PyUnusedLocal
+    @s.StoreField(partition_cols=["epoch"], read_cache=_READ_CACHE)
+    def store_cached(
+        self, mode: s.MODE_TYPE, epoch: int = 0,
+        filters: s.FILTERS_TYPE = None,
+        columns: t.List[str] = None,
+    ) -> pa.Table:
+        return self.losses(epoch)
+
+
+@pytest.fixture
+def storage(tmp_path) -> Storage:
+    _storage = Storage(root=tmp_path.as_posix())
+    yield _storage
+    _storage.store_fields_folder.delete()
+
+
+def _exists_by_full_read(
+    _df_file: "df_file.DfFile", filters: t.Optional[s.FILTERS_TYPE]
+) -> bool:
+    # no filters are passed to read so that neither partition folders nor
+    # min/max stats are used to skip files
+    _table = _df_file.read_if_exists(
+        columns=None,
+        filter_expression=df_file.bake_expression(
+            _elements=filters, _err_msg="test filters"),
+        filters=None,
+    )
+    return _table is not None and len(_table) > 0
+
+
+# pivot kwargs (a, b) combined with filters on partition and data columns
+_EXISTS_QUERIES = [
+    ({}, None),
+    ({'a': 1}, None),
+    ({'a': 2}, None),
+    ({'a': 1, 'b': 2}, None),
+    ({'a': 1, 'b': 4}, None),
+    ({}, [('b', '>', 2)]),
+    ({}, [('b', '>', 3)]),
+    ({}, [('c', '=', 9)]),
+    ({}, [('c', '=', 10)]),
+    ({'a': 1}, [('c', 'in', [9, 10])]),
+    ({'a': 1}, [('c', '<', 6)]),
+    ({'b': 3}, [('c', '>=', 8)]),
+    ({}, [[('b', '=', 2), ('c', '=', 6)], [('b', '=', 3), ('c', '=', 9)]]),
+]
+
+
+def _check_exists_matches_full_read(storage: Storage):
+    _df_file = storage.store_fields_folder.items['store_with_partition_cols']
+    for _kwargs, _filters in _EXISTS_QUERIES:
+        _all_filters = [(_k, '=', _v) for _k, _v in _kwargs.items()] + \
+            (_filters or [])
+        _exists = storage.store_with_partition_cols(
+            mode='e', filters=_filters, **_kwargs)
+        assert _exists == _exists_by_full_read(
+            _df_file, _all_filters or None), (_kwargs, _filters)
+
+
+def test_exists_matches_full_read(storage):
+    assert not storage.store_with_partition_cols(mode='e')
+    storage.store_with_partition_cols(mode='w', a=1, b=2)
+    storage.store_with_partition_cols(mode='w', a=1, b=3)
+    _check_exists_matches_full_read(storage)
+
+
+def test_exists_matches_full_read_after_deletes(storage):
+    storage.store_with_partition_cols(mode='w', a=1, b=2)
+    storage.store_with_partition_cols(mode='w', a=1, b=3)
+    # row level delete rewrites file so stats in manifest are stale
+    storage.store_with_partition_cols(mode='d', filters=[('c', '>=', 8)])
+    _check_exists_matches_full_read(storage)
+    assert not storage.store_with_partition_cols(
+        mode='e', filters=[('c', '=', 9)])
+    # partition delete
+    storage.store_with_partition_cols(mode='d', b=2)
+    _check_exists_matches_full_read(storage)
+    assert not storage.store_with_partition_cols(mode='e', a=1, b=2)
+    assert storage.store_with_partition_cols(mode='e', a=1, b=3)
+    # everything deleted
+    storage.store_with_partition_cols(mode='d')
+    _check_exists_matches_full_read(storage)
+    assert not storage.store_with_partition_cols(mode='e')
+
+
+def test_append_fixed_size_lists_to_nested_lists(storage):
+    # schema inferred from nested lists
+    storage.store_images(mode='a', nested_lists=True)
+    storage.store_images(mode='a', nested_lists=False)
+    _images = util.pa_to_np(storage.store_images(mode='r')['image'])
+    assert _images.shape == (4, 3, 4)
+    assert (_images[:2] == _images[2:]).all()
+
+
+def _append_worker(root: str, worker: int, steps: int):
+    _storage = Storage(root=root)
+    for _step in range(worker * steps, (worker + 1) * steps):
+        assert _storage.store_metrics(mode='a', epoch=_step % 2, step=_step)
+        assert _storage.store_compacted(mode='a', epoch=_step % 2, step=_step)
+    with _storage():
+        for _step in range(worker * steps, (worker + 1) * steps):
+            assert _storage.store_metrics_streamed(
+                mode='a', epoch=_step % 2, step=_step)
+
+
+def test_concurrent_appends(storage):
+    # all processes also race to do first write i.e. create DfFile's
+    _workers, _steps = 4, 25
+    _processes = [
+        multiprocessing.Process(
+            target=_append_worker, args=(storage.root, _, _steps))
+        for _ in range(_workers)
+    ]
+    for _p in _processes:
+        _p.start()
+    for _p in _processes:
+        _p.join()
+        assert _p.exitcode == 0
+    _expected = list(range(_workers * _steps))
+    for _name, _repeat in [
+        ('store_metrics', 1), ('store_compacted', 10),
+        ('store_metrics_streamed', 1),
+    ]:
+        _method = getattr(storage, _name)
+        _steps_on_disk = []
+        for _epoch in range(2):
+            _steps_on_disk += _method(mode='r', epoch=_epoch)[
+                'step'].to_pylist()
+        assert sorted(_steps_on_disk) == sorted(_expected * _repeat), _name
+        # manifest written by all processes must agree with files on disk
+        _df_file = storage.store_fields_folder.items[_name]
+        _df_file.wait_for_compaction()
+        _files = [
+            _ for _ in _df_file.path.glob("*/*")
+            if not _.name.startswith("_")
+        ]
+        # noinspection PyProtectedMember
+        assert set(df_file._get_manifest(_df_file).entries.keys()) == {
+            _.relative_to(_df_file.path).as_posix() for _ in _files
+        }, _name
+
+
+def test_exit_resets_call_when_closing_streams_fails(storage, monkeypatch):
+    def _fail(self):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        with storage():
+            storage.store_metrics_streamed(mode='a', epoch=0, step=0)
+            monkeypatch.setattr(df_file.DfFile, "close_streams", _fail)
+    monkeypatch.undo()
+    # storage can be called again
+    assert not storage.is_called
+    with storage():
+        assert storage.store_metrics_streamed(mode='a', epoch=0, step=1)
+    # stream left open by failed exit is finalized by next exit
+    assert storage.store_metrics_streamed(
+        mode='r', epoch=0)['step'].to_pylist() == [0, 1]
+
+
+def test_read_since_mode(storage):
+    for _step in range(3):
+        storage.store_metrics(mode='a', epoch=_step % 2, step=_step)
+    _table, _watermark = storage.store_metrics(
+        mode='rs', columns=['step'], mode_options={'watermark': 0})
+    assert sorted(_table['step'].to_pylist()) == [0, 1, 2]
+    # only new rows that match filters
+    storage.store_metrics(mode='a', epoch=0, step=3)
+    storage.store_metrics(mode='a', epoch=1, step=4)
+    _table, _new_watermark = storage.store_metrics(
+        mode='rs', epoch=0, mode_options={'watermark': _watermark})
+    assert _table['step'].to_pylist() == [3]
+    assert _new_watermark > _watermark
+    # nothing new
+    _table, _watermark = storage.store_metrics(
+        mode='rs', mode_options={'watermark': _new_watermark})
+    assert len(_table) == 0 and _watermark == _new_watermark
+
+
+@pytest.mark.parametrize(
+    "mode_options", [None, {}, {'watermark': 0, 'batch_size': 10}]
+)
+def test_read_since_mode_options(storage, mode_options):
+    storage.store_metrics(mode='a', epoch=0)
+    with pytest.raises(SystemExit):
+        storage.store_metrics(mode='rs', mode_options=mode_options)
+
+
+def test_merge_files_never_replaces_source(storage):
+    for _step in range(8):
+        storage.store_metrics(mode='a', epoch=0, step=_step)
+    _df_file = storage.store_fields_folder.items['store_metrics']
+
+    def _entries():
+        # noinspection PyProtectedMember
+        return df_file._get_manifest(_df_file).sorted_entries
+
+    # small target size splits merged rows in many files with same time
+    # range ... merging them again must not reuse their names
+    # noinspection PyProtectedMember
+    assert _df_file._merge_files(entries=_entries(), target_file_size=1)
+    _merged = [_.path for _ in _entries()]
+    assert len(_merged) == 8
+    # noinspection PyProtectedMember
+    assert _df_file._merge_files(
+        entries=_entries(), target_file_size=1024 * 1024)
+    assert len(_entries()) == 1 and _entries()[0].path not in _merged
+    assert storage.store_metrics(
+        mode='r', epoch=0)['step'].to_pylist() == list(range(8))
+
+
+@pytest.mark.parametrize(
+    "mode, kwargs",
+    [('r', {}), ('r', {'a': 1, 'b': 2}), ('rw', {'a': 1, 'b': 2}),
+     ('e', {'a': 1, 'b': 2}), ('e', {'a': 3})]
+)
+def test_read_modes_scan_once(storage, mode, kwargs):
+    storage.store_with_partition_cols(mode='w', a=1, b=2)
+    _df_file = storage.store_fields_folder.items['store_with_partition_cols']
+    _scan_count = _df_file.internal.scan_count
+    for _ in range(3):
+        storage.store_with_partition_cols(mode=mode, **kwargs)
+    assert _df_file.internal.scan_count - _scan_count <= 3
+
+
+def test_read_nothing_on_disk(storage):
+    storage.store_with_partition_cols(mode='w', a=1, b=2)
+    assert len(storage.store_with_partition_cols(mode='r', a=1, b=2)) == 4
+    with pytest.raises(SystemExit):
+        storage.store_with_partition_cols(mode='r', a=1, b=3)
+    # read write mode creates what is missing
+    assert len(storage.store_with_partition_cols(mode='rw', a=1, b=3)) == 4
+    assert len(storage.store_with_partition_cols(mode='r')) == 8
+
+
+@pytest.mark.parametrize(
+    "name, file_format, magic",
+    [("store_ipc_lz4", "ipc", b"ARROW1"), ("store_parquet", "parquet", b"PAR1")]
+)
+def test_file_formats(storage, name, file_format, magic):
+    _method = getattr(storage, name)
+    for _epoch in range(3):
+        assert _method(mode='w', epoch=_epoch)
+    assert _method(mode='r', epoch=1) == Storage.losses(1)
+    assert len(_method(mode='r')) == 3000
+    _df_file = storage.store_fields_folder.items[name]
+    _files = [_ for _ in _df_file.path.glob("*/*") if _.is_file()]
+    assert len(_files) == 3
+    for _file in _files:
+        assert _file.read_bytes().startswith(magic)
+    # format is persisted in config
+    assert _df_file.config.get_file_format().name == file_format
+
+
+def test_parquet_filter_on_data_column(storage):
+    storage.store_parquet(mode='w', epoch=0)
+    _table = storage.store_parquet(mode='r', filters=[('label', '=', 3)])
+    assert len(_table) == 100 and set(_table['label'].to_pylist()) == {3}
+
+
+def _data_files(_df_file: "df_file.DfFile") -> t.List[pathlib.Path]:
+    return [
+        _ for _ in _df_file.path.glob("**/*")
+        if _.is_file() and not _.name.startswith("_")
+    ]
+
+
+def _check_manifest(_df_file: "df_file.DfFile"):
+    # manifest must agree with files on disk
+    # noinspection PyProtectedMember
+    assert set(df_file._get_manifest(_df_file).entries.keys()) == {
+        _.relative_to(_df_file.path).as_posix()
+        for _ in _data_files(_df_file)
+    }
+
+
+def test_compaction_swap(storage):
+    for _step in range(12):
+        for _epoch in range(2):
+            storage.store_compacted(mode='a', epoch=_epoch, step=_step)
+        # readers see all rows appended so far in order even while
+        # compaction happens in background
+        assert storage.store_compacted(
+            mode='r', epoch=0)['step'].to_pylist() == sum(
+                [[_] * 10 for _ in range(_step + 1)], [])
+    _df_file = storage.store_fields_folder.items['store_compacted']
+    _df_file.wait_for_compaction()
+    # small files were merged as per policy
+    assert len(_data_files(_df_file)) < 24
+    _check_manifest(_df_file)
+    # compact everything in single file per partition
+    assert _df_file.compact() > 0
+    assert len(_data_files(_df_file)) == 2
+    assert all([_.suffix.startswith(".c") for _ in _data_files(_df_file)])
+    _check_manifest(_df_file)
+    for _epoch in range(2):
+        assert storage.store_compacted(
+            mode='r', epoch=_epoch)['step'].to_pylist() == sum(
+                [[_] * 10 for _ in range(12)], [])
+    # nothing more to compact
+    assert _df_file.compact() == 0
+
+
+@pytest.mark.parametrize("readahead", [0, 2])
+def test_stream_mode(storage, readahead):
+    for _step in range(20):
+        storage.store_metrics(mode='a', epoch=_step % 2, step=_step)
+    _batches = list(
+        storage.store_metrics(
+            mode='s', columns=['step'], filters=[('step', '>=', 5)],
+            mode_options={'batch_size': 4, 'readahead': readahead},
+        )
+    )
+    assert all([isinstance(_, pa.RecordBatch) for _ in _batches])
+    assert all([_.schema.names == ['step'] for _ in _batches])
+    assert all([_.num_rows <= 4 for _ in _batches])
+    assert sorted(
+        pa.Table.from_batches(_batches)['step'].to_pylist()
+    ) == list(range(5, 20))
+    # consumer can stop early
+    _iterator = storage.store_metrics(mode='s', epoch=1)
+    assert next(_iterator).num_rows == 1
+    _iterator.close()
+    # writes are possible after iterator is closed
+    assert storage.store_metrics(mode='d', epoch=1)
+    assert len(pa.Table.from_batches(
+        list(storage.store_metrics(mode='s')))) == 10
+
+
+def test_stream_mode_nothing_on_disk(storage):
+    assert list(storage.store_metrics(mode='s')) == []
+    with pytest.raises(SystemExit):
+        storage.store_metrics(mode='s', mode_options={'watermark': 0})
+
+
+def test_manifest_add_remove(storage):
+    for _step in range(6):
+        storage.store_metrics(mode='a', epoch=_step % 3, step=_step)
+    _df_file = storage.store_fields_folder.items['store_metrics']
+    # noinspection PyProtectedMember
+    _entries = df_file._get_manifest(_df_file).entries
+    assert len(_entries) == 6
+    assert sorted([_.partition['epoch'] for _ in _entries.values()]) == \
+        [0, 0, 1, 1, 2, 2]
+    _check_manifest(_df_file)
+    # partition delete removes entries and folder
+    assert storage.store_metrics(mode='d', epoch=1)
+    # noinspection PyProtectedMember
+    assert len(df_file._get_manifest(_df_file).entries) == 4
+    assert (_df_file.path / "0").exists()
+    assert not (_df_file.path / "1").exists()
+    _check_manifest(_df_file)
+    # manifest parsed from scratch (e.g. by other process) agrees
+    _df_file.internal.manifest = None
+    _check_manifest(_df_file)
+    assert sorted(storage.store_metrics(mode='r')['step'].to_pylist()) == \
+        [0, 2, 3, 5]
+
+
+def test_manifest_rebuild(storage):
+    for _step in range(4):
+        storage.store_metrics(mode='a', epoch=0, step=_step)
+    _df_file = storage.store_fields_folder.items['store_metrics']
+    # file copied by hand is not known until manifest is rebuilt
+    _dir = _data_files(_df_file)[0].parent
+    _table = pa.table({"step": [100]})
+    with pa.OSFile((_dir / f"{2 ** 62}.0").as_posix(), 'wb') as _sink:
+        with pa.ipc.new_file(_sink, _table.schema) as _writer:
+            _writer.write_table(_table)
+    assert len(storage.store_metrics(mode='r')) == 4
+    assert _df_file.rebuild_manifest() == 5
+    assert storage.store_metrics(mode='r')['step'].to_pylist() == \
+        [0, 1, 2, 3, 100]
+    # missing manifest is rebuilt on first access
+    (_df_file.path / "_manifest").unlink()
+    _df_file.internal.manifest = None
+    assert len(storage.store_metrics(mode='r')) == 5
+    _check_manifest(_df_file)
+
+
+@pytest.mark.parametrize(
+    "filters, num_files",
+    [
+        ([('step', '>=', 8)], 2),
+        ([('step', '=', 100)], 0),
+        ([('step', 'in', [1, 5, 100])], 2),
+        ([('step', '>', 2), ('step', '<', 5)], 2),
+        ([('epoch', '=', 0), ('step', '<', 2)], 1),
+        ([[('step', '<', 1)], [('step', '>', 8)]], 2),
+        # conservative for ops that stats cannot decide and unknown columns
+        ([('step', '!=', 3)], 10),
+        ([('step', 'not in', [3])], 10),
+        ([('loss', '>', 0)], 10),
+    ]
+)
+def test_stats_pruning(storage, filters, num_files):
+    for _step in range(10):
+        storage.store_metrics(mode='a', epoch=_step % 2, step=_step)
+    _df_file = storage.store_fields_folder.items['store_metrics']
+    # noinspection PyProtectedMember
+    assert len(df_file._make_dataset(_df_file, filters=filters).files) == \
+        num_files
+    if 'loss' in df_file.filter_columns(filters):
+        return
+    # pruned read is same as full read
+    _expression = df_file.bake_expression(
+        _elements=filters, _err_msg="test filters")
+    _pruned, _full = [
+        _df_file.read_if_exists(
+            columns=['step'], filter_expression=_expression, filters=_filters,
+        ) for _filters in [filters, None]
+    ]
+    # note that None is returned when no rows match
+    assert (_pruned is None) == (_full is None) == (num_files == 0)
+    if _pruned is not None:
+        assert sorted(_pruned['step'].to_pylist()) == \
+            sorted(_full['step'].to_pylist())
+
+
+@pytest.mark.parametrize(
+    "name, num_files",
+    [("store_yield", 25), ("store_yield_buffered", 3),
+     ("store_yield_pipelined", 25)]
+)
+def test_yielding_writes(storage, name, num_files):
+    _method = getattr(storage, name)
+    assert _method(mode='a', num_steps=25)
+    _df_file = storage.store_fields_folder.items[name]
+    assert len(_data_files(_df_file)) == num_files
+    assert _method(mode='r')['step'].to_pylist() == list(range(25))
+    # everything yielded before exception is on disk
+    with pytest.raises(ValueError):
+        _method(mode='a', num_steps=25, fail_at=15)
+    assert _method(mode='r')['step'].to_pylist() == \
+        list(range(25)) + list(range(15))
+    _check_manifest(_df_file)
+
+
+def test_write_pipeline_same_as_serial(storage):
+    for _name in ["store_yield", "store_yield_pipelined"]:
+        _method = getattr(storage, _name)
+        for _ in range(3):
+            assert _method(mode='a', num_steps=20)
+    # files are named in the order tables were yielded
+    assert storage.store_yield_pipelined(mode='r') == \
+        storage.store_yield(mode='r')
+
+
+def test_streamed_write(storage):
+    with storage():
+        for _step in range(5):
+            assert storage.store_metrics_streamed(
+                mode='a', epoch=_step % 2, step=_step)
+        # rows are not visible till with context exits
+        assert not storage.store_metrics_streamed(mode='e')
+    _df_file = storage.store_fields_folder.items['store_metrics_streamed']
+    # one file per partition
+    assert sorted([_.suffix for _ in _data_files(_df_file)]) == ['.s0'] * 2
+    assert storage.store_metrics_streamed(
+        mode='r', epoch=0)['step'].to_pylist() == [0, 2, 4]
+    _check_manifest(_df_file)
+    # outside with context it is usual append
+    assert storage.store_metrics_streamed(mode='a', epoch=0, step=5)
+    assert len(_data_files(_df_file)) == 3
+    assert len(storage.store_metrics_streamed(mode='r')) == 6
+
+
+def test_streamed_write_rotates_files(storage):
+    with storage():
+        for _step in range(200):
+            assert storage.store_metrics_streamed(
+                mode='a', epoch=0, step=_step)
+        # files that grew beyond max_file_size are already visible
+        _visible = len(storage.store_metrics_streamed(mode='r'))
+        assert 0 < _visible < 200
+    _df_file = storage.store_fields_folder.items['store_metrics_streamed']
+    assert 1 < len(_data_files(_df_file)) < 200
+    assert storage.store_metrics_streamed(
+        mode='r')['step'].to_pylist() == list(range(200))
+    _check_manifest(_df_file)
+
+
+def test_read_since_after_compaction(storage):
+    _watermark, _steps = 0, []
+    for _step in range(12):
+        storage.store_compacted(mode='a', epoch=0, step=_step)
+        _df_file = storage.store_fields_folder.items['store_compacted']
+        # compaction merges files that were already read with new files
+        _df_file.wait_for_compaction()
+        _table, _watermark = _df_file.read_since(_watermark)
+        _steps += _table['step'].to_pylist()
+        assert _steps == sum([[_] * 10 for _ in range(_step + 1)], [])
+    assert len(_data_files(_df_file)) < 12
+
+
+_EVENTS = {
+    "g": [1, None, 1, 2, None, 2, 3],
+    "x": [1.0, 2.0, None, 4.0, None, 6.0, None],
+    "i": [1, 2, 3, None, 5, 6, 7],
+    "s": ["b", None, "a", "c", "d", None, None],
+}
+_EVENT_AGGREGATIONS = {
+    "x_count": ("x", "count"), "x_sum": ("x", "sum"),
+    "x_min": ("x", "min"), "x_max": ("x", "max"), "x_mean": ("x", "mean"),
+    "i_sum": ("i", "sum"), "i_max": ("i", "max"), "i_mean": ("i", "mean"),
+    "s_min": ("s", "min"), "s_count": ("s", "count"),
+}
+
+
+def _store_events(storage: Storage):
+    # in two files so that partial results are combined
+    for _start, _end in [(0, 4), (4, 7)]:
+        storage.store_events(
+            mode='a',
+            data={_k: _v[_start:_end] for _k, _v in _EVENTS.items()},
+        )
+
+
+@pytest.mark.parametrize("batch_size, threads", [(None, 1), (2, 2)])
+def test_aggregate_null_groups(storage, batch_size, threads):
+    _store_events(storage)
+    _table = storage.store_events(
+        mode='agg',
+        mode_options={
+            'group_by': ['g'], 'aggregations': _EVENT_AGGREGATIONS,
+            'batch_size': batch_size, 'threads': threads,
+        },
+    )
+    # null group keys are one group that is sorted at end while groups
+    # with only null values give null
+    assert _table.to_pydict() == {
+        "g": [1, 2, 3, None],
+        "x_count": [1, 2, 0, 1],
+        "x_sum": [1.0, 10.0, None, 2.0],
+        "x_min": [1.0, 4.0, None, 2.0],
+        "x_max": [1.0, 6.0, None, 2.0],
+        "x_mean": [1.0, 5.0, None, 2.0],
+        "i_sum": [4, 6, 7, 7],
+        "i_max": [3, 6, 7, 5],
+        "i_mean": [2.0, 6.0, 7.0, 3.5],
+        "s_min": ["a", "c", None, "d"],
+        "s_count": [2, 1, 0, 1],
+    }
+    assert _table.schema.field("i_sum").type == pa.int64()
+    assert _table.schema.field("s_min").type == pa.string()
+
+
+def test_aggregate_without_groups(storage):
+    _store_events(storage)
+    assert storage.store_events(
+        mode='agg', filters=[('i', '>', 2)],
+        mode_options={
+            'aggregations': {'rows': ('i', 'count'), 'x': ('x', 'sum')}},
+    ).to_pydict() == {'rows': [4], 'x': [6.0]}
+    # without group_by there is always one row
+    assert storage.store_events(
+        mode='agg', filters=[('i', '>', 100)],
+        mode_options={
+            'aggregations': {'rows': ('i', 'count'), 'x': ('x', 'sum')}},
+    ).to_pydict() == {'rows': [0], 'x': [None]}
+
+
+@pytest.mark.parametrize(
+    "mode_options",
+    [None, {'group_by': ['g']}, {'aggregations': {}, 'columns': ['g']}]
+)
+def test_aggregate_mode_options(storage, mode_options):
+    _store_events(storage)
+    with pytest.raises(SystemExit):
+        storage.store_events(mode='agg', mode_options=mode_options)
+
+
+def test_read_cache_invalidation(storage):
+    for _epoch in range(3):
+        storage.store_cached(mode='a', epoch=_epoch)
+    _df_file = storage.store_fields_folder.items['store_cached']
+    _READ_CACHE.clear()
+    _stats = _READ_CACHE.stats
+    _scan_count = _df_file.internal.scan_count
+
+    def _read() -> pa.Table:
+        return storage.store_cached(
+            mode='r', filters=[('label', '>', 4), ('epoch', 'in', [0, 1])])
+
+    # same read ... note that order of filters does not matter
+    _table = _read()
+    assert storage.store_cached(
+        mode='r', filters=[('epoch', 'in', [1, 0]), ('label', '>', 4)]
+    ) is _table
+    assert len(_table) == 1000
+    assert _df_file.internal.scan_count == _scan_count + 1
+    assert _READ_CACHE.stats['hits'] == _stats['hits'] + 1
+    # append invalidates
+    storage.store_cached(mode='a', epoch=0)
+    assert len(_read()) == 1500
+    assert _df_file.internal.scan_count == _scan_count + 2
+    # delete invalidates
+    storage.store_cached(mode='d', epoch=1)
+    assert len(_read()) == 1000
+    assert _df_file.internal.scan_count == _scan_count + 3
+    # write from other process (i.e. other DfFile instance) invalidates
+    Storage(root=storage.root).store_cached(mode='a', epoch=1)
+    assert len(_read()) == 1500
+    assert _df_file.internal.scan_count == _scan_count + 4
+    assert len(_read()) == 1500
+    assert _df_file.internal.scan_count == _scan_count + 4
+
+
+def test_read_cache_is_bounded(storage):
+    storage.store_cached(mode='a', epoch=0)
+    _READ_CACHE.clear()
+    _evictions = _READ_CACHE.stats['evictions']
+    for _label in range(5):
+        storage.store_cached(mode='r', filters=[('label', '=', _label)])
+    assert _READ_CACHE.stats['entries'] == 3
+    assert _READ_CACHE.stats['evictions'] == _evictions + 2
+    assert _READ_CACHE.stats['bytes'] == sum(
+        [_[1].nbytes for _ in _READ_CACHE.entries.values()])
+
+
+def test_read_store_field(tmp_path):
+    _sweep = [Storage(root=(tmp_path / str(_)).as_posix()) for _ in range(4)]
+    # hashable that never stored anything is skipped
+    for _storage in _sweep[:3]:
+        for _step in range(6):
+            _storage.store_metrics(mode='a', epoch=_step % 2, step=_step)
+    _tables = [
+        _storage.store_metrics(mode='r', filters=[('step', '>=', 3)])
+        for _storage in _sweep[:3]
+    ]
+    _table = s.read_store_field(
+        hashables=_sweep, store_field_name='store_metrics',
+        filters=[('step', '>=', 3)],
+    )
+    assert _table.drop(['owner']) == pa.concat_tables(_tables)
+    assert _table['owner'].to_pylist() == sum(
+        [[_s.name] * len(_t) for _s, _t in zip(_sweep, _tables)], [])
+    # owner column can be used in columns and filters
+    _table = s.read_store_field(
+        hashables=_sweep, store_field_name='store_metrics',
+        columns=['owner', 'step'], owner='hex_hash',
+        filters=[('owner', '=', _sweep[1].hex_hash), ('epoch', '=', 1)],
+    )
+    assert _table.to_pydict() == {
+        'owner': [_sweep[1].hex_hash] * 3, 'step': [1, 3, 5]}
+    # nothing on disk
+    assert s.read_store_field(
+        hashables=_sweep[3:], store_field_name='store_metrics') is None
+    for _storage in _sweep:
+        _storage.store_fields_folder.delete()
+
+
+def test_row_deletes(storage):
+    for _epoch in range(2):
+        for _step in range(20):
+            storage.store_metrics(mode='a', epoch=_epoch, step=_step)
+    _df_file = storage.store_fields_folder.items['store_metrics']
+    # merge steps 0-9 and 10-19 of each epoch in separate files
+    for _epoch in range(2):
+        for _start in [0, 10]:
+            # noinspection PyProtectedMember
+            _df_file._merge_files(
+                entries=[
+                    _ for _ in df_file._get_manifest(_df_file).sorted_entries
+                    if _.partition['epoch'] == _epoch and
+                    _start <= _.stats['step'][0] < _start + 10
+                ],
+                target_file_size=1024 * 1024,
+            )
+    assert len(_data_files(_df_file)) == 4
+
+    def _steps(epoch: int) -> t.List[int]:
+        return storage.store_metrics(
+            mode='r', epoch=epoch)['step'].to_pylist()
+
+    # files that cannot match as per stats are not rewritten
+    _files = set(_data_files(_df_file))
+    assert storage.store_metrics(mode='d', filters=[('step', '>=', 15)])
+    assert len(_files & set(_data_files(_df_file))) == 2
+    assert _steps(0) == _steps(1) == list(range(15))
+    # nothing more to delete
+    assert not storage.store_metrics(mode='d', filters=[('step', '>=', 15)])
+    # DNF filters with partition columns
+    assert storage.store_metrics(
+        mode='d',
+        filters=[
+            [('epoch', '=', 0), ('step', '<', 3)],
+            [('epoch', '=', 1), ('step', 'in', [7, 8])],
+        ]
+    )
+    assert _steps(0) == list(range(3, 15))
+    assert _steps(1) == [_ for _ in range(15) if _ not in [7, 8]]
+    # partition kwarg is `and`ed with DNF filters
+    assert storage.store_metrics(
+        mode='d', epoch=1, filters=[[('step', '=', 0)], [('step', '=', 1)]])
+    assert _steps(0) == list(range(3, 15))
+    assert _steps(1) == [_ for _ in range(2, 15) if _ not in [7, 8]]
+    _check_manifest(_df_file)
+    # deleting all rows of files removes them
+    assert storage.store_metrics(mode='d', filters=[('step', '>=', 0)])
+    assert not storage.store_metrics(mode='e')
+    assert _data_files(_df_file) == []
+    assert _df_file.rebuild_manifest() == 0
+
+
+def test_row_deletes_keep_null_rows(storage):
+    _store_events(storage)
+    # rows for which filter evaluates to null are not deleted
+    assert storage.store_events(mode='d', filters=[('x', '>', 1.5)])
+    assert storage.store_events(mode='r').to_pydict() == {
+        "g": [1, 1, None, 3],
+        "x": [1.0, None, None, None],
+        "i": [1, 3, 5, 7],
+        "s": ["b", "a", "d", None],
+    }
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_parallel_delete(storage, threads):
+    for _a in range(3):
+        for _b in range(6):
+            storage.store_with_partition_cols(mode='w', a=_a, b=_b)
+    _df_file = storage.store_fields_folder.items['store_with_partition_cols']
+    # dry run reports files without deleting them
+    _files = storage.store_with_partition_cols(
+        mode='d', filters=[('b', '>', 3)],
+        mode_options={'dry_run': True, 'threads': threads},
+    )
+    assert len(_files) == 3 * 2
+    assert len(_data_files(_df_file)) == 3 * 6
+    assert storage.store_with_partition_cols(
+        mode='d', filters=[('b', '>', 3)], mode_options={'threads': threads})
+    assert set(
+        [_.as_posix() for _ in _data_files(_df_file)]
+    ).isdisjoint([pathlib.Path(_).as_posix() for _ in _files])
+    assert len(storage.store_with_partition_cols(mode='r')) == 3 * 4 * 4
+    # empty partition folders are removed
+    assert len(list(_df_file.path.glob("*/*"))) == 3 * 4
+    _check_manifest(_df_file)
+    assert storage.store_with_partition_cols(
+        mode='d', mode_options={'threads': threads})
+    assert not storage.store_with_partition_cols(mode='e')
+
+
+def test_delete_mode_options(storage):
+    storage.store_with_partition_cols(mode='w', a=1, b=2)
+    with pytest.raises(SystemExit):
+        storage.store_with_partition_cols(
+            mode='d', mode_options={'batch_size': 10})
+    assert storage.store_with_partition_cols(mode='e')
+
+
+def test_aio(storage):
+    async def _main():
+        # appends to same DfFile are written in the order of calls
+        assert all(
+            await asyncio.gather(
+                *[
+                    storage.aio.store_metrics(mode='a', epoch=0, step=_step)
+                    for _step in range(20)
+                ]
+            )
+        )
+        assert await storage.aio.store_metrics(mode='e', epoch=0)
+        _table = await storage.aio.store_metrics(mode='r', epoch=0)
+        assert _table['step'].to_pylist() == list(range(20))
+
+        # streaming reads give async iterator
+        _steps = []
+        async for _batch in await storage.aio.store_metrics(
+            mode='s', epoch=0, mode_options={'batch_size': 3},
+        ):
+            _steps += _batch['step'].to_pylist()
+        assert _steps == list(range(20))
+
+    _loop = asyncio.new_event_loop()
+    try:
+        _loop.run_until_complete(_main())
+    finally:
+        _loop.close()
+    # only methods decorated with StoreField are available
+    with pytest.raises(SystemExit):
+        storage.aio.losses
+    with pytest.raises(AttributeError):
+        storage.aio._call_helper
@@ -0,0 +1,74 @@
+"""Tests for `toolcraft.util`."""
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from toolcraft import util
+
+
+@pytest.mark.parametrize(
+    "dtype",
+    [
+        np.uint8, np.int64, np.float16, np.float32, ">f8", np.bool_,
+        # datetime64 and timedelta64 with units arrow has and does not have
+        "M8[ns]", "M8[us]", "M8[ms]", "M8[s]", "M8[m]", "M8[h]", "M8[D]",
+        "M8[W]", "M8[M]", "M8[Y]",
+        "m8[ns]", "m8[s]", "m8[m]", "m8[D]",
+    ]
+)
+@pytest.mark.parametrize("shape", [(5,), (5, 3), (5, 2, 3, 4)])
+def test_np_to_pa_round_trip(dtype, shape):
+    _a = (np.arange(np.prod(shape)) % 2 ** 7).reshape(shape).astype(dtype)
+    _field = util.np_to_pa_field("x", _a)
+    _pa_a = util.np_to_pa(_a)
+    assert _pa_a.type == _field.type
+    assert len(_pa_a) == shape[0]
+    # fields are needed to restore dtype of units arrow does not have
+    _b = util.pa_to_np(_pa_a, field=_field)
+    assert _b.dtype == _a.dtype and _b.shape == _a.shape
+    assert (_b == _a).all()
+    # more than one chunk
+    _b = util.pa_to_np(pa.chunked_array([_pa_a, _pa_a]), field=_field)
+    assert (_b == np.concatenate([_a, _a])).all()
+
+
+@pytest.mark.parametrize(
+    "dtype", ["M8[ns]", "M8[us]", "M8[ms]", "M8[s]", "M8[D]"]
+)
+def test_np_to_pa_datetime_values(dtype):
+    # values must be same as when arrow converts numpy array itself
+    _a = np.asarray(
+        ["1969-07-20T20:17", "2000-01-01", "2038-01-19T03:14:08"],
+        dtype=dtype,
+    )
+    assert util.np_to_pa(_a).equals(pa.array(_a))
+    assert (util.pa_to_np(util.np_to_pa(_a)) == _a).all()
+
+
+@pytest.mark.parametrize("shape", [(2, 0, 3), (2, 3, 0), (0, 0), (0, 2, 3)])
+def test_np_to_pa_zero_size_dims(shape):
+    _a = np.zeros(shape, dtype=np.uint8)
+    _field = util.np_to_pa_field("x", _a)
+    _pa_a = util.np_to_pa(_a)
+    assert _pa_a.type == _field.type
+    _b = util.pa_to_np(_pa_a, field=_field)
+    assert _b.dtype == _a.dtype and _b.shape == _a.shape
+
+
+def test_pa_fixed_size_lists_to_lists():
+    _a = np.arange(2 * 3 * 4).reshape((2, 3, 4))
+    _nested_lists = pa.table({"x": pa.array(util.np_to_lnp(_a)), "y": [1, 2]})
+    _fixed_size_lists = pa.table({"x": util.np_to_pa(_a), "y": [1, 2]})
+    _table = util.pa_fixed_size_lists_to_lists(
+        _fixed_size_lists, _nested_lists.schema)
+    assert _table.equals(_nested_lists)
+    # sliced arrays i.e. with offsets
+    _table = util.pa_fixed_size_lists_to_lists(
+        _fixed_size_lists.slice(1), _nested_lists.schema)
+    assert _table.equals(_nested_lists.slice(1))
+    # incompatible columns are left as is
+    _other = pa.schema([pa.field("x", pa.list_(pa.list_(pa.string()))),
+                        pa.field("y", pa.int64())])
+    _table = util.pa_fixed_size_lists_to_lists(_fixed_size_lists, _other)
+    assert _table.equals(_fixed_size_lists)
@@ -24,7 +24,10 @@ from yaspin.core import Yaspin
 # log dirs
 # todo: use `tooling.tool.config` to get these settings from user or
 #  configure them
-LOG_DIR = pathlib.Path("C:\\.log")
+# note that on posix "C:\\.log" is not a drive but a relative folder that
+#  would get created in current working directory
+LOG_DIR = pathlib.Path("C:\\.log") if sys.platform == "win32" else \
+    pathlib.Path.home() / ".log"
 MULTIPROCESSING_LOG_DIR = LOG_DIR / "multiprocessing"
 # todo: still not supported
 MAX_LOG_FILE_SIZE = 20 * 1024 * 1024  # 20MB
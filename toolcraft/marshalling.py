@@ -1055,6 +1055,29 @@ class HashableClass(YamlRepr, abc.ABC):
             for_hashable=self,
         )
 
+    @property
+    @util.CacheResult
+    def aio(self) -> "storage.StoreFieldsAio":
+        """
+        Awaitable variants of methods decorated by StoreField i.e.
+        `await self.aio.some_method(mode='r')` (see StoreFieldsAio)
+        """
+        from . import storage
+        return storage.StoreFieldsAio(hashable=self)
+
+    def on_exit(self):
+        # finalize files kept open by StoreFields with `streamed_write` ...
+        # note that we do not create store_fields_folder if never used
+        # ... super is called even if closing fails so that on_call_kwargs
+        # are reset
+        try:
+            _cache = self.__dict__.get(util.CACHE_KEY, {})
+            if 'store_fields_folder' in _cache.keys():
+                _cache['store_fields_folder'].close_streams()
+        finally:
+            # call super
+            super().on_exit()
+
     # do not cache as dynamic list will be popped out and the reference to
     # spinner will hang on and ... on consecutive calls cached spinners from
     # past runs will get used
@@ -8,6 +8,7 @@ import pathlib
 import datetime
 import dataclasses
 import abc
+import contextlib
 
 from .. import util, logger, settings
 from .. import marshalling as m
@@ -300,13 +301,14 @@ class StorageHashable(m.HashableClass, abc.ABC):
 
         # ----------------------------------------------------------- 02
         # if root dir does not exist make it
-        if not self.path.exists():
-            self.path.mkdir(parents=True)
+        # (exist_ok as other process might be creating it at same time)
+        self.path.mkdir(parents=True, exist_ok=True)
 
         # ----------------------------------------------------------- 03
         # if not created create
-        if not self.is_created:
-            self.create()
+        with self.create_lock():
+            if not self.is_created:
+                self.create()
 
         # ----------------------------------------------------------- 04
         # if has parent_folder add self to items
@@ -395,6 +397,13 @@ class StorageHashable(m.HashableClass, abc.ABC):
         # noinspection PyArgumentList
         return cls(**yaml_state)
 
+    def create_lock(self) -> t.ContextManager:
+        """
+        Lock under which state files are checked and created. Override it if
+        other processes can create same StorageHashable at same time.
+        """
+        return contextlib.nullcontext()
+
     def create_pre_runner(self):
         # check if already created
         if self.is_created:
@@ -742,6 +751,14 @@ class Folder(StorageHashable):
         if self.contains is not None:
             self.sync()
 
+    def create_lock(self) -> util.FileLock:
+        """
+        State files of Folder are next to it in parent dir so we lock the
+        parent dir (which is also what parent Folder locks while syncing its
+        items). This lets many processes create same Folder concurrently.
+        """
+        return util.FileLock(path=self.path.parent)
+
     def create(self) -> pathlib.Path:
         """
         If there is no Folder we create an empty folder.
@@ -849,7 +866,11 @@ class Folder(StorageHashable):
 
         # -----------------------------------------------------------------02
         # track for registered file groups
-        for f in self.path.iterdir():
+        # note that we list state files under the lock that items take
+        # while creating state files so that we never see half created items
+        with util.FileLock(path=self.path):
+            _paths = list(self.path.iterdir())
+        for f in _paths:
             # *** NOTE ***
             # We skip anything that does not end with *.info this will also
             # skip files that are not StorageHashable .... but that is okay
@@ -2,9 +2,13 @@ from .__base__ import Folder, HashesDict, StorageHashable
 from .state import Info, Config
 from .file_group import FileGroup, NpyMemMap, SHUFFLE_SEED_TYPE, \
     DETERMINISTIC_SHUFFLE, NO_SHUFFLE, DO_NOT_USE, USE_ALL, \
-    SELECT_TYPE, NON_DETERMINISTIC_SHUFFLE, FileGroupConfig
+    SELECT_TYPE, NON_DETERMINISTIC_SHUFFLE, FileGroupConfig, \
+    BlockShuffle, WindowedShuffle, FeistelShuffle
 from .file_group import DownloadFileGroup, NpyFileGroup, TempFileGroup
-from .store import StoreField, StoreFieldsFolder, Mode, MODE_TYPE, \
-    is_store_field
-from .df_file import FILTERS_TYPE, FILTER_TYPE
+from .store import StoreField, StoreFieldsFolder, StoreFieldsAio, Mode, \
+    MODE_TYPE, is_store_field, read_store_field
+from .df_file import FILTERS_TYPE, FILTER_TYPE, AGGREGATION_TYPE, \
+    AGGREGATIONS_TYPE, DfFileFormat, \
+    DfFileCompactionPolicy, DfFileWriteBuffer, DfFileWritePipeline, \
+    DfFileStreamedWrite, DfFileReadCache
 # from .tf_chkpt import TfChkptFile, TfChkptFilesManager
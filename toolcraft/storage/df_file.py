@@ -8,7 +8,8 @@ todo: Stream writes and reads from pyarrow to pandas Dataframe
 
 
 *** Parquet vs Feather ***
-todo: we will support both
+We support both (see `DfFileFormat` which is configured per StoreField and
+persisted in DfFileConfig)
   + parquet for long term storage of the analysis
   + feather for short term storage for analysis and building visualization
     server
@@ -48,9 +49,22 @@ import dataclasses
 import pyarrow as pa
 import pyarrow.fs as pafs
 import pyarrow.dataset as pds
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import types
 import operator
 import time
+import threading
+import queue
+import collections
+import concurrent.futures
+import contextlib
+import urllib.parse
+import json
+import os
+import re
+import socket
+import numpy as np
 
 from .. import util
 from .. import error as e
@@ -60,9 +74,34 @@ from . import file_system as our_fs
 from . import Folder
 
 _PARTITIONING = "hive"
-# _FILE_FORMAT = pds.ParquetFileFormat()
-# _FILE_FORMAT = pds.CsvFileFormat()
-_FILE_FORMAT = pds.IpcFileFormat()
+
+# pyarrow dataset discovery ignores files and folders starting with these
+# prefixes ... we use them for lock files and temporary files
+_IGNORE_PREFIXES = (".", "_")
+_LOCK_FILE_NAME = "_lock"
+_COMPACT_LOCK_FILE_NAME = "_compact.lock"
+_COMPACT_TEMP_PREFIX = "_compacting_"
+_STREAM_TEMP_PREFIX = "_streaming_"
+_WRITE_TEMP_PREFIX = "_writing_"
+_DELETE_TEMP_PREFIX = "_deleting_"
+# rows per batch while rewriting files for row level delete (see
+# `DfFile.delete_`)
+_DELETE_BATCH_SIZE = 64 * 1024
+# default number of threads used by `DfFile.delete_` to remove and rewrite
+# files ... helps a lot on network disks where every call has latency
+_DELETE_THREADS = 8
+_CONFIG_LOCK_FILE_NAME = "_config.lock"
+# host name usable in file names (see `_writer_id`)
+_HOST_NAME = re.sub(r"[^0-9A-Za-z]", "", socket.gethostname()) or "host"
+_MANIFEST_FILE_NAME = "_manifest"
+_MANIFEST_LOCK_FILE_NAME = "_manifest.lock"
+
+FILE_FORMAT_NAME_TYPE = t.Literal['ipc', 'parquet']
+# noinspection PyUnresolvedReferences
+_COMPRESSIONS = {
+    'ipc': [None, 'lz4', 'zstd'],
+    'parquet': [None, 'snappy', 'gzip', 'brotli', 'lz4', 'zstd'],
+}
 
 
 # see documentation for filters in pyarrow
@@ -80,6 +119,12 @@ FILTER_TYPE = t.Tuple[
 FILTERS_TYPE = t.List[t.Union[FILTER_TYPE, t.List[FILTER_TYPE]]]
 
 
+# aggregations supported by aggregate mode (see `DfFile.aggregate`) ...
+# keys are output column names and values are (column, aggregation)
+AGGREGATION_TYPE = t.Literal['count', 'sum', 'min', 'max', 'mean']
+AGGREGATIONS_TYPE = t.Dict[str, t.Tuple[str, AGGREGATION_TYPE]]
+
+
 # todo: check pds.Expression for more operations that are supported
 
 _OP_MAPPER = {
@@ -123,6 +168,427 @@ _OP_MAPPER_EXP = {
 }
 
 
+
+def _none_aware(_fn: t.Callable) -> t.Callable:
+    """
+    Combines two partial results where None means nothing to combine
+    """
+    return lambda _a, _b: _b if _a is None else (
+        _a if _b is None else _fn(_a, _b))
+
+
+class _Aggregation(t.NamedTuple):
+    """
+    Aggregation that can be computed in parts (i.e. per batch) and combined
+    later (see `DfFile.aggregate`)
+
+    partial: partial result for array
+    combine: combines two partial results
+    finalize: result from partial result
+    output_type: output type for input type
+    """
+    partial: t.Callable[[t.Union[pa.Array, pa.ChunkedArray]], t.Any]
+    combine: t.Callable[[t.Any, t.Any], t.Any]
+    finalize: t.Callable[[t.Any], t.Any]
+    output_type: t.Callable[[pa.DataType], pa.DataType]
+
+
+_AGGREGATIONS = {
+    'count': _Aggregation(
+        partial=lambda _a: len(_a) - _a.null_count,
+        combine=operator.add,
+        finalize=lambda _p: _p,
+        output_type=lambda _t: pa.int64(),
+    ),
+    'sum': _Aggregation(
+        partial=lambda _a: pc.sum(_a).as_py(),
+        combine=_none_aware(operator.add),
+        finalize=lambda _p: _p,
+        output_type=lambda _t: pc.sum(pa.array([], type=_t)).type,
+    ),
+    'min': _Aggregation(
+        partial=lambda _a: pc.min_max(_a).as_py()['min'],
+        combine=_none_aware(min),
+        finalize=lambda _p: _p,
+        output_type=lambda _t: _t,
+    ),
+    'max': _Aggregation(
+        partial=lambda _a: pc.min_max(_a).as_py()['max'],
+        combine=_none_aware(max),
+        finalize=lambda _p: _p,
+        output_type=lambda _t: _t,
+    ),
+    'mean': _Aggregation(
+        partial=lambda _a: (pc.sum(_a).as_py(), len(_a) - _a.null_count),
+        combine=lambda _a, _b: (
+            _none_aware(operator.add)(_a[0], _b[0]), _a[1] + _b[1]),
+        finalize=lambda _p: None if _p[1] == 0 else _p[0] / _p[1],
+        output_type=lambda _t: pa.float64(),
+    ),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class DfFileFormat:
+    """
+    File format used to store DfFile on the disk.
+
+    + name='ipc' is Arrow IPC (aka feather v2) which can be optionally
+      compressed with lz4 or zstd ... good for short term storage
+    + name='parquet' is more expensive to write but thanks to dictionary
+      encoding and compression the files are much smaller ... good for long
+      term storage
+
+    Note that this is persisted in DfFileConfig as dict so that reads and
+    writes for existing DfFile always respect the format on disk.
+
+    Args:
+        name: one of 'ipc' or 'parquet'
+        compression: codec for compression (None means uncompressed)
+        compression_level: codec specific compression level
+        row_group_size: max rows per row group (parquet) or record batch (ipc)
+        use_dictionary: dictionary encoding (only for parquet)
+    """
+    name: FILE_FORMAT_NAME_TYPE = 'ipc'
+    compression: t.Optional[str] = None
+    compression_level: t.Optional[int] = None
+    row_group_size: t.Optional[int] = None
+    use_dictionary: t.Optional[bool] = None
+
+    @property
+    @util.CacheResult
+    def pds_format(self) -> pds.FileFormat:
+        if self.name == 'ipc':
+            return pds.IpcFileFormat()
+        elif self.name == 'parquet':
+            return pds.ParquetFileFormat()
+        else:
+            e.code.ShouldNeverHappen(msgs=[f"Unknown format {self.name}"])
+            raise
+
+    def __post_init__(self):
+        # validate name
+        # noinspection PyUnresolvedReferences
+        e.validation.ShouldBeOneOf(
+            value=self.name, values=FILE_FORMAT_NAME_TYPE.__args__,
+            msgs=["Unsupported file format for DfFile"]
+        )
+        # validate compression
+        e.validation.ShouldBeOneOf(
+            value=self.compression, values=_COMPRESSIONS[self.name],
+            msgs=[f"Unsupported compression for file format {self.name!r}"]
+        )
+        # compression level makes sense only when compressed
+        if self.compression is None and self.compression_level is not None:
+            e.code.NotAllowed(
+                msgs=[
+                    f"You cannot supply compression_level when compression "
+                    f"is not used"
+                ]
+            )
+        # dictionary encoding only for parquet
+        if self.name != 'parquet' and self.use_dictionary is not None:
+            e.code.NotAllowed(
+                msgs=[
+                    f"use_dictionary can only be used with file format "
+                    f"'parquet'"
+                ]
+            )
+
+    def as_dict(self) -> t.Dict[str, t.Any]:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: t.Optional[t.Dict[str, t.Any]]) -> "DfFileFormat":
+        # None means DfFile was written before file format was configurable
+        # and hence we default to uncompressed ipc
+        if d is None:
+            return cls()
+        return cls(**d)
+
+
+@dataclasses.dataclass(frozen=True)
+class DfFileCompactionPolicy:
+    """
+    Policy for automatic compaction of partition folders after every append
+    (see `DfFile.compact`).
+
+    A partition folder is compacted when it has more than `max_files` files
+    or more than `max_small_files` files that are smaller than
+    `small_file_size` bytes.
+
+    Args:
+        max_files: compact when partition has more files than this
+        max_small_files: compact when partition has more small files than this
+        small_file_size: files smaller than this (in bytes) are small files
+        target_file_size: approximate size in bytes of merged files
+        background: if True compaction happens in background thread
+    """
+    max_files: t.Optional[int] = None
+    max_small_files: t.Optional[int] = None
+    small_file_size: int = 8 * 1024 * 1024
+    target_file_size: int = 128 * 1024 * 1024
+    background: bool = True
+
+    def __post_init__(self):
+        if self.max_files is None and self.max_small_files is None:
+            e.code.NotAllowed(
+                msgs=[
+                    f"Supply at least one of `max_files` or `max_small_files` "
+                    f"for {DfFileCompactionPolicy}"
+                ]
+            )
+        if self.small_file_size > self.target_file_size:
+            e.code.NotAllowed(
+                msgs=[
+                    f"small_file_size cannot be greater than target_file_size"
+                ]
+            )
+
+    def needs_compaction(self, file_sizes: t.List[int]) -> bool:
+        """
+        Args:
+            file_sizes: sizes in bytes of files in partition folder
+        """
+        if self.max_files is not None:
+            if len(file_sizes) > self.max_files:
+                return True
+        if self.max_small_files is not None:
+            _small_files = [
+                _ for _ in file_sizes if _ < self.small_file_size
+            ]
+            if len(_small_files) > self.max_small_files:
+                return True
+        return False
+
+
+@dataclasses.dataclass(frozen=True)
+class DfFileWriteBuffer:
+    """
+    Write coalescing buffer for StoreFields that yield. The yielded tables
+    are concatenated and written only when buffered rows or bytes reach the
+    thresholds (see `DfFile.append`). This avoids one file (and one
+    `_write_table` call) per yielded table when generators yield small
+    tables.
+
+    Buffer is always flushed when generator ends or raises exception, so
+    everything yielded before is on the disk like with unbuffered writes.
+
+    Args:
+        max_rows: flush when buffered rows reach this
+        max_bytes: flush when buffered bytes reach this
+    """
+    max_rows: t.Optional[int] = None
+    max_bytes: t.Optional[int] = 64 * 1024 * 1024
+
+    def __post_init__(self):
+        if self.max_rows is None and self.max_bytes is None:
+            e.code.NotAllowed(
+                msgs=[
+                    f"Supply at least one of `max_rows` or `max_bytes` for "
+                    f"{DfFileWriteBuffer}"
+                ]
+            )
+        for _k in ['max_rows', 'max_bytes']:
+            _v = getattr(self, _k)
+            if _v is not None and _v <= 0:
+                e.code.NotAllowed(
+                    msgs=[f"`{_k}` must be positive, found {_v}"]
+                )
+
+    def is_full(self, rows: int, nbytes: int) -> bool:
+        if self.max_rows is not None and rows >= self.max_rows:
+            return True
+        if self.max_bytes is not None and nbytes >= self.max_bytes:
+            return True
+        return False
+
+
+@dataclasses.dataclass(frozen=True)
+class DfFileWritePipeline:
+    """
+    Pipelined writes for StoreFields that yield. The decorated generator
+    keeps computing next tables in calling thread while the yielded tables
+    are encoded and written by pool of writer threads (see
+    `_PipelinedWriter`).
+
+    The files are named in the order tables are yielded so reads return
+    exactly same rows in same order as serial writes.
+
+    Args:
+        workers: number of writer threads
+        max_pending: max tables that are yielded but not yet written ...
+          generator is blocked when reached (i.e. backpressure that bounds
+          memory)
+    """
+    workers: int = 2
+    max_pending: int = 4
+
+    def __post_init__(self):
+        if self.workers <= 0:
+            e.code.NotAllowed(
+                msgs=[f"`workers` must be positive, found {self.workers}"]
+            )
+        if self.max_pending < self.workers:
+            e.code.NotAllowed(
+                msgs=[
+                    f"`max_pending` must be at least `workers`",
+                    {"workers": self.workers, "max_pending": self.max_pending}
+                ]
+            )
+
+
+class DfFileReadCache:
+    """
+    Opt-in in-process LRU cache of tables read by StoreFields (see
+    `StoreField.read_cache`). Useful when same read (i.e. same columns and
+    filters) is called many times e.g. by GUI callbacks.
+
+    Entries are keyed by DfFile path, columns and normalized filters and
+    remember the version of DfFile they were read from i.e. the version
+    counter bumped by `DfFile.append` and `DfFile.delete_` along with the
+    manifest state (which also changes when other processes write). So
+    writes only invalidate entries of affected DfFile.
+
+    The same instance can be shared by many StoreFields in which case
+    max_bytes bounds the memory of all of them.
+
+    Args:
+        max_bytes: evict least recently used tables when cached tables use
+          more memory than this
+        max_entries: evict least recently used tables when there are more
+          entries than this ... None means no limit
+    """
+
+    def __init__(
+        self, max_bytes: int = 256 * 1024 * 1024,
+        max_entries: t.Optional[int] = None,
+    ):
+        if max_bytes <= 0:
+            e.code.NotAllowed(
+                msgs=[f"`max_bytes` must be positive, found {max_bytes}"]
+            )
+        if max_entries is not None and max_entries <= 0:
+            e.code.NotAllowed(
+                msgs=[f"`max_entries` must be positive, found {max_entries}"]
+            )
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = \
+            collections.OrderedDict()  # type: t.Dict[tuple, tuple]
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.thread_lock = threading.Lock()
+
+    @property
+    def stats(self) -> t.Dict[str, int]:
+        with self.thread_lock:
+            return {
+                "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self.entries),
+                "bytes": self.nbytes,
+            }
+
+    @staticmethod
+    def make_key(
+        path: pathlib.Path,
+        columns: t.Optional[t.List[str]],
+        filters: t.Optional[FILTERS_TYPE],
+    ) -> tuple:
+        """
+        Note that filters are normalized so that the order of (`and`ed)
+        filters, `=` vs `==` and the order of values for `in` do not matter
+        """
+        def _normalize(_elements) -> tuple:
+            _ret = []
+            for _element in _elements:
+                if isinstance(_element, list):
+                    _ret.append(_normalize(_element))
+                    continue
+                _col, _op, _value = _element
+                if _op == '==':
+                    _op = '='
+                if isinstance(_value, (set, list, tuple)):
+                    _value = tuple(sorted(set(_value), key=repr))
+                _ret.append((_col, _op, _value))
+            return tuple(sorted(_ret, key=repr))
+
+        return (
+            path.as_posix(),
+            None if columns is None else tuple(columns),
+            _normalize(filters or []),
+        )
+
+    def get(self, key: tuple, version: tuple) -> t.Optional[pa.Table]:
+        with self.thread_lock:
+            _entry = self.entries.get(key, None)
+            if _entry is None or _entry[0] != version:
+                self.misses += 1
+                # stale entry is of no use
+                if _entry is not None:
+                    self._pop(key)
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return _entry[1]
+
+    def put(self, key: tuple, version: tuple, table: pa.Table):
+        _nbytes = table.nbytes
+        with self.thread_lock:
+            if key in self.entries.keys():
+                self._pop(key)
+            # too big to be cached
+            if _nbytes > self.max_bytes:
+                return
+            self.entries[key] = (version, table)
+            self.nbytes += _nbytes
+            while self.nbytes > self.max_bytes or (
+                self.max_entries is not None and
+                len(self.entries) > self.max_entries
+            ):
+                self._pop(next(iter(self.entries.keys())))
+                self.evictions += 1
+
+    def clear(self):
+        with self.thread_lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def _pop(self, key: tuple):
+        self.nbytes -= self.entries.pop(key)[1].nbytes
+
+
+@dataclasses.dataclass(frozen=True)
+class DfFileStreamedWrite:
+    """
+    Streamed writes for StoreFields that are appended very often (e.g.
+    metrics logged on every training step). While the owning hashable is
+    within `with` context every partition folder has one long-lived open
+    file (see `_StreamWriter`) and appends only add record batches (or row
+    groups for parquet) to it i.e. no file is created per append.
+
+    Files are finalized (i.e. made visible to readers and recorded in
+    manifest) when the with context exits or when they grow beyond
+    max_file_size in which case next append opens new file. Note that till
+    then the appended rows are not visible to readers.
+
+    Args:
+        max_file_size: rotate file when it grows beyond this many bytes
+    """
+    max_file_size: int = 128 * 1024 * 1024
+
+    def __post_init__(self):
+        if self.max_file_size <= 0:
+            e.code.NotAllowed(
+                msgs=[
+                    f"`max_file_size` must be positive, found "
+                    f"{self.max_file_size}"
+                ]
+            )
+
+
 def bake_expression(
     _elements: t.List, _err_msg, _columns_allowed=None,
     # todo: support validation against schema later ...
@@ -140,26 +606,30 @@ def bake_expression(
 
     # ---------------------------------------------------02
     # we always expect list and loop over it here
+    # Note that filters are in disjunctive normal form (DNF) i.e. nested
+    # lists are conjunctions that are `or`ed ... while tuples at top level
+    # are `and`ed with them (this allows to add partition column filters to
+    # DNF filters)
+    _disjunction = None
     for _element in _elements:
         # -----------------------------------------------02.01
         # if list recursion
         if isinstance(_element, list):
-            # todo: remove this limitation when we understand DNF queries
-            #   that is add support for filters that are nested lists
-            e.code.NotSupported(
-                msgs=[
-                    f"We will support nested filters list once we figure out "
-                    f"how DNF queries work ..."
-                ]
-            )
-            for _e in _element:
-                _r = bake_expression(_e, _err_msg, _columns_allowed, _schema)
-                if _expression is None:
-                    _expression = _r
-                else:
-                    # assuming that the the filters from nested list get
-                    # `and`ed with other elements in list
-                    _expression = operator.and_(_expression, _r)
+            if not bool(_element) or \
+                    any([isinstance(_e, list) for _e in _element]):
+                e.validation.NotAllowed(
+                    msgs=[
+                        _err_msg,
+                        f"Filters in DNF can be nested only once i.e. nested "
+                        f"list must be non empty list of filter tuples",
+                        f"Check {_element}",
+                    ]
+                )
+            _r = bake_expression(_element, _err_msg, _columns_allowed, _schema)
+            if _disjunction is None:
+                _disjunction = _r
+            else:
+                _disjunction = operator.or_(_disjunction, _r)
         # -----------------------------------------------02.02
         # if tuple bake expression
         elif isinstance(_element, tuple):
@@ -244,36 +714,568 @@ def bake_expression(
             )
 
     # ---------------------------------------------------03
+    # `and` with disjunction of nested conjunctions
+    if _disjunction is not None:
+        if _expression is None:
+            _expression = _disjunction
+        else:
+            _expression = operator.and_(_expression, _disjunction)
+
+    # ---------------------------------------------------04
     # return
     return _expression
 
 
+def filter_columns(_elements: t.Optional[FILTERS_TYPE]) -> t.Set[str]:
+    """
+    Returns set of column names used by filters (nested lists included)
+    """
+    _ret = set()
+    if _elements is None:
+        return _ret
+    for _element in _elements:
+        if isinstance(_element, list):
+            _ret |= filter_columns(_element)
+        else:
+            _ret.add(_element[0])
+    return _ret
+
+
+def _cast_filters(
+    _elements: FILTERS_TYPE, _schema: pa.Schema,
+) -> FILTERS_TYPE:
+    """
+    Casts filter values to the type of the columns in schema so that for
+    example `('b', '=', '77')` works for int partition column `b` as folder
+    names are anyways strings
+    """
+    def _cast(_value, _type):
+        try:
+            return pa.array([_value]).cast(_type)[0].as_py()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            e.code.CodingError(
+                msgs=[
+                    f"Check supplied filters",
+                    f"Value {_value!r} cannot be cast to type {_type}"
+                ]
+            )
+            raise
+
+    _ret = []
+    for _element in _elements:
+        if isinstance(_element, list):
+            _ret.append(_cast_filters(_element, _schema))
+            continue
+        _col, _op, _value = _element
+        # unknown columns are reported later by bake_expression
+        if _col not in _schema.names:
+            _ret.append(_element)
+            continue
+        _type = _schema.field(_col).type
+        if isinstance(_value, (set, list, tuple)):
+            _value = type(_value)([_cast(_, _type) for _ in _value])
+        else:
+            _value = _cast(_value, _type)
+        _ret.append((_col, _op, _value))
+    return _ret
+
+
+def _is_ignored(path: pathlib.Path) -> bool:
+    """
+    Files and folders that are ignored by pyarrow while discovering dataset
+    """
+    return path.name.startswith(_IGNORE_PREFIXES)
+
+
+def _file_time_ns(path: pathlib.Path) -> int:
+    """
+    Files are named `<time_ns>.<writer_id>.{i}` (see `_write_table`) while
+    compacted files are named `<min_time_ns>-<max_time_ns>.<writer_id>.c{i}`
+    (see `DfFile.compact`) and streamed files are named
+    `<open_time_ns>-<close_time_ns>.<writer_id>.s0` (see `_StreamWriter`)
+    and files rewritten by delete are named like compacted files but with
+    `.d<generation>` suffix (see `_rewrite_generation`).
+    Here we return the first time stamp. Note that files written before
+    writer_id was introduced do not have it.
+    """
+    return int(path.name.split(".")[0].split("-")[0])
+
+
+def _data_files(_dir: pathlib.Path) -> t.List[pathlib.Path]:
+    """
+    Data files in a folder sorted in the order they were written
+    """
+    return sorted(
+        [_ for _ in _dir.iterdir() if _.is_file() and not _is_ignored(_)],
+        key=lambda _: (_file_time_ns(_), _.name)
+    )
+
+
+def _file_time_range(path: pathlib.Path) -> t.Tuple[int, int]:
+    """
+    First and last time stamp of data written in file (see `_file_time_ns`)
+    """
+    _tokens = path.name.split(".")[0].split("-")
+    return int(_tokens[0]), int(_tokens[-1])
+
+
+def _rewrite_generation(path: pathlib.PurePath) -> int:
+    """
+    Files rewritten by row level delete (see `DfFile.delete_`) are named
+    `<min_time_ns>-<max_time_ns>.<writer_id>.d<generation>` where time range
+    is of the file they replace and generation is one more than generation
+    of replaced file. Other files have generation 0.
+    """
+    if path.suffix.startswith(".d"):
+        return int(path.suffix[2:])
+    return 0
+
+
+def _file_schema(df_file: "DfFile") -> pa.Schema:
+    """
+    Schema of files on the disk ... note that partition columns are not
+    written in files
+    """
+    _partition_cols = df_file.internal.partition_cols or []
+    # noinspection PyUnresolvedReferences
+    return pa.schema(
+        [_f for _f in df_file.internal.schema if _f.name not in _partition_cols]
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class _ManifestEntry:
+    """
+    Record of one data file in DfFile manifest (see `_Manifest`)
+
+    path: path relative to DfFile folder
+    partition: partition column values
+    rows: number of rows
+    bytes: size of file in bytes
+    stats: (min, max) for columns where they can be computed
+    time_index: (time_ns, rows) for consecutive chunks of rows in file when
+      rows were written at different times (i.e. compacted files) ... None
+      means all rows were written at last time stamp in file name
+    """
+    path: str
+    partition: t.Dict[str, t.Any]
+    rows: int
+    bytes: int
+    stats: t.Dict[str, t.Tuple[t.Any, t.Any]]
+    time_index: t.Optional[t.List[t.Tuple[int, int]]] = None
+
+    @property
+    def sort_key(self) -> t.Tuple[str, int, str]:
+        """
+        Files sorted by folder and then in the order they were written
+        """
+        _path = pathlib.PurePosixPath(self.path)
+        return _path.parent.as_posix(), _file_time_ns(_path), _path.name
+
+    @property
+    def time_chunks(self) -> t.List[t.Tuple[int, int]]:
+        """
+        (time_ns, rows) for consecutive chunks of rows in file (see
+        `time_index`)
+        """
+        if self.time_index is None:
+            return [
+                (_file_time_range(pathlib.PurePosixPath(self.path))[1],
+                 self.rows)
+            ]
+        return self.time_index
+
+    def as_record(self) -> t.Dict[str, t.Any]:
+        return {"op": "add", **dataclasses.asdict(self)}
+
+    @classmethod
+    def from_stats(
+        cls, df_file: "DfFile", path: pathlib.Path, rows: int,
+        stats: t.Dict[str, t.Tuple[t.Any, t.Any]],
+    ) -> "_ManifestEntry":
+        """
+        Makes entry for file on disk from row count and min/max stats that
+        writer already has in memory (see `_table_stats`) i.e. without
+        reading the file back.
+        """
+        # ------------------------------------------------------------- 01
+        # partition values are parsed from folder names as per the
+        # partition schema ... note that folder names can be `<value>` or
+        # `<column_name>=<value>` depending on partitioning flavour
+        _rel_path = path.relative_to(df_file.path)
+        _partition_cols = df_file.internal.partition_cols or []
+        _partition = {}
+        for _pc, _val in zip(_partition_cols, _rel_path.parent.parts):
+            if _val.startswith(f"{_pc}="):
+                _val = _val[len(_pc) + 1:]
+            # noinspection PyUnresolvedReferences
+            _partition[_pc] = pa.array(
+                [urllib.parse.unquote(_val)], type=pa.string()
+            ).cast(df_file.internal.schema.field(_pc).type)[0].as_py()
+
+        # ------------------------------------------------------------- 02
+        return cls(
+            path=_rel_path.as_posix(),
+            partition=_partition,
+            rows=rows,
+            bytes=path.stat().st_size,
+            stats=stats,
+        )
+
+    @classmethod
+    def from_file(
+        cls, df_file: "DfFile", path: pathlib.Path,
+    ) -> "_ManifestEntry":
+        """
+        Makes entry for file on disk by reading it back. Only needed when
+        there is no writer that knows what is in the file (see
+        `DfFile.rebuild_manifest`).
+        """
+        _table = pds.dataset(
+            source=[path.as_posix()],
+            filesystem=df_file.file_system,
+            format=df_file.internal.file_format.pds_format,
+            schema=_file_schema(df_file),
+        ).to_table()
+        return cls.from_stats(
+            df_file=df_file, path=path, rows=len(_table),
+            stats=_table_stats(df_file, _table),
+        )
+
+
+def _table_stats(
+    df_file: "DfFile", table: pa.Table
+) -> t.Dict[str, t.Tuple[t.Any, t.Any]]:
+    """
+    min max stats of table columns for manifest (see `_ManifestEntry`) ...
+    only for types that can be serialized to json and compared with filter
+    values
+    """
+    _partition_cols = df_file.internal.partition_cols or []
+    _stats = {}
+    for _name in table.column_names:
+        if _name in _partition_cols:
+            continue
+        try:
+            _min_max = pc.min_max(table[_name]).as_py()
+        except (pa.ArrowNotImplementedError, pa.ArrowTypeError):
+            continue
+        if _min_max["min"] is None or not isinstance(
+            _min_max["min"], (bool, int, float, str)
+        ):
+            continue
+        _stats[_name] = (_min_max["min"], _min_max["max"])
+    return _stats
+
+
+def _may_match(entry: _ManifestEntry, filters: FILTERS_TYPE) -> bool:
+    """
+    Returns False only if it is certain that no row in file can satisfy
+    filters (which are `and`ed) as per partition values and min/max stats
+    of file recorded in manifest.
+
+    Note that we are always conservative i.e. unknown columns, `!=`/`not
+    in` on stats and values that cannot be compared never prune the file.
+    Nested filters (i.e. DNF conjunctions see `bake_expression`) prune the
+    file only if none of them can match.
+    """
+    def _comparable(_a, _b) -> bool:
+        if isinstance(_b, (set, list, tuple)):
+            return all([_comparable(_a, _) for _ in _b])
+        if isinstance(_a, (int, float)) and isinstance(_b, (int, float)):
+            return True
+        return type(_a) == type(_b)
+
+    _conjunctions = [_ for _ in filters if isinstance(_, list)]
+    if bool(_conjunctions) and not any(
+        [_may_match(entry, _) for _ in _conjunctions]
+    ):
+        return False
+    for _element in filters:
+        if isinstance(_element, list):
+            continue
+        _col, _op, _value = _element
+        try:
+            # ------------------------------------------------------ 01
+            # partition values are exactly known
+            if _col in entry.partition:
+                if not _comparable(entry.partition[_col], _value):
+                    continue
+                if not _OP_MAPPER[_op](entry.partition[_col], _value):
+                    return False
+            # ------------------------------------------------------ 02
+            # check overlap with min max range
+            elif _col in entry.stats:
+                _min, _max = entry.stats[_col]
+                if not _comparable(_min, _value):
+                    continue
+                if _op in ['=', '==']:
+                    _match = _min <= _value <= _max
+                elif _op == '<':
+                    _match = _min < _value
+                elif _op == '<=':
+                    _match = _min <= _value
+                elif _op == '>':
+                    _match = _max > _value
+                elif _op == '>=':
+                    _match = _max >= _value
+                elif _op == 'in':
+                    _match = any([_min <= _v <= _max for _v in _value])
+                else:
+                    _match = True
+                if not _match:
+                    return False
+        except (TypeError, KeyError):
+            continue
+    return True
+
+
+@dataclasses.dataclass
+class _Manifest:
+    """
+    Append-only manifest of data files in DfFile folder. Every line in the
+    manifest file is json record that either adds file (see `_ManifestEntry`)
+    or removes file. Writers (append, compact, delete_) add records under
+    manifest lock after files are on the disk, so readers only see files
+    which are completely written.
+
+    Reads, exists, delete_ and compact plan from manifest alone and never
+    walk the folders. As the file is append-only we only parse the new
+    lines on refresh. Note that manifest file is replaced (i.e. new inode)
+    when it is rebuilt or when everything is deleted and in that case it is
+    parsed again from start.
+
+    The dataset built from manifest entries is cached until manifest changes
+    so that repeated reads do not discover dataset again.
+    """
+    root: pathlib.Path
+    # entries keyed by relative path
+    entries: t.Dict[str, _ManifestEntry] = dataclasses.field(
+        default_factory=dict)
+    # bytes parsed so far and inode of manifest file
+    offset: int = 0
+    inode: t.Optional[int] = None
+    dataset: t.Optional[pds.Dataset] = None
+    # as background compaction thread also refreshes manifest
+    thread_lock: threading.RLock = dataclasses.field(
+        default_factory=threading.RLock, repr=False, compare=False)
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self.root / _MANIFEST_FILE_NAME
+
+    @property
+    def sorted_entries(self) -> t.List[_ManifestEntry]:
+        with self.thread_lock:
+            _entries = list(self.entries.values())
+        return sorted(_entries, key=lambda _: _.sort_key)
+
+    def refresh(self):
+        with self.thread_lock:
+            self._refresh()
+
+    def _refresh(self):
+        # ------------------------------------------------------------- 01
+        # if no manifest file then nothing on disk
+        try:
+            _stat = self.path.stat()
+        except FileNotFoundError:
+            if self.inode is not None:
+                self.entries, self.offset, self.inode = {}, 0, None
+                self.dataset = None
+            return
+
+        # ------------------------------------------------------------- 02
+        # if manifest was replaced then parse from start
+        if _stat.st_ino != self.inode or _stat.st_size < self.offset:
+            self.entries, self.offset, self.inode = {}, 0, _stat.st_ino
+            self.dataset = None
+
+        # ------------------------------------------------------------- 03
+        # parse only new complete lines
+        if _stat.st_size == self.offset:
+            return
+        with open(self.path, "rb") as _f:
+            _f.seek(self.offset)
+            _data = _f.read()
+        _end = _data.rfind(b"\n") + 1
+        for _line in _data[:_end].splitlines():
+            _record = json.loads(_line)
+            _op = _record.pop("op")
+            if _op == "add":
+                _record["stats"] = {
+                    _k: tuple(_v) for _k, _v in _record["stats"].items()
+                }
+                if _record.get("time_index", None) is not None:
+                    _record["time_index"] = [
+                        tuple(_) for _ in _record["time_index"]
+                    ]
+                self.entries[_record["path"]] = _ManifestEntry(**_record)
+            elif _op == "remove":
+                self.entries.pop(_record["path"], None)
+            else:
+                e.code.ShouldNeverHappen(
+                    msgs=[f"Unknown op {_op} in manifest {self.path}"]
+                )
+        if _end > 0:
+            self.offset += _end
+            self.dataset = None
+
+    def get_dataset(
+        self, df_file: "DfFile", filters: t.Optional[FILTERS_TYPE] = None,
+    ) -> pds.Dataset:
+        """
+        Dataset from known files ... note that as schema is always supplied
+        the fragments are never opened while building dataset.
+
+        If filters are supplied the files that cannot satisfy them (as per
+        min/max stats in manifest) are pruned (see `_may_match`). Note that
+        the dataset is cached only when nothing is pruned.
+        """
+        if bool(filters):
+            _entries = self.sorted_entries
+            _pruned = [_ for _ in _entries if _may_match(_, filters)]
+            if len(_pruned) < len(_entries):
+                return self._make_dataset(df_file, entries=_pruned)
+        with self.thread_lock:
+            if self.dataset is None:
+                self.dataset = self._make_dataset(
+                    df_file, entries=self.sorted_entries)
+            return self.dataset
+
+    def _make_dataset(
+        self, df_file: "DfFile", entries: t.List[_ManifestEntry],
+    ) -> pds.Dataset:
+        # noinspection PyProtectedMember
+        return pds.dataset(
+            source=[(self.root / _.path).as_posix() for _ in entries],
+            filesystem=df_file.file_system,
+            format=df_file.internal.file_format.pds_format,
+            schema=df_file.internal.schema,
+            partitioning=df_file.internal.partitioning,
+            partition_base_dir=self.root.as_posix(),
+        )
+
+    def resolve(
+        self, df_file: "DfFile",
+        filter_expression: t.Optional[pds.Expression],
+    ) -> t.List[_ManifestEntry]:
+        """
+        Entries that satisfy filter_expression. The filter_expression must
+        only use partition columns. Note that no data files are opened as we
+        evaluate expression on table of partition values in manifest.
+        """
+        _entries = self.sorted_entries
+        if filter_expression is None or len(_entries) == 0:
+            return _entries
+        _partition_cols = df_file.internal.partition_cols
+        # noinspection PyUnresolvedReferences
+        _table = pa.table(
+            {
+                _pc: pa.array(
+                    [_.partition[_pc] for _ in _entries],
+                ).cast(df_file.internal.schema.field(_pc).type)
+                for _pc in _partition_cols
+            }
+        ).append_column(
+            "__index__", pa.array(range(len(_entries)), type=pa.int64())
+        )
+        _indices = pds.dataset(_table).to_table(
+            columns=["__index__"], filter=filter_expression,
+        )["__index__"].to_pylist()
+        return [_entries[_i] for _i in _indices]
+
+
+def _manifest_lock(df_file: "DfFile") -> util.FileLock:
+    return util.FileLock(path=df_file.path / _MANIFEST_LOCK_FILE_NAME)
+
+
+def _add_to_manifest(
+    df_file: "DfFile",
+    add: t.List[_ManifestEntry],
+    remove: t.List[_ManifestEntry] = None,
+):
+    """
+    Appends records to manifest under manifest lock. Note that this must be
+    called after files are added (or before files are removed) from disk.
+    """
+    _records = [_.as_record() for _ in add] + [
+        {"op": "remove", "path": _.path} for _ in (remove or [])
+    ]
+    if not bool(_records):
+        return
+    _data = "".join([json.dumps(_) + "\n" for _ in _records]).encode()
+    with _manifest_lock(df_file):
+        with open(df_file.path / _MANIFEST_FILE_NAME, "ab") as _f:
+            _f.write(_data)
+
+
+def _write_manifest(df_file: "DfFile", entries: t.List[_ManifestEntry]):
+    """
+    Replaces manifest file atomically. Caller must hold manifest lock.
+    """
+    _temp_path = df_file.path / f"{_MANIFEST_FILE_NAME}.tmp"
+    with open(_temp_path, "wb") as _f:
+        _f.write(
+            "".join(
+                [json.dumps(_.as_record()) + "\n" for _ in entries]
+            ).encode()
+        )
+    os.replace(_temp_path, df_file.path / _MANIFEST_FILE_NAME)
+
+
+def _get_manifest(df_file: "DfFile") -> _Manifest:
+    """
+    Returns refreshed manifest of DfFile (cached in DfFile internal). If
+    there is data on disk but no manifest (i.e. DfFile written before
+    manifests were introduced) the manifest is rebuilt.
+    """
+    _manifest = df_file.internal.manifest
+    if _manifest is None:
+        _manifest = _Manifest(root=df_file.path)
+        df_file.internal.manifest = _manifest
+    if not _manifest.path.exists() and not df_file.is_empty:
+        df_file.rebuild_manifest()
+    _manifest.refresh()
+    return _manifest
+
+
+def _make_dataset(
+    df_file: "DfFile", filters: t.Optional[FILTERS_TYPE] = None,
+) -> pds.Dataset:
+    """
+    Dataset of DfFile built from manifest (see `_Manifest`) ... files that
+    cannot satisfy filters are pruned
+    """
+    return _get_manifest(df_file).get_dataset(df_file, filters=filters)
+
+
 # noinspection PyArgumentList
 def _read_table(
     df_file: "DfFile",
     columns: t.List[str],
     filter_expression: pds.Expression,
-    partitioning: pds.Partitioning,
-    table_schema: pa.Schema,
+    filters: t.Optional[FILTERS_TYPE] = None,
 ) -> pa.Table:
     """
+    Note that this is the only place where data is scanned from the disk. The
+    dataset discovery is cached (see `_make_dataset`) and the scan
+    materializes table in one go. The files that cannot satisfy filters (as
+    per min/max stats in manifest) are never opened.
+    Every call increments `df_file.internal.scan_count` so that we can keep
+    track of number of scans done per call to StoreField.
+
     todo: need to find a way to preserve indexes while writing or
      else find a way to read with sort with pyarrow ... then there
      will be no need to use to_pandas() and also no need ofr casting
     """
+    # track scans
+    df_file.internal.scan_count += 1
+
     # noinspection PyProtectedMember
-    _table = pa.Table.from_batches(
-        batches=pds.dataset(
-            source=df_file.path.as_posix(),
-            filesystem=df_file.file_system,
-            format=_FILE_FORMAT,
-            schema=table_schema,
-            partitioning=partitioning,
-        ).to_batches(
-            columns=columns,
-            filter=filter_expression,
-        ),
-        schema=table_schema,
+    _table = _make_dataset(df_file, filters=filters).to_table(
+        columns=columns,
+        filter=filter_expression,
     )
 
     # todo: should we reconsider sort overhead ???
@@ -283,35 +1285,668 @@ def _read_table(
     return _table
 
 
+def _read_batches(
+    df_file: "DfFile",
+    columns: t.List[str],
+    filter_expression: pds.Expression,
+    batch_size: int,
+    readahead: int,
+    filters: t.Optional[FILTERS_TYPE] = None,
+) -> t.Iterator[pa.RecordBatch]:
+    """
+    Streaming counterpart of `_read_table`. The dataset is discovered once
+    and scanned lazily batch by batch so that at any point only the batches
+    that are consumed plus `readahead` batches are held in memory.
+
+    When `readahead` > 0 the scan happens in a background thread that fills
+    a bounded queue, so that disk io overlaps with consumer computations.
+    """
+    # track scans
+    df_file.internal.scan_count += 1
+
+    # ------------------------------------------------------------- 01
+    # scanner over batches
+    _kwargs = dict(columns=columns, filter=filter_expression)
+    if batch_size is not None:
+        _kwargs['batch_size'] = batch_size
+    _batches = _make_dataset(df_file, filters=filters).to_batches(**_kwargs)
+
+    # ------------------------------------------------------------- 02
+    # no readahead so simply yield in current thread
+    if readahead == 0:
+        yield from _batches
+        return
+
+    # ------------------------------------------------------------- 03
+    # readahead in background thread
+    # ------------------------------------------------------------- 03.01
+    # producer
+    _done = object()
+    _queue = queue.Queue(maxsize=readahead)
+    _stop = threading.Event()
+    _errors = []
+
+    def _produce():
+        try:
+            for _batch in _batches:
+                if _stop.is_set():
+                    return
+                _queue.put(_batch)
+        except BaseException as _exc:
+            _errors.append(_exc)
+        finally:
+            _queue.put(_done)
+
+    _thread = threading.Thread(target=_produce, daemon=True)
+    _thread.start()
+
+    # ------------------------------------------------------------- 03.02
+    # consume
+    try:
+        while True:
+            _batch = _queue.get()
+            if _batch is _done:
+                break
+            yield _batch
+        if bool(_errors):
+            raise _errors[0]
+    finally:
+        # if consumer stops early we need to unblock producer
+        _stop.set()
+        while _thread.is_alive():
+            try:
+                _queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        _thread.join()
+
+
+def _group_partials(
+    fn: AGGREGATION_TYPE, array: pa.ChunkedArray, starts: np.ndarray,
+) -> t.List[t.Any]:
+    """
+    Partial results (see `_Aggregation.partial`) of aggregation for all
+    groups of array that is sorted by group keys i.e. group `i` is the slice
+    from `starts[i]` till `starts[i + 1]`.
+
+    Integer and floating point arrays are reduced for all groups at once
+    with numpy `reduceat` (nulls are filled with values that do not change
+    the result and groups with only nulls give None like pyarrow.compute
+    does). Other types are reduced slice by slice.
+    """
+    # ------------------------------------------------------------- 01
+    _type = array.type
+    if not pa.types.is_integer(_type) and not pa.types.is_floating(_type):
+        return [
+            _AGGREGATIONS[fn].partial(array.slice(_start, _end - _start))
+            for _start, _end in zip(starts[:-1], starts[1:])
+        ]
+
+    # ------------------------------------------------------------- 02
+    _starts = starts[:-1]
+    _counts = np.add.reduceat(
+        np.logical_not(pc.is_null(array).to_numpy()).astype(np.int64),
+        _starts,
+    )
+    if fn == 'count':
+        return _counts.tolist()
+    _is_float = pa.types.is_floating(_type)
+    _none = _counts == 0
+
+    def _reduce(_fill, _ufunc, _dtype=None) -> t.List[t.Any]:
+        _values = pc.fill_null(array, pa.scalar(_fill, type=_type)).to_numpy()
+        _ret = _ufunc.reduceat(
+            _values if _dtype is None else _values.astype(_dtype), _starts
+        ).astype(object)
+        _ret[_none] = None
+        return _ret.tolist()
+
+    # ------------------------------------------------------------- 03
+    if fn in ['sum', 'mean']:
+        # same accumulator types as `pc.sum`
+        _sums = _reduce(
+            0, np.add,
+            np.float64 if _is_float else
+            np.uint64 if pa.types.is_unsigned_integer(_type) else np.int64,
+        )
+        if fn == 'sum':
+            return _sums
+        return list(zip(_sums, _counts.tolist()))
+    # nan is ignored by `np.fmin` and `np.fmax` like it is by `pc.min_max`
+    if fn == 'min':
+        return _reduce(
+            np.nan if _is_float else np.iinfo(_type.to_pandas_dtype()).max,
+            np.fmin if _is_float else np.minimum,
+        )
+    if fn == 'max':
+        return _reduce(
+            np.nan if _is_float else np.iinfo(_type.to_pandas_dtype()).min,
+            np.fmax if _is_float else np.maximum,
+        )
+    e.code.ShouldNeverHappen(msgs=[f"Unknown aggregation {fn}"])
+    raise
+
+
+def _partial_aggregate(
+    batch: pa.RecordBatch,
+    group_by: t.List[str],
+    aggregations: AGGREGATIONS_TYPE,
+) -> t.Dict[tuple, list]:
+    """
+    Partial aggregates (see `_Aggregation`) per group for batch. The batch
+    is sorted by group keys so that every group is contiguous slice and
+    all slices are reduced at once (see `_group_partials`).
+
+    Returns dict with group key values as keys and list of partial results
+    for aggregations as values
+    """
+    # ------------------------------------------------------------- 01
+    _table = pa.Table.from_batches([batch])
+    if not bool(group_by):
+        return {
+            (): [
+                _AGGREGATIONS[_f].partial(_table[_c])
+                for _c, _f in aggregations.values()
+            ]
+        }
+
+    # ------------------------------------------------------------- 02
+    # sort by group keys and find where keys change ... note that nulls
+    # are sorted at end and are considered as one group
+    _table = _table.take(
+        pc.sort_indices(
+            _table, sort_keys=[(_k, 'ascending') for _k in group_by]
+        )
+    ).combine_chunks()
+    _changed = None
+    for _k in group_by:
+        _col = _table[_k]
+        _is_null = pc.is_null(_col)
+        _c = pc.or_(
+            pc.fill_null(pc.not_equal(_col[1:], _col[:-1]), False),
+            pc.not_equal(_is_null[1:], _is_null[:-1]),
+        )
+        _changed = _c if _changed is None else pc.or_(_changed, _c)
+    _starts = np.concatenate(
+        [[0], np.flatnonzero(_changed.to_numpy()) + 1, [len(_table)]]
+    ).astype(np.int64)
+
+    # ------------------------------------------------------------- 03
+    # reduce all groups per aggregation and then make dict once
+    _keys = zip(
+        *[_table[_k].take(pa.array(_starts[:-1])).to_pylist()
+          for _k in group_by]
+    )
+    _partials = zip(
+        *[_group_partials(_f, _table[_c], _starts)
+          for _c, _f in aggregations.values()]
+    )
+    return {
+        _key: list(_partial) for _key, _partial in zip(_keys, _partials)
+    }
+
+
+def _combine_partials(
+    into: t.Dict[tuple, list],
+    partials: t.Dict[tuple, list],
+    aggregations: AGGREGATIONS_TYPE,
+):
+    """
+    Combines partial aggregates (see `_partial_aggregate`) in place
+    """
+    _fns = [_AGGREGATIONS[_f] for _, _f in aggregations.values()]
+    for _key, _partial in partials.items():
+        if _key not in into.keys():
+            into[_key] = _partial
+            continue
+        into[_key] = [
+            _fn.combine(_a, _b)
+            for _fn, _a, _b in zip(_fns, into[_key], _partial)
+        ]
+
+
+def _aggregate_fragment(
+    fragment: pds.Fragment,
+    schema: pa.Schema,
+    filter_expression: t.Optional[pds.Expression],
+    batch_size: t.Optional[int],
+    group_by: t.List[str],
+    aggregations: AGGREGATIONS_TYPE,
+) -> t.Dict[tuple, list]:
+    """
+    Partial aggregates of one fragment ... only one batch is in memory at a
+    time
+    """
+    _kwargs = {}
+    if batch_size is not None:
+        _kwargs['batch_size'] = batch_size
+    _ret = {}
+    for _batch in fragment.to_batches(
+        schema=schema,
+        columns=list(
+            dict.fromkeys(
+                group_by + [_c for _c, _ in aggregations.values()]
+            )
+        ),
+        filter=filter_expression,
+        **_kwargs
+    ):
+        if _batch.num_rows == 0:
+            continue
+        _combine_partials(
+            _ret, _partial_aggregate(_batch, group_by, aggregations),
+            aggregations,
+        )
+    return _ret
+
+
+def read_df_files(
+    df_files: t.Dict[str, "DfFile"],
+    owner_column: str,
+    columns: t.Optional[t.List[str]] = None,
+    filters: t.Optional[FILTERS_TYPE] = None,
+) -> t.Optional[pa.Table]:
+    """
+    Reads many DfFile's (e.g. same StoreField of many hashables) with one
+    scan over single dataset made from their manifests. The rows get extra
+    string column owner_column with the key of df_files they come from.
+
+    Note that the owner and partition values are known from manifest and
+    are supplied as partition expressions of files, so that filters on
+    them (and min/max stats) prune files before scan.
+
+    Returns None if nothing exists on disk for supplied filters.
+    """
+    # ------------------------------------------------------------- 01
+    # DfFile's with data must agree on schema and format
+    df_files = {
+        _owner: _df_file for _owner, _df_file in df_files.items()
+        if _df_file.internal.is_updated
+    }
+    if not bool(df_files):
+        return None
+    _first = next(iter(df_files.values()))  # type: DfFile
+    _schema = _first.internal.schema
+    _file_format = _first.internal.file_format
+    for _owner, _df_file in df_files.items():
+        if _df_file.internal.schema != _schema or \
+                _df_file.internal.file_format != _file_format:
+            e.code.NotAllowed(
+                msgs=[
+                    f"All DfFile's must have same schema and file format to "
+                    f"be read together",
+                    f"Check DfFile for `{_owner}` at {_df_file.path}"
+                ]
+            )
+    if owner_column in _schema.names:
+        e.code.NotAllowed(
+            msgs=[
+                f"Owner column `{owner_column}` clashes with column in "
+                f"schema {_schema.names}"
+            ]
+        )
+    _schema = _schema.append(pa.field(owner_column, pa.string()))
+
+    # ------------------------------------------------------------- 02
+    # bake filters
+    _filter_expression = None
+    if bool(filters):
+        filters = _cast_filters(filters, _schema)
+        _filter_expression = bake_expression(
+            _elements=filters,
+            _err_msg=f"Filters used to read DfFile's are not appropriate "
+                     f"....",
+        )
+
+    # ------------------------------------------------------------- 03
+    # files and partition expressions from manifests ... shared locks are
+    # held till scan ends so that compaction does not swap files
+    with contextlib.ExitStack() as _stack:
+        _paths, _partitions = [], []
+        for _owner, _df_file in df_files.items():
+            _stack.enter_context(_df_file.lock(shared=True))
+            for _entry in _get_manifest(_df_file).sorted_entries:
+                if bool(filters) and not _may_match(_entry, filters):
+                    continue
+                _expression = pds.field(owner_column) == pds.scalar(_owner)
+                for _k, _v in _entry.partition.items():
+                    _expression = operator.and_(
+                        _expression,
+                        pds.field(_k) == pds.scalar(
+                            pa.scalar(_v, type=_schema.field(_k).type)
+                        ),
+                    )
+                _paths.append((_df_file.path / _entry.path).as_posix())
+                _partitions.append(_expression)
+        if not bool(_paths):
+            return None
+
+        # --------------------------------------------------------- 04
+        # one scan
+        _table = pds.FileSystemDataset.from_paths(
+            _paths,
+            schema=_schema,
+            format=_file_format.pds_format,
+            filesystem=_first.file_system,
+            partitions=_partitions,
+        ).to_table(columns=columns, filter=_filter_expression)
+
+    # ------------------------------------------------------------- 05
+    # return None if no rows
+    if len(_table) == 0:
+        return None
+    return _table
+
+
+def _map_in_threads(
+    fn: t.Callable, items: t.List[t.Any], threads: int,
+) -> t.List[t.Any]:
+    """
+    Like `map` but with bounded thread pool of at most threads workers.
+    Results are in the order of items and first exception is raised.
+    """
+    if threads == 1 or len(items) <= 1:
+        return [fn(_) for _ in items]
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(threads, len(items))
+    ) as _executor:
+        return list(_executor.map(fn, items))
+
+
+_LAST_TIME_NS = 0
+_TIME_NS_LOCK = threading.Lock()
+
+
+def _unique_time_ns() -> int:
+    """
+    Time stamp used to name files (see `_write_table`). It is strictly
+    increasing within process so that files sort in the order they were
+    written. Files of concurrent processes can have same time stamp but are
+    distinguished by `_writer_id` in file name.
+    """
+    global _LAST_TIME_NS
+    with _TIME_NS_LOCK:
+        _LAST_TIME_NS = max(time.time_ns(), _LAST_TIME_NS + 1)
+        return _LAST_TIME_NS
+
+
+def _writer_id() -> str:
+    """
+    Identifies writer process in file names so that files written
+    concurrently by many processes (even on different hosts) never collide.
+    Note that pid is fetched every time as processes can be forked.
+    """
+    return f"{_HOST_NAME}-{os.getpid()}"
+
+
 def _write_table(
     df_file: "DfFile",
     table: pa.Table,
-    partitioning: pds.Partitioning,
-):
+    time_ns: t.Optional[int] = None,
+) -> t.List[pathlib.Path]:
+    """
+    Writes table to new file(s) i.e. one file per partition folder (see
+    `_split_by_partition`) and returns the paths of files written.
+
+    time_ns is used for file name (and hence decides the order in which
+    files are read) ... if None current time is used.
+
+    Files are written with temporary names (ignored by pyarrow) and renamed
+    when completely written, so that crashed writes never leave partial
+    files that look like data files.
+
+    Note that we do not use `pds.write_dataset` as with pyarrow 3 it cannot
+    tell which files it wrote and has no control over row group size.
+    """
     # file name formatter
-    _file_name = str(time.time_ns()) + ".{i}"
+    # todo: side effect we can use timestamp i.e. name as file to achieve
+    #  timestamp based streaming ;)
+    if time_ns is None:
+        time_ns = _unique_time_ns()
+    _file_name = f"{time_ns}.{_writer_id()}." + "{i}"
+
+    # write to disk ... one file per partition folder
+    _written_files, _entries = [], []
+    for _i, (_dir, _table) in enumerate(_split_by_partition(df_file, table)):
+        _file = _dir / _file_name.format(i=_i)
+        _writer = _FileWriter(
+            df_file=df_file, path=_dir / (_WRITE_TEMP_PREFIX + _file.name)
+        )
+        try:
+            _writer.write(_table)
+        finally:
+            _writer.close()
+        # rename temporary file
+        _writer.path.rename(_file)
+        _written_files.append(_file)
+        _entries.append(
+            _ManifestEntry.from_stats(
+                df_file=df_file, path=_file, rows=len(_table),
+                stats=_table_stats(df_file, _table),
+            )
+        )
 
-    # we introduce 1 micro second delay so that file names remain unique in
-    # nano seconds
-    time.sleep(1.0 / 1000000.0)
+    # record in manifest so that readers can see written files
+    _add_to_manifest(df_file, add=_entries)
 
-    # write to disk
-    # noinspection PyProtectedMember
-    pds.write_dataset(
-        data=table,
-        base_dir=df_file.path.as_posix(),
-        filesystem=df_file.file_system,
-        partitioning=partitioning,
-        format=_FILE_FORMAT,
-        # todo: modify in future if append writes are supported by pyarrow
-        #  right now this is our solution
-        #  + we use timestamp that is unique for every write while `i` will
-        #    record the the ith file that was written for this disk
-        #
-        # todo: side effect we can use timestamp i.e. name as file to achieve
-        #  timestamp based streaming ;)
-        basename_template=_file_name,
-    )
+    # return
+    return _written_files
+
+
+def _split_by_partition(
+    df_file: "DfFile", table: pa.Table,
+) -> t.List[t.Tuple[pathlib.Path, pa.Table]]:
+    """
+    Splits table into leaf partition folders (same folder names as
+    `pds.DirectoryPartitioning` expects) and tables without partition
+    columns
+    """
+    _partition_cols = df_file.internal.partition_cols or []
+    if not bool(_partition_cols):
+        return [(df_file.path, table)]
+
+    # partition values ... usually every append has one partition so we
+    # avoid converting columns to python in that case
+    _uniques = [pc.unique(table[_c]) for _c in _partition_cols]
+    if all([len(_) == 1 for _ in _uniques]):
+        _keys = [tuple([_[0].as_py() for _ in _uniques])]
+    else:
+        _keys = list(
+            dict.fromkeys(
+                zip(*[table[_c].to_pylist() for _c in _partition_cols])
+            )
+        )
+
+    # split
+    _ret = []
+    _data_table = table.drop(_partition_cols)
+    for _key in _keys:
+        _dir = df_file.path
+        _mask = None
+        for _c, _v in zip(_partition_cols, _key):
+            # noinspection PyUnresolvedReferences
+            _type = df_file.internal.schema.field(_c).type
+            _dir /= pa.array([_v], type=_type).cast(pa.string())[0].as_py()
+            _m = pc.equal(table[_c], pa.scalar(_v, type=_type))
+            _mask = _m if _mask is None else pc.and_(_mask, _m)
+        _ret.append(
+            (
+                _dir,
+                _data_table if len(_keys) == 1 else _data_table.filter(_mask)
+            )
+        )
+    return _ret
+
+
+class _PipelinedWriter:
+    """
+    Writes tables with pool of writer threads (see `DfFileWritePipeline`)
+    """
+
+    def __init__(
+        self,
+        df_file: "DfFile",
+        write_pipeline: DfFileWritePipeline,
+    ):
+        self.df_file = df_file
+        self.write_pipeline = write_pipeline
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=write_pipeline.workers)
+        self.pending = collections.deque()
+        self.written_files = []  # type: t.List[pathlib.Path]
+
+    def _pop(self):
+        # note that this raises exception (if any) from writer thread
+        self.written_files += self.pending.popleft().result()
+
+    def write(self, table: pa.Table):
+        # raise errors from finished writes as early as possible
+        while bool(self.pending) and self.pending[0].done():
+            self._pop()
+        # backpressure
+        while len(self.pending) >= self.write_pipeline.max_pending:
+            self._pop()
+        # file name is decided here so that files are in yield order
+        self.pending.append(
+            self.executor.submit(
+                _write_table, self.df_file, table, _unique_time_ns(),
+            )
+        )
+
+    def close(self) -> t.Optional[BaseException]:
+        """
+        Waits for all pending writes and returns first exception (if any)
+        """
+        _error = None
+        while bool(self.pending):
+            try:
+                self._pop()
+            except BaseException as _exc:
+                if _error is None:
+                    _error = _exc
+        self.executor.shutdown()
+        return _error
+
+
+class _FileWriter:
+    """
+    Writes one data file of DfFile incrementally i.e. table by table so
+    that whole file never needs to be in memory (see `_StreamWriter` and
+    `DfFile.delete_`). Note that tables must not have partition columns.
+
+    Rows and min/max stats of written tables are tracked so that manifest
+    entry can be made without reading the file back (see
+    `_ManifestEntry.from_stats`).
+    """
+
+    def __init__(
+        self, df_file: "DfFile", path: pathlib.Path,
+        row_group_size: t.Optional[int] = None,
+    ):
+        self.df_file = df_file
+        self.path = path
+        self.rows = 0
+        self.stats = {}  # type: t.Dict[str, t.Tuple[t.Any, t.Any]]
+        self.file_format = df_file.internal.file_format
+        # rows per row group (parquet) or record batch (ipc) ... if None
+        # the one from file format is used
+        self.row_group_size = row_group_size or \
+            self.file_format.row_group_size
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.sink = pa.OSFile(path.as_posix(), mode='wb')
+        _schema = _file_schema(df_file)
+        if self.file_format.name == 'ipc':
+            _compression = self.file_format.compression
+            if _compression is not None and \
+                    self.file_format.compression_level is not None:
+                _compression = pa.Codec(
+                    _compression,
+                    compression_level=self.file_format.compression_level
+                )
+            self.writer = pa.ipc.new_file(
+                self.sink, _schema,
+                options=pa.ipc.IpcWriteOptions(compression=_compression),
+            )
+        elif self.file_format.name == 'parquet':
+            _kwargs = {}
+            for _k in ['compression', 'compression_level', 'use_dictionary']:
+                if getattr(self.file_format, _k) is not None:
+                    _kwargs[_k] = getattr(self.file_format, _k)
+            self.writer = pq.ParquetWriter(self.sink, _schema, **_kwargs)
+        else:
+            e.code.ShouldNeverHappen(
+                msgs=[f"Unknown format {self.file_format.name}"]
+            )
+            raise
+
+    @property
+    def nbytes(self) -> int:
+        return self.sink.tell()
+
+    def write(self, table: pa.Table):
+        if self.file_format.name == 'ipc':
+            self.writer.write_table(
+                table, max_chunksize=self.row_group_size)
+        else:
+            self.writer.write_table(
+                table, row_group_size=self.row_group_size)
+        self.rows += len(table)
+        for _name, (_min, _max) in _table_stats(self.df_file, table).items():
+            if _name in self.stats:
+                _min = min(_min, self.stats[_name][0])
+                _max = max(_max, self.stats[_name][1])
+            self.stats[_name] = (_min, _max)
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+class _StreamWriter:
+    """
+    Long-lived writer of one partition folder for StoreFields with
+    `streamed_write` (see `DfFileStreamedWrite`). The file is written with
+    temporary name (ignored by pyarrow and not in manifest) and is renamed
+    and recorded in manifest by `close`.
+    """
+
+    def __init__(self, df_file: "DfFile", partition_dir: pathlib.Path):
+        self.df_file = df_file
+        self.partition_dir = partition_dir
+        self.time_ns = _unique_time_ns()
+        self.file_writer = _FileWriter(
+            df_file=df_file,
+            path=partition_dir /
+            f"{_STREAM_TEMP_PREFIX}{self.time_ns}.{_writer_id()}.s0",
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.file_writer.nbytes
+
+    def write(self, table: pa.Table):
+        # note that table must not have partition columns
+        self.file_writer.write(table)
+
+    def close(self) -> pathlib.Path:
+        """
+        Finalizes file and returns its final path
+        """
+        self.file_writer.close()
+        _path = self.partition_dir / \
+            f"{self.time_ns}-{_unique_time_ns()}.{_writer_id()}.s0"
+        self.file_writer.path.rename(_path)
+        _add_to_manifest(
+            self.df_file,
+            add=[
+                _ManifestEntry.from_stats(
+                    df_file=self.df_file, path=_path,
+                    rows=self.file_writer.rows,
+                    stats=self.file_writer.stats,
+                )
+            ],
+        )
+        return _path
 
 
 class DfFileInternal(m.Internal):
@@ -319,6 +1954,23 @@ class DfFileInternal(m.Internal):
     partitioning: t.Optional[pds.Partitioning]
     schema: t.Optional[pa.Schema]
     partition_cols: t.Optional[t.List[str]]
+    file_format: DfFileFormat
+    # number of times data was scanned from disk (see `_read_table`)
+    scan_count: int = 0
+    # background compaction thread (see `DfFile.append`)
+    compaction_thread: t.Optional[threading.Thread] = None
+    # manifest of files on the disk (see `_get_manifest`)
+    manifest: t.Optional[_Manifest] = None
+    # open writers per partition folder (see `DfFile.append`)
+    stream_writers: t.Optional[t.Dict[pathlib.Path, _StreamWriter]] = None
+    # bumped by writes in this process (see `DfFile.version`)
+    version_counter: int = 0
+
+    def vars_that_can_be_overwritten(self) -> t.List[str]:
+        return super().vars_that_can_be_overwritten() + [
+            'scan_count', 'file_format', 'compaction_thread', 'manifest',
+            'stream_writers', 'version_counter',
+        ]
 
     @property
     def is_updated(self) -> bool:
@@ -342,6 +1994,30 @@ class DfFileInternal(m.Internal):
         and in that case if data exists on disk then we load schema from config
         on disk. Else we set things to None
         """
+        # if table is provided other processes might be doing first write
+        # at same time so we do it under config lock and re-read config
+        # from disk
+        if table is not None:
+            # noinspection PyUnresolvedReferences
+            with self.owner.config_lock():
+                # noinspection PyUnresolvedReferences
+                self.owner.config.reload()
+                self._update_from_table_or_config(table=table)
+                # make sure manifest exists before any data file is renamed
+                # in place so that other processes do not think that
+                # files are from before manifests and rebuild it
+                # noinspection PyTypeChecker
+                with _manifest_lock(self.owner):
+                    # noinspection PyUnresolvedReferences
+                    if not (self.owner.path / _MANIFEST_FILE_NAME).exists():
+                        # noinspection PyTypeChecker
+                        _write_manifest(self.owner, entries=[])
+        else:
+            self._update_from_table_or_config(table=None)
+
+    def _update_from_table_or_config(
+        self, table: t.Optional[pa.Table]
+    ):
         # schema from config
         # noinspection PyUnresolvedReferences
         _c = self.owner.config
@@ -372,9 +2048,13 @@ class DfFileInternal(m.Internal):
             # back to config
             if _schema_in_config is None:
                 _c.schema = table.schema
-            # if table_schema available then validate
+            # if table_schema available then validate ... note that tables
+            # from `util.np_to_pa` can be appended to schema inferred from
+            # tables of its older versions (see `DfFile.append`)
             else:
-                if _schema_in_config != table.schema:
+                if _schema_in_config != util.pa_fixed_size_lists_to_lists(
+                    table, _schema_in_config
+                ).schema:
                     e.code.CodingError(
                         msgs=[
                             f"The yielded/returned table schema is "
@@ -405,6 +2085,7 @@ class DfFileInternal(m.Internal):
         self.partitioning = _c.get_partitioning()
         self.schema = _c.schema
         self.partition_cols = _c.partition_cols
+        self.file_format = _c.get_file_format()
 
 
 @dataclasses.dataclass
@@ -412,6 +2093,14 @@ class DfFileConfig(s.Config):
 
     schema: t.Optional[t.Dict] = None
     partition_cols: t.Optional[t.List[str]] = None
+    # see DfFileFormat.as_dict ... None means uncompressed ipc
+    file_format: t.Optional[t.Dict] = None
+
+    def get_file_format(self) -> DfFileFormat:
+        # note that dict is proxy notifier dict so we cast it back to dict
+        return DfFileFormat.from_dict(
+            None if self.file_format is None else dict(self.file_format)
+        )
 
     def get_partitioning(self) -> t.Optional[pds.Partitioning]:
         if self.schema is None:
@@ -503,6 +2192,47 @@ class DfFile(Folder):
         # todo: for local we are going with singleton pattern
         return our_fs.LocalFileSystem.get_instance()
 
+    @property
+    def is_empty(self) -> bool:
+        """
+        True if there is no data on the disk. Note that lock files and
+        temporary files (which pyarrow anyways ignores) are not considered.
+        """
+        for _ in self.path.iterdir():
+            if not _is_ignored(_):
+                return False
+        return True
+
+    @property
+    def version(self) -> tuple:
+        """
+        Changes whenever data on disk can change i.e. version counter bumped
+        by `append` and `delete_` along with manifest state which also
+        changes with writes by other processes (see `DfFileReadCache`).
+        Note that manifest must be refreshed before.
+        """
+        _manifest = self.internal.manifest
+        return self.internal.version_counter, _manifest.inode, \
+            _manifest.offset
+
+    def lock(self, shared: bool) -> util.FileLock:
+        """
+        Cross process lock for DfFile. Readers take shared lock while
+        discovering and scanning dataset while things that remove files
+        (like compact and delete_) take exclusive lock for the short time
+        where files are swapped or removed.
+        """
+        return util.FileLock(path=self.path / _LOCK_FILE_NAME, shared=shared)
+
+    def config_lock(self) -> util.FileLock:
+        """
+        Cross process lock under which config is re-read and updated. Note
+        that config syncs to disk on every update so when many processes
+        do first write to same DfFile only one of them should infer schema
+        while others validate against it.
+        """
+        return util.FileLock(path=self.path / _CONFIG_LOCK_FILE_NAME)
+
     def init_validate(self):
         # call super
         super().init_validate()
@@ -535,6 +2265,7 @@ class DfFile(Folder):
     def exists(
         self,
         columns: t.List[str],
+        filters: t.Optional[FILTERS_TYPE],
         filter_expression: pds.Expression,
         return_table: bool,
     ) -> t.Union[bool, pa.Table]:
@@ -545,34 +2276,74 @@ class DfFile(Folder):
         bool(...) ... Note that is is not possible to use filters without
         actually reading data.
 
-        While filters are not provide and if something present we return True
-        and not the Table.
+        When return_table=False we never read row data and rely on metadata
+        only (see `_exists_from_metadata`) ;)
+        """
+        # if table not needed use metadata only exists check
+        if not return_table:
+            return self._exists_from_metadata(
+                filters=filters, filter_expression=filter_expression,
+            )
+
+        # read table with filters to see if something exists
+        # Note that columns is irrelevant while checking for exists as we
+        # will use filters and check if minimum one row is returned or not
+        # ... and at that time it does not matter which column we select in
+        # that row
+        _table = self.read_if_exists(
+            columns=columns, filter_expression=filter_expression,
+            filters=filters,
+        )
+        # return Table if one or more rows exist else return False
+        return False if _table is None else _table
 
-        When filters=None we will get simple exists check ... i.e. True or
-        False will be returned and no data on the disk will be read ;)
+    def _exists_from_metadata(
+        self,
+        filters: t.Optional[FILTERS_TYPE],
+        filter_expression: t.Optional[pds.Expression],
+    ) -> bool:
+        """
+        Exists check that never decodes row data:
+        + filters only on partition columns resolve to manifest entries
+        + no filters use row counts from manifest
+        + other filters run a zero column scan (over files that are not
+          pruned by min/max stats in manifest) that stops at first
+          matching row
         """
-        # if nothing exists simply exit ... as there is no table to read on disk
+        # ------------------------------------------------------01
+        # if nothing exists simply exit
         # noinspection PyTypeChecker
         if not self.file_system.exists(self.path):
             return False
-        # if folder exists but empty then return False
-        if util.io_is_dir_empty(self.path):
+        if not self.internal.is_updated:
+            return False
+
+        # ------------------------------------------------------02
+        # take shared lock so that files are not swapped while we check
+        with self.lock(shared=True):
+
+            # --------------------------------------------------02.01
+            # filters on partition columns only (or no filters) ... resolve
+            # to manifest entries
+            _manifest = _get_manifest(self)
+            _partition_cols = self.internal.partition_cols or []
+            if filter_columns(filters).issubset(_partition_cols):
+                for _entry in _manifest.resolve(self, filter_expression):
+                    if _entry.rows > 0:
+                        return True
+                return False
+
+            # --------------------------------------------------02.02
+            # zero column scan that stops at first matching row
+            # Note that only columns needed by filter are decoded
+            self.internal.scan_count += 1
+            _dataset = _manifest.get_dataset(self, filters=filters)
+            for _batch in _dataset.to_batches(
+                columns=[], filter=filter_expression,
+            ):
+                if _batch.num_rows > 0:
+                    return True
             return False
-        # read table with filters to see if something exists
-        # Note that columns is None as it is irrelevant while checking for
-        # exists as we will use filters and check if minimum one row is
-        # returned or not ... and at that time it does not matter which
-        # column we select in that row
-        _table = _read_table(
-            self, columns=columns, filter_expression=filter_expression,
-            table_schema=self.internal.schema,
-            partitioning=self.internal.partitioning,
-        )
-        # return Table if one or more rows exist else return False
-        if return_table:
-            return _table if len(_table) > 0 else False
-        else:
-            return bool(_table)
 
     # Note that the parent delete is for Folder but for DfFile also we have
     # folder which represents folder and we will take care of the delete. But
@@ -581,7 +2352,9 @@ class DfFile(Folder):
     # noinspection PyMethodOverriding
     def delete_(
         self, *, filters: FILTERS_TYPE,
-    ) -> bool:
+        dry_run: bool = False,
+        threads: int = _DELETE_THREADS,
+    ) -> t.Union[bool, t.List[str]]:
         """
         Note that this is not Folder.delete but delete related to mode=`d`
 
@@ -592,22 +2365,42 @@ class DfFile(Folder):
         responsible to delete state files and empty dirs.
 
         Note that delete is not supported by pyarrow so we have our own
-        implementation. We expect simple filters that can resolve to folder
-        paths that we can delete. To achieve this we use _columns_allowed
-        argument of method of _check_filters.
+        implementation.
 
-        Given that we will use columns that use partition_cols we can be
-        sure that there are files or folders to delete. And that is the
-        reason why we do not allow columns apart from partition columns.
+        When filters are only on partition columns they resolve to files
+        recorded in manifest (see `_Manifest.resolve`) which are simply
+        deleted without opening them.
 
-        Also looks like this code should work on file written in batches. But
-        in case we use columns apart from partition cols that might be
-        difficult to achieve.
+        Else rows are deleted i.e. files are rewritten without matching rows
+        (see `_delete_rows`). Only files that can match as per partition
+        values and min/max stats in manifest are scanned and only files that
+        really have matching rows are rewritten, batch by batch so that
+        memory stays bounded. The rewritten files are swapped atomically
+        under exclusive lock (like compaction) while other files are never
+        touched.
 
-        todo: for writes with one row per file we can delete based on columns
-          that are not partition columns .... check if we can support it in
-          future
+        Filters can be in DNF (see `bake_expression`).
+
+        Files (and partition folders that become empty) are removed and
+        files are rewritten with bounded thread pool of `threads` workers.
+
+        When dry_run is True nothing is deleted and instead paths (relative
+        to DfFile folder) of files that would be deleted or rewritten are
+        returned.
         """
+        # ------------------------------------------------------00
+        # validate
+        e.validation.ShouldBeInstanceOf(
+            value=threads, value_types=(int, ),
+            msgs=["Please supply int for threads"]
+        )
+        if threads < 1:
+            e.validation.NotAllowed(
+                msgs=[f"threads must be positive, found {threads}"]
+            )
+        # rows written by streamed writes till now are also deleted
+        self.close_streams()
+
         # ------------------------------------------------------01
         # if filters=None then delete everything
         # Note that this is with mode i.e. we are in delete_ not delete
@@ -619,196 +2412,733 @@ class DfFile(Folder):
         # use create method of Folder the state files will not be generated
         # ... also that is never the job of delete_ as it only is responsible
         # for pyarrow stuff and not the Folder stuff
+        # Note that we retain lock files and the dir itself so that things
+        # are consistent for Folder class i.e. is_created can detect things
+        # properly
         if not bool(filters):
-            # noinspection PyTypeChecker
-            self.file_system.delete(self.path, recursive=True)
-            # just make a empty dir again fo that things are consistent for
-            # Folder class i.e. is_created can detect things properly
-            self.path.mkdir()
+            if dry_run:
+                if not self.internal.is_updated:
+                    return []
+                with self.lock(shared=True):
+                    return [
+                        _.path for _ in _get_manifest(self).sorted_entries]
+            with self.lock(shared=False), _manifest_lock(self):
+                # files known to manifest are removed in parallel (note
+                # that manifest is refreshed without _get_manifest as we
+                # already hold manifest lock)
+                if self.internal.is_updated:
+                    _manifest = self.internal.manifest
+                    if _manifest is None:
+                        _manifest = _Manifest(root=self.path)
+                        self.internal.manifest = _manifest
+                    _manifest.refresh()
+                    _map_in_threads(
+                        lambda _e: (self.path / _e.path).unlink(),
+                        [
+                            _ for _ in _manifest.sorted_entries
+                            if (self.path / _.path).exists()
+                        ],
+                        threads,
+                    )
+                # then whatever remains (partition folders, temporary
+                # files, files unknown to manifest)
+                _paths = [
+                    _ for _ in self.path.iterdir() if _.name not in [
+                        _LOCK_FILE_NAME, _COMPACT_LOCK_FILE_NAME,
+                        _MANIFEST_LOCK_FILE_NAME, _CONFIG_LOCK_FILE_NAME,
+                    ]
+                ]
+                # noinspection PyTypeChecker
+                _map_in_threads(
+                    lambda _p: self.file_system.delete(_p, recursive=True)
+                    if _p.is_dir() else _p.unlink(),
+                    _paths,
+                    threads,
+                )
+                # fresh empty manifest
+                _write_manifest(self, entries=[])
+                self.internal.version_counter += 1
             # return need to satisfy the API
             return True
 
         # ------------------------------------------------------02
-        # basic tests
-        # for now we expect simple filters i.e. list of tuples ... we do not
-        # support nested list of filters yet
-        # todo: add support for filters that are nested lists
-        for f in filters:
-            if isinstance(f, list):
-                e.code.NotAllowed(
-                    msgs=[
-                        f"For delete mode we support simple filters that "
-                        f"operate on partition columns ... nested "
-                        f"filters is not yet supported ..."
-                    ]
-                )
-        # some vars
-        _partition_cols = self.internal.partition_cols
+        # if nothing was ever written there is nothing to delete
+        if not self.internal.is_updated:
+            return [] if dry_run else False
 
         # ------------------------------------------------------03
-        # loop over filters and make a dictionary with key as partition
-        # column and value as the list of tuple (operation, value)
-        # todo: I hope this handles the use case of multiple filters over same
-        #  column properly
-        _filters_dict_of_op_val_list = {
-            pc: [] for pc in _partition_cols
-        }
-        for f in filters:
-            _filters_dict_of_op_val_list[f[0]].append((_OP_MAPPER[f[1]], f[2]))
+        # bake expression
+        filters = _cast_filters(filters, self.internal.schema)
+        _filter_expression = bake_expression(
+            _elements=filters,
+            _err_msg=f"Filters used for delete are not appropriate ....",
+            _columns_allowed=self.internal.schema.names,
+        )
 
         # ------------------------------------------------------04
-        # deletion helper method
+        # if filters are not only on partition columns then delete rows
+        _partition_cols = self.internal.partition_cols or []
+        if not filter_columns(filters).issubset(_partition_cols):
+            return self._delete_rows(
+                filters=filters, filter_expression=_filter_expression,
+                dry_run=dry_run, threads=threads,
+            )
 
-        def _delete(_depth: int, _path: pathlib.Path) -> bool:
-            # --------------------------------------------------04.01
-            # variable to track if something deleted
-            _something_deleted = False
+        # ------------------------------------------------------05
+        # resolve files from manifest in one pass (partition values are
+        # typed as per schema) and delete them under exclusive lock
+        # Note that files are removed from manifest before they are removed
+        # from disk so that readers never see missing files
+        if dry_run:
+            with self.lock(shared=True):
+                return [
+                    _.path for _ in
+                    _get_manifest(self).resolve(self, _filter_expression)
+                ]
+        with self.lock(shared=False):
+            _entries = _get_manifest(self).resolve(self, _filter_expression)
+            _add_to_manifest(self, add=[], remove=_entries)
+            self.internal.version_counter += 1
+            self._remove_files(entries=_entries, threads=threads)
 
-            # --------------------------------------------------04.02
-            # the path must be a dir
-            if not _path.is_dir():
-                e.code.CodingError(
-                    msgs=[
-                        f"We were expecting path {_path} to be a dir ..."
+        # ------------------------------------------------------06
+        # return True if something was deleted
+        return bool(_entries)
+
+    def _remove_files(self, entries: t.List[_ManifestEntry], threads: int):
+        """
+        Removes files (already removed from manifest) and then partition
+        folders that are now empty. Caller must hold exclusive lock.
+
+        Files are removed in parallel and then folders level by level
+        (deepest first) where folders of same level are removed in parallel.
+        """
+        def _unlink(_path: pathlib.Path):
+            if _path.exists():
+                _path.unlink()
+
+        def _rmdir_if_empty(_dir: pathlib.Path) -> bool:
+            if _dir.exists() and util.io_is_dir_empty(_dir):
+                _dir.rmdir()
+                return True
+            return False
+
+        _paths = [self.path / _.path for _ in entries]
+        _map_in_threads(_unlink, _paths, threads)
+        _dirs = {_.parent for _ in _paths} - {self.path}
+        while bool(_dirs):
+            _depth = max([len(_.parts) for _ in _dirs])
+            _level = [_ for _ in _dirs if len(_.parts) == _depth]
+            _dirs -= set(_level)
+            _removed = _map_in_threads(_rmdir_if_empty, _level, threads)
+            _dirs |= {
+                _d.parent for _d, _r in zip(_level, _removed) if _r
+            } - {self.path}
+
+    def _delete_rows(
+        self,
+        filters: FILTERS_TYPE,
+        filter_expression: pds.Expression,
+        dry_run: bool,
+        threads: int,
+    ) -> t.Union[bool, t.List[str]]:
+        """
+        Row level delete (see `delete_`). Holds compaction lock so that
+        compaction does not merge files while they are rewritten. Returns
+        True if any row was deleted (or for dry_run the files that have
+        matching rows).
+        """
+        with util.FileLock(path=self.path / _COMPACT_LOCK_FILE_NAME):
+            # --------------------------------------------------01
+            # files that can match as per partition values and stats
+            with self.lock(shared=True):
+                _entries = [
+                    _ for _ in _get_manifest(self).sorted_entries
+                    if _may_match(_, filters)
+                ]
+
+            # --------------------------------------------------02
+            # for dry run only report files that have matching rows
+            if dry_run:
+                with self.lock(shared=True):
+                    return [
+                        _e.path for _e, _m in zip(
+                            _entries,
+                            _map_in_threads(
+                                lambda _e: self._has_matching_rows(
+                                    _e, filter_expression),
+                                _entries, threads,
+                            )
+                        ) if _m
                     ]
-                )
 
-            # --------------------------------------------------04.03
-            # expect partition column
-            _pc_exp = _partition_cols[_depth]
+            # --------------------------------------------------03
+            # rewrite files that have matching rows in parallel (outside
+            # exclusive lock so that readers are not blocked)
+            # ... first remove temporary files left behind by delete that
+            #     crashed
+            for _dir in {(self.path / _.path).parent for _ in _entries}:
+                for _f in _dir.glob(f"{_DELETE_TEMP_PREFIX}*"):
+                    _f.unlink()
+            _rewrites = [
+                (_entry, ) + _rewrite for _entry, _rewrite in zip(
+                    _entries,
+                    _map_in_threads(
+                        lambda _e: self._rewrite_without_rows(
+                            entry=_e, filter_expression=filter_expression),
+                        _entries, threads,
+                    )
+                ) if _rewrite is not None
+            ]
+            if not bool(_rewrites):
+                return False
+
+            # --------------------------------------------------04
+            # swap under exclusive lock ... files deleted meanwhile (e.g. by
+            # other delete_) are skipped and their rewrites are discarded
+            with self.lock(shared=False):
+                _manifest = _get_manifest(self)
+                _add, _remove = [], []
+                for _entry, _temp_file, _new_entry in _rewrites:
+                    if _entry.path not in _manifest.entries:
+                        if _temp_file is not None:
+                            _temp_file.unlink()
+                        continue
+                    if _temp_file is not None:
+                        _temp_file.rename(self.path / _new_entry.path)
+                        _add.append(_new_entry)
+                    _remove.append(_entry)
+                _add_to_manifest(self, add=_add, remove=_remove)
+                self.internal.version_counter += 1
+                self._remove_files(entries=_remove, threads=threads)
+
+        # ------------------------------------------------------05
+        return bool(_remove)
+
+    def _file_dataset(self, entry: _ManifestEntry) -> pds.Dataset:
+        """
+        Dataset of one file with partition values as per manifest entry so
+        that filters can use partition columns too
+        """
+        _schema = self.internal.schema
+        _expression = pds.scalar(True)
+        for _k, _v in entry.partition.items():
+            _expression = operator.and_(
+                _expression,
+                pds.field(_k) == pds.scalar(
+                    pa.scalar(_v, type=_schema.field(_k).type)
+                ),
+            )
+        return pds.FileSystemDataset.from_paths(
+            [(self.path / entry.path).as_posix()],
+            schema=_schema,
+            format=self.internal.file_format.pds_format,
+            filesystem=self.file_system,
+            partitions=[_expression],
+        )
+
+    def _has_matching_rows(
+        self, entry: _ManifestEntry, filter_expression: pds.Expression,
+    ) -> bool:
+        """
+        Only first column and columns used by filter are read
+        """
+        self.internal.scan_count += 1
+        return self._file_dataset(entry).to_table(
+            columns=[self.internal.schema.names[0]],
+            filter=filter_expression,
+        ).num_rows > 0
 
-            # --------------------------------------------------04.04
-            # increment depth for further recursion if needed
-            _depth += 1
+    def _rewrite_without_rows(
+        self,
+        entry: _ManifestEntry,
+        filter_expression: pds.Expression,
+    ) -> t.Optional[
+        t.Tuple[t.Optional[pathlib.Path], t.Optional[_ManifestEntry]]
+    ]:
+        """
+        Writes temporary file with rows of file that do not match
+        filter_expression. Returns None if no row matches, else temporary
+        file and manifest entry for its final name (both None if all rows
+        match).
 
-            # --------------------------------------------------04.05
-            # get filters for this partition column
-            _filters_op_val_list = _filters_dict_of_op_val_list[_pc_exp]
+        Note that stats of file are retained as they are still valid bounds
+        (but may be not tight) for remaining rows.
+        """
+        # ------------------------------------------------------01
+        # dataset of file with partition values
+        _path = self.path / entry.path
+        _dataset = self._file_dataset(entry)
 
-            # --------------------------------------------------04.06
-            # crawl over folder for partition cols
-            for _nested_path in _path.iterdir():
+        # ------------------------------------------------------02
+        # check if any row matches
+        if not self._has_matching_rows(entry, filter_expression):
+            return None
 
-                # ----------------------------------------------04.06.01
-                # should be a dir
-                if not _nested_path.is_dir():
-                    e.code.CodingError(
-                        msgs=[
-                            f"We were expecting folder ..."
-                        ]
+        # ------------------------------------------------------03
+        # stream batches and write rows that do not match
+        # Note that we find matching rows by evaluating filter_expression on
+        # batch with row indices so that rows for which filter evaluates to
+        # null are retained
+        _partition_cols = self.internal.partition_cols or []
+        _chunks = entry.time_chunks
+        _chunk_ends = np.cumsum([_[1] for _ in _chunks])
+        _kept_per_chunk = np.zeros(len(_chunks), dtype=np.int64)
+        _offset = 0
+        _name = f"{_file_time_range(_path)[0]}-" \
+                f"{_file_time_range(_path)[1]}.{_writer_id()}." \
+                f"d{_rewrite_generation(_path) + 1}"
+        _temp_file = _path.parent / f"{_DELETE_TEMP_PREFIX}{_name}"
+        _writer = None
+        self.internal.scan_count += 1
+        try:
+            for _batch in _dataset.to_batches(
+                batch_size=_DELETE_BATCH_SIZE, use_threads=False,
+            ):
+                _table = pa.Table.from_batches([_batch])
+                _matched = pds.dataset(
+                    _table.append_column(
+                        "__index__",
+                        pa.array(np.arange(len(_table)), type=pa.int64())
                     )
+                ).to_table(
+                    columns=["__index__"], filter=filter_expression,
+                )["__index__"].to_numpy()
+                _mask = np.ones(len(_table), dtype=bool)
+                _mask[_matched] = False
+                _kept = np.nonzero(_mask)[0]
+                np.add.at(
+                    _kept_per_chunk,
+                    np.searchsorted(
+                        _chunk_ends, _offset + _kept, side='right'),
+                    1,
+                )
+                _offset += len(_table)
+                if len(_kept) == 0:
+                    continue
+                if _writer is None:
+                    _writer = _FileWriter(df_file=self, path=_temp_file)
+                _table = _table.take(pa.array(_kept))
+                if bool(_partition_cols):
+                    _table = _table.drop(_partition_cols)
+                _writer.write(_table)
+        except BaseException:
+            if _writer is not None:
+                _writer.close()
+                _temp_file.unlink()
+            raise
 
-                # ----------------------------------------------04.06.02
-                # todo: sometimes the folder names are like
-                #  <column_name>=<_val> and sometimes the folder names are
-                #  just value of columns ... this may be because of new
-                #  pyarrow version or may be because we supply schema
-                #  everywhere appropriately
-                # # get tokens from folder name
-                # _pc, _val = _nested_path.name.split("=")
-                # # the _pc from folder name should match expected partition
-                # # column
-                # if _pc != _pc_exp:
-                #     e.code.CodingError(
-                #         msgs=[
-                #             f"We were expecting all folder names to start "
-                #             f"with expected partition column name {_pc_exp}, "
-                #             f"instead found it to be {_pc}"
-                #         ]
-                #     )
-                # todo: this is when folder name is just column value
-                _val = _nested_path.name
-                try:
-                    # note that if int then becomes float bit that is okay with
-                    # expression matching in python
-                    _val = float(_val)
-                except ValueError:
-                    # nothing to do if exception it remains string
-                    ...
-
-                # ----------------------------------------------04.06.03
-                # check if nested dir satisfies the criterion for deletion
-                # based on the filters
-                # If filters are provided check filters and then decide if
-                # nested path needs to be deleted or not
-                if bool(_filters_op_val_list):
-                    _del = True  # flag
-                    for _op, _val1 in _filters_op_val_list:
-                        # Note that _filters_op_val_list is for specific _pc
-                        # so when all filter conditions we can delete if any
-                        # one is False then do not delete
-                        try:
-                            _del &= _op(_val, _val1)
-                        except TypeError:
-                            e.code.CodingError(
-                                msgs=[
-                                    f"Check supplied filters",
-                                    f"Operation {_op} cannot be applied on "
-                                    f"values {(_val, _val1)} with type "
-                                    f"{(type(_val), type(_val1))}"
-                                ]
-                            )
-                        # quick break
-                        if not _del:
-                            break
-                # if no filters for the partition column then all child
-                # folders are eligible for delete as no filter is applied
-                else:
-                    _del = True
-
-                # ----------------------------------------------04.06.04
-                # if _del then delete
-                if _del:
-                    # if last partition delete the folder
-                    if _pc_exp == _partition_cols[-1]:
-                        # delete
-                        # noinspection PyTypeChecker
-                        self.file_system.delete(
-                            _nested_path, recursive=False)
-                        # if nested path is empty the delete empty dir
-                        # todo: can this be optimized ??
-                        if _nested_path.exists():
-                            if util.io_is_dir_empty(_nested_path):
-                                _nested_path.unlink()
-                        # update global flag
-                        _something_deleted |= True
-                    # else call the method in recursion
-                    else:
-                        _something_deleted |= \
-                            _delete(_depth=_depth, _path=_nested_path)
-
-            # --------------------------------------------------04.07
-            # return
-            return _something_deleted
+        # ------------------------------------------------------04
+        # all rows matched
+        if _writer is None:
+            return None, None
+        _writer.close()
 
         # ------------------------------------------------------05
-        # call recursive function and track if deleted
-        _is_something_deleted = _delete(_depth=0, _path=self.path)
+        # entry for final name
+        _new_entry = dataclasses.replace(
+            entry,
+            path=(_path.parent / _name).relative_to(self.path).as_posix(),
+            rows=int(_kept_per_chunk.sum()),
+            bytes=_temp_file.stat().st_size,
+            time_index=[
+                (_c[0], int(_k)) for _c, _k in zip(_chunks, _kept_per_chunk)
+                if _k > 0
+            ],
+        )
+        return _temp_file, _new_entry
 
-        # ------------------------------------------------------06
-        # return True ... anyways when it reaches till here
-        # _is_something_deleted will be True
-        return _is_something_deleted
+    def read_if_exists(
+        self,
+        columns: t.List[str],
+        filter_expression: pds.Expression,
+        filters: t.Optional[FILTERS_TYPE] = None,
+        read_cache: t.Optional[DfFileReadCache] = None,
+    ) -> t.Optional[pa.Table]:
+        """
+        Unified read path used by read, exists and read_write modes.
 
-    def read(
+        The dataset is discovered once, scanned once and the empty check is
+        done on the same materialized table. So there is no need to call
+        `exists` before `read` which would have resulted in scanning the
+        disk twice.
+
+        Note that filters (from which filter_expression was baked) are
+        optional and only used to prune files with min/max stats. But when
+        read_cache is supplied they are needed as they are used as cache key
+        (i.e. filter_expression must be baked only from filters).
+
+        Returns None if nothing exists on disk for supplied filters.
+        """
+        # if nothing exists simply exit ... as there is no table to read on
+        # disk
+        # noinspection PyTypeChecker
+        if not self.file_system.exists(self.path):
+            return None
+        # if nothing was ever written then schema will not be known and
+        # there is nothing to read
+        if not self.internal.is_updated:
+            return None
+
+        # read table ... this should always be there and would be known even
+        # if not provided on first write
+        # Note that shared lock makes sure that compaction does not swap
+        # files while we discover and scan
+        with self.lock(shared=True):
+            # if no files in manifest then return None
+            if not bool(_get_manifest(self).entries):
+                return None
+            # cached table if DfFile did not change since it was read
+            _table = None
+            if read_cache is not None:
+                _key = read_cache.make_key(self.path, columns, filters)
+                _version = self.version
+                _table = read_cache.get(_key, _version)
+            if _table is None:
+                _table = _read_table(
+                    self, columns=columns,
+                    filter_expression=filter_expression, filters=filters,
+                )
+                if read_cache is not None:
+                    # noinspection PyUnboundLocalVariable
+                    read_cache.put(_key, _version, _table)
+
+        # return None if no rows
+        if len(_table) == 0:
+            return None
+        return _table
+
+    def read_batches(
         self,
         columns: t.List[str],
         filter_expression: pds.Expression,
+        batch_size: t.Optional[int] = None,
+        readahead: int = 1,
+        filters: t.Optional[FILTERS_TYPE] = None,
+    ) -> t.Iterator[pa.RecordBatch]:
+        """
+        Lazy iterator over `pa.RecordBatch`'s used by stream mode. Unlike
+        read it never materializes the complete table so arbitrarily large
+        DfFile's can be reduced or exported with bounded memory i.e. roughly
+        (readahead + 1) batches of batch_size rows.
+
+        Shared lock is held while the iterator is alive so that compaction
+        does not swap files under the scan. So please exhaust (or close) the
+        iterator before appending or deleting the same DfFile.
+
+        Args:
+            columns: columns to read
+            filter_expression: filter applied while scanning
+            batch_size: max rows per batch ... if None pyarrow default
+            readahead: number of batches prefetched in background thread
+              ... 0 means no background thread
+            filters: filters from which filter_expression was baked ... used
+              to prune files with min/max stats
+        """
+        # ------------------------------------------------------------- 01
+        # validate
+        if batch_size is not None and batch_size <= 0:
+            e.validation.NotAllowed(
+                msgs=[f"batch_size must be positive, found {batch_size}"]
+            )
+        if readahead < 0:
+            e.validation.NotAllowed(
+                msgs=[f"readahead cannot be negative, found {readahead}"]
+            )
+
+        # ------------------------------------------------------------- 02
+        # if nothing was ever written there is nothing to stream
+        # noinspection PyTypeChecker
+        if not self.file_system.exists(self.path) or \
+                not self.internal.is_updated:
+            return iter([])
+
+        # ------------------------------------------------------------- 03
+        # stream under shared lock ... note that generator is needed so that
+        # lock is acquired on first `next` and released when iterator is
+        # exhausted or closed
+        def _stream():
+            with self.lock(shared=True):
+                yield from _read_batches(
+                    self, columns=columns,
+                    filter_expression=filter_expression,
+                    batch_size=batch_size, readahead=readahead,
+                    filters=filters,
+                )
+
+        # ------------------------------------------------------------- 04
+        return _stream()
+
+    def read_since(
+        self,
+        watermark: int,
+        columns: t.Optional[t.List[str]] = None,
+        filter_expression: t.Optional[pds.Expression] = None,
+        filters: t.Optional[FILTERS_TYPE] = None,
+    ) -> t.Tuple[pa.Table, int]:
+        """
+        Incremental read for tailing DfFile's that are appended very often.
+        Returns rows appended after watermark and the new watermark to be
+        used for next call (use 0 for first call).
+
+        As files are named with time stamps (see `_write_table`) and
+        manifest knows all files, older files are skipped without opening
+        them. For compacted files we know when their chunks of rows were
+        written (see `_ManifestEntry.time_index`) so rows that were already
+        returned are sliced away.
+
+        Note that the files are expected to become visible in time stamp
+        order which is the case for serial appends. With write_pipeline or
+        with appends from other processes a slow write with older time stamp
+        can become visible after newer files were returned and then it is
+        missed.
+
+        Args:
+            watermark: time stamp returned by previous call
+            columns: columns to read
+            filter_expression: filter applied while scanning
+            filters: filters from which filter_expression was baked ... used
+              to prune files with min/max stats
+
+        Returns:
+            table with new rows (can be empty) and new watermark
+        """
+        # ------------------------------------------------------------- 01
+        # if nothing was ever written there is nothing to read ... note
+        # that without schema we cannot even make empty table
+        # noinspection PyTypeChecker
+        if not self.file_system.exists(self.path) or \
+                not self.internal.is_updated:
+            e.validation.NotAllowed(
+                msgs=[
+                    f"Nothing was ever written for {self.path} so we cannot "
+                    f"read since watermark"
+                ]
+            )
+            raise
+
+        with self.lock(shared=True):
+            _manifest = _get_manifest(self)
+
+            # --------------------------------------------------------- 02
+            # new watermark is from all files and not only from files that
+            # match filters
+            _entries = _manifest.sorted_entries
+            _new_watermark = max(
+                [watermark] + [
+                    _time_ns for _entry in _entries
+                    for _time_ns, _ in _entry.time_chunks
+                ]
+            )
+
+            # --------------------------------------------------------- 03
+            # files with new rows ... None means all rows are new else
+            # (offset, length) of new rows
+            _selected = []
+            for _entry in _entries:
+                if bool(filters) and not _may_match(_entry, filters):
+                    continue
+                _slices, _offset = [], 0
+                for _time_ns, _rows in _entry.time_chunks:
+                    if _time_ns > watermark:
+                        _slices.append((_offset, _rows))
+                    _offset += _rows
+                if not bool(_slices):
+                    continue
+                if len(_slices) == 1 and _slices[0] == (0, _entry.rows):
+                    _slices = None
+                _selected.append((_entry, _slices))
+
+            # --------------------------------------------------------- 04
+            # scan runs of files that are read completely in one go while
+            # files with partially new rows are read, sliced and then
+            # filtered in memory
+            self.internal.scan_count += 1
+            _tables, _run = [], []
+
+            # noinspection PyProtectedMember
+            def _scan_run():
+                _tables.append(
+                    _manifest._make_dataset(self, entries=_run).to_table(
+                        columns=columns, filter=filter_expression,
+                    )
+                )
+                _run.clear()
+
+            for _entry, _slices in _selected:
+                if _slices is None:
+                    _run.append(_entry)
+                    continue
+                if bool(_run):
+                    _scan_run()
+                # noinspection PyProtectedMember
+                _table = _manifest._make_dataset(
+                    self, entries=[_entry]).to_table()
+                _table = pa.concat_tables(
+                    [_table.slice(_o, _l) for _o, _l in _slices]
+                )
+                _tables.append(
+                    pds.dataset(_table).to_table(
+                        columns=columns, filter=filter_expression,
+                    )
+                )
+            # note that empty run gives empty table with schema
+            if bool(_run) or not bool(_tables):
+                _scan_run()
+
+        # ------------------------------------------------------------- 05
+        return pa.concat_tables(_tables), _new_watermark
+
+    def aggregate(
+        self,
+        group_by: t.List[str],
+        aggregations: AGGREGATIONS_TYPE,
+        filter_expression: t.Optional[pds.Expression] = None,
+        filters: t.Optional[FILTERS_TYPE] = None,
+        batch_size: t.Optional[int] = None,
+        threads: int = 1,
     ) -> pa.Table:
-        # this should always be there and would be known even if not provided
-        # on first write
-        _partitioning = self.internal.partitioning
+        """
+        Group by aggregations computed while scanning i.e. the raw data is
+        never materialized. Every fragment (i.e. file) is scanned batch by
+        batch and the partial aggregates (see `_Aggregation`) are combined.
+        With threads > 1 the fragments are aggregated in parallel.
+
+        Args:
+            group_by: columns to group by ... empty list means one group
+            aggregations: output column name mapped to (column, aggregation)
+              where aggregation is one of AGGREGATION_TYPE ... note that
+              nulls are skipped
+            filter_expression: filter applied while scanning
+            filters: filters from which filter_expression was baked ... used
+              to prune files with min/max stats
+            batch_size: max rows per batch ... if None pyarrow default
+            threads: number of fragments aggregated in parallel
+
+        Returns:
+            table with group_by columns and aggregations sorted by group_by
+            columns
+        """
+        # ------------------------------------------------------------- 01
+        # if nothing was ever written we do not know schema
+        # noinspection PyTypeChecker
+        if not self.file_system.exists(self.path) or \
+                not self.internal.is_updated:
+            e.validation.NotAllowed(
+                msgs=[
+                    f"There is nothing to aggregate on the disk for "
+                    f"{self.path}"
+                ]
+            )
+            raise
+
+        # ------------------------------------------------------------- 02
+        # validate
         _schema = self.internal.schema
+        if not bool(aggregations):
+            e.validation.NotAllowed(
+                msgs=[f"Please supply at least one aggregation"]
+            )
+        if threads <= 0:
+            e.validation.NotAllowed(
+                msgs=[f"threads must be positive, found {threads}"]
+            )
+        for _name, (_col, _fn) in aggregations.items():
+            if _name in group_by:
+                e.validation.NotAllowed(
+                    msgs=[
+                        f"Aggregation output `{_name}` clashes with group_by "
+                        f"column"
+                    ]
+                )
+            # noinspection PyUnresolvedReferences
+            e.validation.ShouldBeOneOf(
+                value=_fn, values=AGGREGATION_TYPE.__args__,
+                msgs=[f"Unsupported aggregation for output `{_name}`"]
+            )
+        for _col in group_by + [_c for _c, _ in aggregations.values()]:
+            e.validation.ShouldBeOneOf(
+                value=_col, values=_schema.names,
+                msgs=[f"Unknown column used for aggregation"]
+            )
+
+        # ------------------------------------------------------------- 03
+        # partial aggregates per fragment under shared lock
+        _kwargs = dict(
+            schema=_schema, filter_expression=filter_expression,
+            batch_size=batch_size, group_by=group_by,
+            aggregations=aggregations,
+        )
+        _partials = {}
+        with self.lock(shared=True):
+            self.internal.scan_count += 1
+            _fragments = list(
+                _make_dataset(self, filters=filters).get_fragments())
+            if threads == 1:
+                for _fragment in _fragments:
+                    _combine_partials(
+                        _partials, _aggregate_fragment(_fragment, **_kwargs),
+                        aggregations,
+                    )
+            else:
+                with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=threads
+                ) as _executor:
+                    for _fragment_partials in _executor.map(
+                        lambda _f: _aggregate_fragment(_f, **_kwargs),
+                        _fragments,
+                    ):
+                        _combine_partials(
+                            _partials, _fragment_partials, aggregations)
+
+        # ------------------------------------------------------------- 04
+        # without groups there is always one row
+        if not bool(group_by) and not bool(_partials):
+            _partials[()] = [
+                _AGGREGATIONS[_f].partial(
+                    pa.array([], type=_schema.field(_c).type))
+                for _c, _f in aggregations.values()
+            ]
+
+        # ------------------------------------------------------------- 05
+        # make table
+        _data = {}
+        for _i, _k in enumerate(group_by):
+            _data[_k] = pa.array(
+                [_key[_i] for _key in _partials.keys()],
+                type=_schema.field(_k).type,
+            )
+        for _j, (_name, (_col, _fn)) in enumerate(aggregations.items()):
+            _agg = _AGGREGATIONS[_fn]
+            _data[_name] = pa.array(
+                [_agg.finalize(_p[_j]) for _p in _partials.values()],
+                type=_agg.output_type(_schema.field(_col).type),
+            )
+        _table = pa.table(_data)
+        if bool(group_by):
+            _table = _table.take(
+                pc.sort_indices(
+                    _table, sort_keys=[(_k, 'ascending') for _k in group_by]
+                )
+            )
+
+        # ------------------------------------------------------------- 06
+        return _table
 
+    def read(
+        self,
+        columns: t.List[str],
+        filter_expression: pds.Expression,
+        filters: t.Optional[FILTERS_TYPE] = None,
+    ) -> pa.Table:
         # read table
-        _table = _read_table(
-            self, columns=columns, filter_expression=filter_expression,
-            partitioning=_partitioning,
-            table_schema=_schema
+        _table = self.read_if_exists(
+            columns=columns, filter_expression=filter_expression,
+            filters=filters,
         )
 
         # extra check
-        if len(_table) == 0:
+        if _table is None:
             e.code.ShouldNeverHappen(
                 msgs=[
                     "The exists check before read call should handled it.",
@@ -827,7 +3157,19 @@ class DfFile(Folder):
         self,
         value: t.Union[pa.Table, types.GeneratorType],
         yields: bool,
+        compaction_policy: t.Optional[DfFileCompactionPolicy] = None,
+        write_buffer: t.Optional[DfFileWriteBuffer] = None,
+        write_pipeline: t.Optional[DfFileWritePipeline] = None,
+        streamed_write: t.Optional[DfFileStreamedWrite] = None,
     ) -> bool:
+        # streamed writes are already cheap so pipeline makes no sense
+        if streamed_write is not None and write_pipeline is not None:
+            e.code.NotAllowed(
+                msgs=[
+                    f"write_pipeline cannot be used with streamed_write"
+                ]
+            )
+
         # is value a generator type
         _is_generator_type = isinstance(value, types.GeneratorType)
 
@@ -891,19 +3233,521 @@ class DfFile(Folder):
             # now update as config is updated
             self.internal.update_from_table_or_config(table=_table)
 
-        # get partitioning
-        _partitioning = self.internal.partitioning
+        # tables from `util.np_to_pa` have nested fixed size lists while
+        # schema inferred from tables of its older versions has variable
+        # size lists
+        _table = util.pa_fixed_size_lists_to_lists(
+            _table, self.internal.schema)
+        _iterator = (
+            util.pa_fixed_size_lists_to_lists(_, self.internal.schema)
+            for _ in _iterator
+        )
+
+        # writer that either writes in this thread or submits to pipeline
+        # of writer threads
+        _pipelined_writer = None
+        if streamed_write is not None:
+            # note that here only files that were rotated are written
+            _written_files = []
+
+            def _write(_t: pa.Table):
+                _written_files.extend(
+                    self._write_streamed(_t, streamed_write))
+        elif write_pipeline is None:
+            _written_files = []
+
+            def _write(_t: pa.Table):
+                _written_files.extend(_write_table(self, _t))
+        else:
+            _pipelined_writer = _PipelinedWriter(
+                df_file=self, write_pipeline=write_pipeline,
+            )
+            _write = _pipelined_writer.write
 
         # default behaviour is to append .... if you do not want that
         # please call self.delete() before calling this
-        # write first element
-        _write_table(self, _table, _partitioning)
-        # now write remaining
-        for _table in _iterator:
-            _write_table(self, _table, _partitioning)
+        try:
+            if write_buffer is None:
+                # write first element
+                _write(_table)
+                # now write remaining
+                for _table in _iterator:
+                    _write(_table)
+            else:
+                self._write_buffered(
+                    first_table=_table, iterator=_iterator,
+                    write_fn=_write, write_buffer=write_buffer,
+                )
+        except BaseException:
+            # let pending writes finish ... note that the exception in flight
+            # is raised and not the exception from writer threads
+            if _pipelined_writer is not None:
+                _pipelined_writer.close()
+            # things written before exception are on disk
+            self.internal.version_counter += 1
+            raise
+        if _pipelined_writer is not None:
+            _error = _pipelined_writer.close()
+            self.internal.version_counter += 1
+            if _error is not None:
+                raise _error
+            _written_files = _pipelined_writer.written_files
+        else:
+            self.internal.version_counter += 1
+
+        # compact partition folders that were written to if policy says so
+        if compaction_policy is not None:
+            self._compact_with_policy(
+                compaction_policy=compaction_policy,
+                partition_dirs=list(
+                    dict.fromkeys([_.parent for _ in _written_files])
+                ),
+            )
 
         # we do not return what we just wrote
         # for append and write we return True to avoid huge reads ....
         # just use read Mode to get the values
         # return bool
         return True
+
+    def _write_streamed(
+        self, table: pa.Table, streamed_write: DfFileStreamedWrite,
+    ) -> t.List[pathlib.Path]:
+        """
+        Writes table to open files of partition folders (see
+        `DfFileStreamedWrite`) and returns files that were finalized as they
+        grew beyond max_file_size.
+        """
+        if self.internal.stream_writers is None:
+            self.internal.stream_writers = {}
+        _writers = self.internal.stream_writers
+        _finalized_files = []
+        for _dir, _table in _split_by_partition(self, table):
+            _writer = _writers.get(_dir, None)
+            if _writer is None:
+                _writer = _StreamWriter(df_file=self, partition_dir=_dir)
+                _writers[_dir] = _writer
+            _writer.write(_table)
+            if _writer.nbytes >= streamed_write.max_file_size:
+                del _writers[_dir]
+                _finalized_files.append(_writer.close())
+        return _finalized_files
+
+    def close_streams(self) -> t.List[pathlib.Path]:
+        """
+        Finalizes files kept open by streamed writes (see
+        `DfFileStreamedWrite`) i.e. makes them visible to readers. This is
+        called when the hashable owning StoreField exits with context.
+
+        Returns:
+            files that were finalized
+        """
+        _writers = self.internal.stream_writers
+        if not bool(_writers):
+            return []
+        self.internal.stream_writers = None
+        self.internal.version_counter += 1
+        _finalized_files = []
+        _error = None
+        for _writer in _writers.values():
+            try:
+                _finalized_files.append(_writer.close())
+            except BaseException as _exc:
+                if _error is None:
+                    _error = _exc
+        if _error is not None:
+            raise _error
+        return _finalized_files
+
+    def _write_buffered(
+        self,
+        first_table: pa.Table,
+        iterator: t.Iterator[pa.Table],
+        write_fn: t.Callable[[pa.Table], None],
+        write_buffer: DfFileWriteBuffer,
+    ):
+        """
+        Concatenates tables from iterator and writes them with write_fn when
+        write_buffer is full. Buffer is flushed when iterator ends or raises
+        exception.
+        """
+        _buffer, _rows, _bytes = [], 0, 0
+
+        def _flush():
+            nonlocal _buffer, _rows, _bytes
+            if not bool(_buffer):
+                return
+            # empty buffer before writing so that failed write is never
+            # retried by flush on exception
+            _tables, _buffer, _rows, _bytes = _buffer, [], 0, 0
+            write_fn(pa.concat_tables(_tables))
+
+        _table = first_table
+        try:
+            while True:
+                _buffer.append(_table)
+                _rows += _table.num_rows
+                _bytes += _table.nbytes
+                if write_buffer.is_full(rows=_rows, nbytes=_bytes):
+                    _flush()
+                _table = next(iterator)
+        except StopIteration:
+            _flush()
+        except BaseException:
+            # generator raised so write what was yielded till now
+            _flush()
+            raise
+
+    def compact(
+        self, *,
+        target_file_size: int = 128 * 1024 * 1024,
+        small_file_size: t.Optional[int] = None,
+        partition_dirs: t.Optional[t.List[pathlib.Path]] = None,
+    ) -> int:
+        """
+        Merges small files (written by every append) in each partition folder
+        into files of approximately target_file_size bytes. This keeps the
+        dataset discovery and scans fast for StoreFields that are appended
+        very often.
+
+        Only contiguous runs (in write order) of small files are merged so
+        that the order of rows is preserved. The merged files are first
+        written as temporary files (which are ignored by pyarrow) and then
+        swapped under exclusive lock i.e. renamed to visible files while the
+        source files are deleted. As readers take shared lock there is no
+        window where they see duplicated or missing rows.
+
+        Args:
+            target_file_size: approximate size in bytes of merged files
+            small_file_size: only files smaller than this are merged ... if
+              None then same as target_file_size
+            partition_dirs: leaf partition folders to compact ... if None
+              then all partition folders are compacted
+
+        Returns:
+            number of files that were merged
+        """
+        # ------------------------------------------------------01
+        # if nothing was ever written there is nothing to compact
+        if not self.internal.is_updated:
+            return 0
+        if small_file_size is None:
+            small_file_size = target_file_size
+
+        # ------------------------------------------------------02
+        # only one compaction at a time for DfFile
+        _merged_count = 0
+        with util.FileLock(path=self.path / _COMPACT_LOCK_FILE_NAME):
+
+            # --------------------------------------------------02.01
+            # files per partition dir from manifest (in write order)
+            with self.lock(shared=True):
+                _entries_per_dir = self._manifest_entries_per_dir()
+            if partition_dirs is not None:
+                _entries_per_dir = {
+                    _dir: _entries_per_dir[_dir] for _dir in partition_dirs
+                    if _dir in _entries_per_dir
+                }
+
+            # --------------------------------------------------02.02
+            # loop over partition dirs
+            for _dir, _entries in _entries_per_dir.items():
+                # ----------------------------------------------02.02.01
+                # remove temporary files left behind by compaction that
+                # crashed
+                for _f in _dir.glob(f"{_COMPACT_TEMP_PREFIX}*"):
+                    _f.unlink()
+                # ----------------------------------------------02.02.02
+                # make bins of contiguous small files
+                _bins, _bin, _bin_size = [], [], 0
+                for _entry in _entries:
+                    _size = _entry.bytes
+                    if _size >= small_file_size or \
+                            _bin_size + _size > target_file_size:
+                        _bins.append(_bin)
+                        _bin, _bin_size = [], 0
+                    if _size < small_file_size:
+                        _bin.append(_entry)
+                        _bin_size += _size
+                _bins.append(_bin)
+                # ----------------------------------------------02.02.03
+                # merge bins
+                for _bin in _bins:
+                    if len(_bin) < 2:
+                        continue
+                    if self._merge_files(
+                        entries=_bin, target_file_size=target_file_size,
+                    ):
+                        _merged_count += len(_bin)
+
+        # ------------------------------------------------------03
+        # return
+        return _merged_count
+
+    def _manifest_entries_per_dir(
+        self
+    ) -> t.Dict[pathlib.Path, t.List[_ManifestEntry]]:
+        """
+        Manifest entries grouped by partition folder in write order
+        """
+        _ret = {}
+        for _entry in _get_manifest(self).sorted_entries:
+            _ret.setdefault(
+                (self.path / _entry.path).parent, []
+            ).append(_entry)
+        return _ret
+
+    def _merge_files(
+        self,
+        entries: t.List[_ManifestEntry],
+        target_file_size: int,
+    ) -> bool:
+        """
+        Merges files (that are in same folder) and swaps them atomically.
+        Returns False if any of the files was deleted meanwhile.
+        """
+        # ------------------------------------------------------01
+        # read files to be merged
+        _files = [self.path / _.path for _ in entries]
+        _dir = _files[0].parent
+        _file_format = self.internal.file_format
+        _table = pds.dataset(
+            source=[_.as_posix() for _ in _files],
+            filesystem=self.file_system,
+            format=_file_format.pds_format,
+            schema=_file_schema(self),
+        ).to_table()
+
+        # ------------------------------------------------------02
+        # estimate rows per file for target size
+        _bytes = sum([_.bytes for _ in entries])
+        _rows_per_file = max(
+            1, (len(_table) * target_file_size) // max(_bytes, 1)
+        )
+        _rows_per_group = _rows_per_file
+        if _file_format.row_group_size is not None:
+            _rows_per_group = min(_file_format.row_group_size, _rows_per_file)
+
+        # ------------------------------------------------------03
+        # write temporary files
+        # Note that name has first and last time stamp so that file sorts
+        # in the place of files it replaces
+        _name = f"{_file_time_range(_files[0])[0]}-" \
+                f"{max([_file_time_range(_)[1] for _ in _files])}." \
+                f"{_writer_id()}.c"
+        _temp_files, _new_entries = [], []
+        for _i, _start in enumerate(range(0, len(_table), _rows_per_file)):
+            _slice = _table.slice(_start, _rows_per_file)
+            _writer = _FileWriter(
+                df_file=self,
+                path=_dir / f"{_COMPACT_TEMP_PREFIX}{_name}{_i}",
+                row_group_size=_rows_per_group,
+            )
+            try:
+                _writer.write(_slice)
+            finally:
+                _writer.close()
+            _temp_files.append(_writer.path)
+            _new_entries.append(
+                _ManifestEntry.from_stats(
+                    df_file=self, path=_writer.path, rows=len(_slice),
+                    stats=_table_stats(self, _slice),
+                )
+            )
+        # record when rows of merged files were written so that incremental
+        # reads (see `read_since`) do not return them again
+        _chunks = collections.deque(
+            [_c for _entry in entries for _c in _entry.time_chunks]
+        )
+        for _i, _entry in enumerate(_new_entries):
+            _time_index, _rows = [], _entry.rows
+            while _rows > 0:
+                _time_ns, _chunk_rows = _chunks.popleft()
+                if _chunk_rows > _rows:
+                    _chunks.appendleft((_time_ns, _chunk_rows - _rows))
+                    _chunk_rows = _rows
+                _time_index.append((_time_ns, _chunk_rows))
+                _rows -= _chunk_rows
+            _new_entries[_i] = dataclasses.replace(
+                _entry, time_index=_time_index)
+
+        # ------------------------------------------------------04
+        # swap under exclusive lock
+        with self.lock(shared=False):
+            # if something was deleted meanwhile (e.g. by delete_) then
+            # discard temporary files
+            _manifest = _get_manifest(self)
+            if not all([_.path in _manifest.entries for _ in entries]):
+                for _f in _temp_files:
+                    _f.unlink()
+                return False
+            # when files of earlier merge by this writer are merged again
+            # the time range and hence name can be same ... so numbering
+            # continues after files that exist so that merged file never
+            # replaces file it is merged from
+            _first = 1 + max(
+                [
+                    int(_.name[len(_name):]) for _ in _dir.iterdir()
+                    if _.name.startswith(_name) and
+                    _.name[len(_name):].isdigit()
+                ],
+                default=-1,
+            )
+            _new_files = [
+                _dir / f"{_name}{_first + _i}"
+                for _i in range(len(_temp_files))
+            ]
+            if any([_ in _files for _ in _new_files]):
+                e.code.ShouldNeverHappen(
+                    msgs=[
+                        f"Merged file names collide with files they are "
+                        f"merged from",
+                        dict(
+                            sources=[_.as_posix() for _ in _files],
+                            merged=[_.as_posix() for _ in _new_files],
+                        ),
+                    ]
+                )
+                raise
+            _new_entries = [
+                dataclasses.replace(
+                    _entry, path=_new_file.relative_to(self.path).as_posix(),
+                )
+                for _entry, _new_file in zip(_new_entries, _new_files)
+            ]
+            for _temp_file, _new_file in zip(_temp_files, _new_files):
+                _temp_file.rename(_new_file)
+            _add_to_manifest(self, add=_new_entries, remove=entries)
+            for _f in _files:
+                _f.unlink()
+
+        # ------------------------------------------------------05
+        return True
+
+    def _compact_with_policy(
+        self,
+        compaction_policy: DfFileCompactionPolicy,
+        partition_dirs: t.List[pathlib.Path],
+    ):
+        # wait for previous background compaction if any
+        self.wait_for_compaction()
+
+        # partition dirs that need compaction
+        _entries_per_dir = self._manifest_entries_per_dir()
+        partition_dirs = [
+            _ for _ in partition_dirs
+            if compaction_policy.needs_compaction(
+                file_sizes=[_e.bytes for _e in _entries_per_dir.get(_, [])]
+            )
+        ]
+        if not bool(partition_dirs):
+            return
+
+        # compact
+        _kwargs = dict(
+            target_file_size=compaction_policy.target_file_size,
+            small_file_size=compaction_policy.small_file_size,
+            partition_dirs=partition_dirs,
+        )
+        if compaction_policy.background:
+            # noinspection PyUnusedLocal
+            def _compact_fn():
+                try:
+                    self.compact(**_kwargs)
+                except BaseException as _exc:
+                    _thread.exception = _exc
+            _thread = threading.Thread(target=_compact_fn)
+            _thread.exception = None
+            self.internal.compaction_thread = _thread
+            _thread.start()
+        else:
+            self.compact(**_kwargs)
+
+    def rebuild_manifest(self) -> int:
+        """
+        Repairs manifest by scanning the DfFile folder. Useful when files
+        were copied/removed by hand, when process crashed while writing, or
+        for DfFile's written before manifests were introduced (in which case
+        this is called automatically on first access).
+
+        Note that if compaction crashed after merged files were renamed but
+        before source files were removed, the source files are recognized by
+        time stamps covered by merged file names and are ignored. Same is
+        true for files rewritten by row level delete (see `delete_`).
+
+        Returns:
+            number of files recorded in manifest
+        """
+        # ------------------------------------------------------01
+        # nothing can be known about files if nothing was ever written
+        if not self.internal.is_updated:
+            return 0
+
+        with _manifest_lock(self):
+            # --------------------------------------------------02
+            # walk leaf partition folders
+            _dirs = [self.path]
+            for _ in self.internal.partition_cols or []:
+                _dirs = [
+                    _nested for _dir in _dirs for _nested in _dir.iterdir()
+                    if _nested.is_dir() and not _is_ignored(_nested)
+                ]
+
+            # --------------------------------------------------03
+            # make entries ... skip files that are covered by merged files
+            # or by files rewritten by delete with higher generation
+            # note that streamed files also have time range in name but
+            # they never replace other files
+            _entries = []
+            for _dir in _dirs:
+                _files = _data_files(_dir)
+                _ranges = [
+                    _file_time_range(_) for _ in _files
+                    if _.suffix.startswith(".c")
+                ]
+                _rewrites = [
+                    (_file_time_range(_), _rewrite_generation(_))
+                    for _ in _files if _.suffix.startswith(".d")
+                ]
+                for _f in _files:
+                    _range = _file_time_range(_f)
+                    if any(
+                        [
+                            _r != _range and
+                            _r[0] <= _range[0] and _range[1] <= _r[1]
+                            for _r in _ranges
+                        ]
+                    ):
+                        continue
+                    _generation = _rewrite_generation(_f)
+                    if any(
+                        [
+                            _g > _generation and
+                            _r[0] <= _range[0] and _range[1] <= _r[1]
+                            for _r, _g in _rewrites
+                        ]
+                    ):
+                        continue
+                    _entries.append(_ManifestEntry.from_file(self, _f))
+
+            # --------------------------------------------------04
+            # replace manifest atomically
+            _write_manifest(self, entries=_entries)
+
+        # ------------------------------------------------------05
+        return len(_entries)
+
+    def wait_for_compaction(self):
+        """
+        Waits for background compaction (if any) started by append when
+        StoreField is configured with DfFileCompactionPolicy.
+        """
+        _thread = self.internal.compaction_thread
+        if _thread is None:
+            return
+        _thread.join()
+        self.internal.compaction_thread = None
+        # noinspection PyUnresolvedReferences
+        if _thread.exception is not None:
+            # noinspection PyUnresolvedReferences
+            raise _thread.exception
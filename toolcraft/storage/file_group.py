@@ -17,14 +17,268 @@ import numpy as np
 import gc
 import datetime
 import random
+import collections
+import concurrent.futures
+import multiprocessing as mp
+import pickle
+import queue
+import traceback
+from multiprocessing import shared_memory
 
 from .. import util, logger, settings
+from .. import marshalling as m
 from .. import storage as s
 from .. import error as e
 from . import HashesDict, StorageHashable
 
 _LOGGER = logger.get_logger()
 
+# seed used for `DETERMINISTIC_SHUFFLE` and as default seed for shuffle
+# modes below
+_DETERMINISTIC_SEED = 259746  # some arbitrary number
+
+
+@dataclasses.dataclass(frozen=True)
+class BlockShuffle:
+    """
+    Shuffle mode that permutes contiguous blocks of rows and then shuffles
+    rows within consecutive buffers of `buffer_size` rows. Reads stay
+    sequential within blocks so that datasets much larger than RAM can be
+    read with near sequential disk throughput.
+
+    Args:
+        block_size: number of contiguous rows in a block
+        buffer_size: rows are shuffled within consecutive buffers of this
+          many rows after blocks are permuted (1 means no shuffling within
+          blocks)
+        seed: random seed ... same seed gives same order while None gives
+          non deterministic order
+    """
+    block_size: int
+    buffer_size: int = 1
+    seed: t.Optional[int] = _DETERMINISTIC_SEED
+
+    def __post_init__(self):
+        if self.block_size <= 0 or self.buffer_size <= 0:
+            e.code.NotAllowed(
+                msgs=[
+                    f"`block_size` and `buffer_size` must be positive, found "
+                    f"{self.block_size} and {self.buffer_size}"
+                ]
+            )
+
+    def indices(self, length: int) -> np.ndarray:
+        _rng = np.random.RandomState(self.seed)
+
+        # ---------------------------------------------------- 01
+        # permute blocks ... note that last block can be partial
+        _starts = _rng.permutation(
+            (length + self.block_size - 1) // self.block_size
+        ) * self.block_size
+        _lengths = np.minimum(self.block_size, length - _starts)
+        _offsets = np.cumsum(_lengths) - _lengths
+        _indices = np.repeat(_starts - _offsets, _lengths) + np.arange(length)
+
+        # ---------------------------------------------------- 02
+        # shuffle within buffers ... note that last buffer can be partial
+        if self.buffer_size > 1:
+            _full = length - length % self.buffer_size
+            _buffers = _indices[:_full].reshape(-1, self.buffer_size)
+            _indices[:_full] = np.take_along_axis(
+                _buffers, _rng.random_sample(_buffers.shape).argsort(axis=1),
+                axis=1,
+            ).reshape(-1)
+            _indices[_full:] = _rng.permutation(_indices[_full:])
+
+        # ---------------------------------------------------- 03
+        return _indices
+
+
+@dataclasses.dataclass(frozen=True)
+class WindowedShuffle:
+    """
+    Shuffle mode that behaves like a shuffle buffer of `buffer_size` rows
+    over a sequential scan i.e. buffer is filled with first rows and then
+    for every next row a random row from buffer is emitted and replaced by
+    it. Remaining rows are emitted in random order at the end.
+
+    Reads are sequential so that datasets much larger than RAM can be read
+    with sequential disk throughput while rows move at most `buffer_size`
+    positions ahead.
+
+    Args:
+        buffer_size: number of rows in shuffle buffer
+        seed: random seed ... same seed gives same order while None gives
+          non deterministic order
+    """
+    buffer_size: int
+    seed: t.Optional[int] = _DETERMINISTIC_SEED
+
+    def __post_init__(self):
+        if self.buffer_size <= 0:
+            e.code.NotAllowed(
+                msgs=[
+                    f"`buffer_size` must be positive, found "
+                    f"{self.buffer_size}"
+                ]
+            )
+
+    def indices(self, length: int) -> np.ndarray:
+        """
+        Vectorized shuffle buffer. At step `i` a random slot is emitted and
+        then row `buffer_size + i` is put in that slot. So a slot emits the
+        row put in it when it was last picked (or its initial row if never
+        picked before).
+        """
+        _rng = np.random.RandomState(self.seed)
+        _size = min(self.buffer_size, length)
+        _steps = length - _size
+
+        # ---------------------------------------------------- 01
+        # slot picked on every step
+        _slots = _rng.randint(0, _size, _steps) if _size > 0 else \
+            np.zeros(0, dtype=int)
+
+        # ---------------------------------------------------- 02
+        # for every step find the step when same slot was last picked
+        _order = np.argsort(_slots, kind="stable")
+        _is_first = np.ones(_steps, dtype=bool)
+        _is_first[1:] = _slots[_order[1:]] != _slots[_order[:-1]]
+        _last_step = np.empty(_steps, dtype=np.int64)
+        _last_step[_order[1:]] = _order[:-1]
+
+        # ---------------------------------------------------- 03
+        # rows emitted while scanning
+        _indices = np.empty(length, dtype=np.int64)
+        _emitted = _size + _last_step
+        _emitted[_order[_is_first]] = _slots[_order[_is_first]]
+        _indices[:_steps] = _emitted
+
+        # ---------------------------------------------------- 04
+        # rows left in buffer are emitted in random order
+        _buffer = np.arange(_size, dtype=np.int64)
+        _is_last = np.ones(_steps, dtype=bool)
+        _is_last[:-1] = _is_first[1:]
+        _buffer[_slots[_order[_is_last]]] = _size + _order[_is_last]
+        _indices[_steps:] = _buffer[_rng.permutation(_size)]
+
+        # ---------------------------------------------------- 05
+        return _indices
+
+
+class _FeistelIndices:
+    """
+    Lazy shuffle indices for `FeistelShuffle` ... behaves like
+    `np.random.permutation(length)` for indexing with int, slice, list of
+    ints or int array but every index is computed on the fly.
+    """
+
+    def __init__(self, length: int, keys: np.ndarray):
+        self.length = length
+        self.keys = keys
+        # bits in each half of the smallest even bit domain that covers
+        # length ... so that domain is less than `4 * length` and cycle
+        # walking needs few rounds on average
+        self.half_bits = max(1, (int(length - 1).bit_length() + 1) // 2)
+        self.half_mask = np.uint64((1 << self.half_bits) - 1)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(
+        self, item: "SELECT_TYPE"
+    ) -> t.Union[np.int64, np.ndarray]:
+        # ---------------------------------------------------- 01
+        # get requested positions
+        if isinstance(item, slice):
+            _positions = np.arange(*item.indices(self.length), dtype=np.int64)
+        else:
+            _positions = np.array(item, dtype=np.int64)
+            if (
+                (_positions < -self.length) | (_positions >= self.length)
+            ).any():
+                raise IndexError(
+                    f"index {item} is out of bounds for shuffle indices "
+                    f"with length {self.length}"
+                )
+            _positions[_positions < 0] += self.length
+
+        # ---------------------------------------------------- 02
+        # encrypt positions ... values outside domain are encrypted again
+        # (i.e. cycle walking) which keeps it a bijection on `[0, length)`
+        _values = self.encrypt(_positions.reshape(-1).astype(np.uint64))
+        _outside = np.flatnonzero(_values >= self.length)
+        while len(_outside) > 0:
+            _values[_outside] = self.encrypt(_values[_outside])
+            _outside = _outside[_values[_outside] >= self.length]
+
+        # ---------------------------------------------------- 03
+        _values = _values.astype(np.int64).reshape(_positions.shape)
+        if _values.ndim == 0:
+            return _values[()]
+        return _values
+
+    def encrypt(self, values: np.ndarray) -> np.ndarray:
+        """
+        Balanced feistel network over `2 * half_bits` bits
+        """
+        _shift = np.uint64(self.half_bits)
+        _left = values >> _shift
+        _right = values & self.half_mask
+        _x = np.empty_like(values)
+        for _key in self.keys:
+            # round function based on splitmix64 finalizer
+            np.bitwise_xor(_right, _key, out=_x)
+            _x *= np.uint64(0x9E3779B97F4A7C15)
+            _x ^= _x >> np.uint64(32)
+            _x *= np.uint64(0xBF58476D1CE4E5B9)
+            _x ^= _x >> np.uint64(29)
+            _x &= self.half_mask
+            _left ^= _x
+            _left, _right = _right, _left
+        _left <<= _shift
+        _left |= _right
+        return _left
+
+
+@dataclasses.dataclass(frozen=True)
+class FeistelShuffle:
+    """
+    Shuffle mode that uses keyed bijection over row indices (feistel cipher
+    with cycle walking) in place of `np.random.permutation`. Shuffle indices
+    are computed on the fly so memory needed is O(1) irrespective of number
+    of rows and opening is instant even for billions of rows.
+
+    Note that computing indices for every batch makes batch reads about 2x
+    slower than with integer seed (see `NpyMemMap`) so use it only for files
+    whose shuffle indices do not fit in memory.
+
+    Args:
+        rounds: number of feistel rounds
+        seed: random seed used to generate round keys ... same seed gives
+          same order while None gives non deterministic order
+    """
+    rounds: int = 4
+    seed: t.Optional[int] = _DETERMINISTIC_SEED
+
+    def __post_init__(self):
+        if self.rounds < 3:
+            e.code.NotAllowed(
+                msgs=[
+                    f"Need at least 3 feistel rounds for a pseudo random "
+                    f"permutation, found {self.rounds}"
+                ]
+            )
+
+    def indices(self, length: int) -> _FeistelIndices:
+        return _FeistelIndices(
+            length=length,
+            keys=np.random.RandomState(self.seed).randint(
+                0, 2 ** 63, size=self.rounds, dtype=np.int64
+            ).astype(np.uint64),
+        )
+
+
 SHUFFLE_SEED_TYPE = t.Union[
     t.Literal[
         'DETERMINISTIC_SHUFFLE',
@@ -33,6 +287,9 @@ SHUFFLE_SEED_TYPE = t.Union[
         'NON_DETERMINISTIC_SHUFFLE',
     ],
     np.ndarray,
+    BlockShuffle,
+    WindowedShuffle,
+    FeistelShuffle,
 ]
 # noinspection PyUnresolvedReferences
 DETERMINISTIC_SHUFFLE = SHUFFLE_SEED_TYPE.__args__[0].__args__[0]
@@ -969,6 +1226,53 @@ class FileGroup(StorageHashable, abc.ABC):
             raise
 
 
+# runs shorter than this on average are gathered with one sorted fancy index
+# instead of one slice per run (see `_read_rows_in_order`)
+_MIN_AVG_RUN_LENGTH = 4
+
+
+def _read_rows_in_order(memmap: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    Same as `memmap[indices]` but reads rows from disk in ascending order.
+
+    Fancy indexing a memmap with shuffled indices touches pages in random
+    order (see https://github.com/numpy/numpy/issues/13172). Here we sort
+    the indices, read contiguous runs with slices (or gather the sorted
+    indices when runs are short) and then restore the requested order in
+    memory.
+    """
+    # ---------------------------------------------------------- 01
+    # sort indices
+    _order = np.argsort(indices, kind="stable")
+    _sorted = indices[_order]
+
+    # ---------------------------------------------------------- 02
+    # find contiguous runs in sorted indices
+    _breaks = np.flatnonzero(np.diff(_sorted) != 1) + 1
+    _starts = np.concatenate([[0], _breaks])
+    _ends = np.concatenate([_breaks, [len(_sorted)]])
+
+    # ---------------------------------------------------------- 03
+    # read rows in ascending order and place them at requested positions
+    _ret = np.empty((len(_sorted), *memmap.shape[1:]), dtype=memmap.dtype)
+    if len(_starts) * _MIN_AVG_RUN_LENGTH > len(_sorted):
+        _ret[_order] = memmap[_sorted]
+    else:
+        # runs that also land at contiguous positions are copied with slices
+        _gaps = np.concatenate([[0], np.cumsum(np.diff(_order) != 1)])
+        _is_slice = _gaps[_ends - 1] == _gaps[_starts]
+        for _start, _end, _as_slice in zip(_starts, _ends, _is_slice):
+            _first = _sorted[_start]
+            _rows = memmap[_first:_first + _end - _start]
+            if _as_slice:
+                _ret[_order[_start]:_order[_start] + _end - _start] = _rows
+            else:
+                _ret[_order[_start:_end]] = _rows
+
+    # ---------------------------------------------------------- 04
+    return _ret
+
+
 # noinspection PyArgumentList
 class NpyMemMap:
     """
@@ -981,6 +1285,12 @@ class NpyMemMap:
         Note that you can always access data that will not be shuffled via
         self.memmap ... in case you want to read huge memmap's for debugging
         and do not want shuffling behaviour
+        Use `BlockShuffle` or `WindowedShuffle` as shuffle_seed to trade
+        randomness for sequential disk access.
+        `FeistelShuffle` trades read speed for O(1) memory i.e. batches are
+        read about 2x slower as indices are computed per batch. So use it
+        only when shuffle indices of file (8 bytes per row) do not fit in
+        memory and not as general purpose shuffle mode.
 
     todo: we can support in future support multiple NpyMemMap files with
       shuffle where multiple NpyMemMap's can be accessed randomly with with
@@ -1144,17 +1454,30 @@ class NpyMemMap:
             # this surprising code is needed if you end up using list of ints
             # example ...
             # noinspection PyTypeChecker
-            return _call_helper.memmap[
+            return self._read_rows(
                 # this one is first dimension and works on memmap mostly used
                 # for shuffling
                 item[0]
-            ][
+            )[
                 # remaining items ... note that slice(None, None, None) is
                 # used to select all elements after applying index item[0]
                 (USE_ALL, *item[1:])
             ]
         else:
-            return _call_helper.memmap[item]
+            return self._read_rows(item)
+
+    def _read_rows(self, item: SELECT_TYPE) -> np.ndarray:
+        """
+        Read rows for first dimension index.
+
+        Shuffled indices are read in ascending order so that disk (or
+        network file system) access is mostly sequential.
+        """
+        _call_helper = self.call_helper
+        if _call_helper.is_shuffled and isinstance(item, np.ndarray) and \
+                item.ndim == 1:
+            return _read_rows_in_order(_call_helper.memmap, item)
+        return _call_helper.memmap[item]
 
     def __call__(
         self,
@@ -1354,10 +1677,13 @@ class NpyMemMapCallHelper:
 
         # if np.ndarray then check shape
         if isinstance(shuffle_seed, np.ndarray):
-            if not np.array_equal(
-                np.unique(shuffle_seed),
-                np.arange(_len, dtype=shuffle_seed.dtype)
-            ):
+            # every index must be seen once ... O(n) in place of np.unique
+            _seen = np.zeros(_len, dtype=bool)
+            if len(shuffle_seed) == _len and shuffle_seed.ndim == 1 and \
+                    shuffle_seed.dtype.kind in "iu" and \
+                    shuffle_seed.min() >= 0 and shuffle_seed.max() < _len:
+                _seen[shuffle_seed] = True
+            if not _seen.all():
                 e.code.CodingError(
                     msgs=[
                         f"While supplying shuffle seed as shuffle indices "
@@ -1369,6 +1695,13 @@ class NpyMemMapCallHelper:
             self.shuffle_indices = shuffle_seed
             return
 
+        # if shuffle mode then get indices from it
+        if isinstance(
+            shuffle_seed, (BlockShuffle, WindowedShuffle, FeistelShuffle)
+        ):
+            self.shuffle_indices = shuffle_seed.indices(_len)
+            return
+
         # if DETERMINISTIC_SHUFFLE reassign it with deterministic seed
         if str(shuffle_seed) in [
             DETERMINISTIC_SHUFFLE, NON_DETERMINISTIC_SHUFFLE
@@ -1376,7 +1709,7 @@ class NpyMemMapCallHelper:
             if str(shuffle_seed) == NON_DETERMINISTIC_SHUFFLE:
                 shuffle_seed = None
             if str(shuffle_seed) == DETERMINISTIC_SHUFFLE:
-                shuffle_seed = 259746  # some arbitrary number
+                shuffle_seed = _DETERMINISTIC_SEED
             np.random.seed(shuffle_seed)
             self.shuffle_indices = np.random.permutation(_len)
             np.random.seed(None)
@@ -1396,6 +1729,299 @@ class NpyMemMapCallHelper:
                 del self.shuffle_indices
 
 
+def _prefetch_in_threads(
+    fn: t.Callable, items: t.Iterable[t.Any], prefetch: int, threads: int,
+) -> t.Iterator[t.Any]:
+    """
+    Like `map` but at most `prefetch` items are fetched ahead by a bounded
+    thread pool while consumer works on current result. Results are in the
+    order of items and exceptions are raised when their result is consumed.
+    """
+    # ------------------------------------------------------------- 01
+    # no prefetch so simply yield in current thread
+    if prefetch == 0:
+        for _item in items:
+            yield fn(_item)
+        return
+
+    # ------------------------------------------------------------- 02
+    # keep at most prefetch futures in flight
+    _items = iter(items)
+    _futures = collections.deque()
+    _executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+    try:
+        for _item in _items:
+            _futures.append(_executor.submit(fn, _item))
+            if len(_futures) > prefetch:
+                yield _futures.popleft().result()
+        while bool(_futures):
+            yield _futures.popleft().result()
+    finally:
+        # if consumer stops early we do not need pending results
+        for _future in _futures:
+            _future.cancel()
+        _executor.shutdown(wait=True)
+
+
+def _read_npy_batch(
+    npy_memmaps: t.Dict[str, NpyMemMap], start: int, batch_size: int,
+    transform: t.Optional[t.Callable],
+) -> t.Dict[str, np.ndarray]:
+    """
+    Read batch for all NpyMemMap's (which must be within `with` context)
+    and apply transform if any.
+    """
+    _ret = {}
+    for _fk, _npy_memmap in npy_memmaps.items():
+        if len(_npy_memmap) == 1:
+            _ret[_fk] = _npy_memmap[USE_ALL]
+            continue
+        _batch = _npy_memmap[start:start + batch_size]
+        # unshuffled slices are views on memmap ... copy so that data is
+        # actually read from disk in background
+        if isinstance(_batch, np.memmap):
+            _batch = np.array(_batch)
+        _ret[_fk] = _batch
+    if transform is not None:
+        _ret = transform(_ret)
+    return _ret
+
+
+class _RemoteTraceback(Exception):
+    """
+    Used as cause of exceptions raised in loader worker processes so that
+    traceback from worker is shown.
+    """
+
+    def __init__(self, tb: str):
+        super().__init__()
+        self.tb = tb
+
+    def __str__(self) -> str:
+        return self.tb
+
+
+def _npy_loader_worker(
+    files: t.Dict[str, pathlib.Path],
+    shuffle_seed: SHUFFLE_SEED_TYPE,
+    batch_size: int,
+    transform: t.Optional[t.Callable],
+    slot_names: t.List[str],
+    layout: t.Dict[str, t.Tuple[int, int, np.dtype]],
+    tasks: mp.Queue,
+    results: mp.Queue,
+    stop: mp.Event,
+):
+    """
+    Runs in worker process of `_prefetch_in_processes`. Every task is
+    (batch index, slot) and the batch is written in shared memory slot as
+    per layout i.e. {file_key: (offset, nbytes, dtype)}. Results are
+    (batch index, slot, shapes, error).
+
+    Worker exits on None task or as soon as stop is set i.e. pending tasks
+    are not processed when consumer stops early.
+    """
+    # ------------------------------------------------------------- 01
+    # open own memmaps and shared memory slots
+    _npy_memmaps = {_fk: NpyMemMap(file_path=_p) for _fk, _p in files.items()}
+    for _npy_memmap in _npy_memmaps.values():
+        _npy_memmap(shuffle_seed=shuffle_seed)
+        _npy_memmap.__enter__()
+    _slots = [shared_memory.SharedMemory(name=_) for _ in slot_names]
+
+    # ------------------------------------------------------------- 02
+    # process tasks till None is received
+    try:
+        while not stop.is_set():
+            _task = tasks.get()
+            if _task is None or stop.is_set():
+                break
+            _index, _slot = _task
+            try:
+                _batch = _read_npy_batch(
+                    _npy_memmaps, _index * batch_size, batch_size, transform
+                )
+                _shapes = {}
+                for _fk, (_offset, _nbytes, _dtype) in layout.items():
+                    _array = np.asarray(_batch[_fk])
+                    if _array.dtype != _dtype or _array.nbytes > _nbytes:
+                        raise ValueError(
+                            f"Batch {_index} for {_fk!r} has dtype "
+                            f"{_array.dtype} and {_array.nbytes} bytes but "
+                            f"first batch had dtype {_dtype} and {_nbytes} "
+                            f"bytes"
+                        )
+                    np.ndarray(
+                        _array.shape, dtype=_dtype,
+                        buffer=_slots[_slot].buf, offset=_offset,
+                    )[...] = _array
+                    _shapes[_fk] = _array.shape
+                results.put((_index, _slot, _shapes, None))
+            except Exception as _exc:
+                # send exception only if it can be unpickled in main process
+                try:
+                    pickle.loads(pickle.dumps(_exc))
+                except Exception:
+                    _exc = None
+                results.put(
+                    (_index, _slot, None, (_exc, traceback.format_exc()))
+                )
+    finally:
+        # results that consumer will never read must not block exit of
+        # process (queue feeder thread waits till they are written to pipe)
+        if stop.is_set():
+            results.cancel_join_thread()
+        for _slot in _slots:
+            _slot.close()
+        for _npy_memmap in _npy_memmaps.values():
+            _npy_memmap.__exit__(None, None, None)
+
+
+# seconds to wait for loader worker to stop before terminating it
+_LOADER_JOIN_TIMEOUT = 0.5
+
+
+def _prefetch_in_processes(
+    npy_memmaps: t.Dict[str, NpyMemMap],
+    shuffle_seed: SHUFFLE_SEED_TYPE,
+    batch_size: int,
+    num_batches: int,
+    transform: t.Optional[t.Callable],
+    prefetch: int,
+    num_workers: int,
+) -> t.Iterator[t.Dict[str, np.ndarray]]:
+    """
+    Batches are read (and transformed) by worker processes that open their
+    own memmaps and write batches in a ring of shared memory slots. Yielded
+    batches are views on the slots i.e. no copy, hence they are valid only
+    till next batch is asked for ... copy them if you want to keep them.
+
+    First batch is read in this process to know the layout of slots (note
+    that transform can change shape and dtype). Batches are yielded in
+    order, worker exceptions are raised here and workers are shut down and
+    shared memory is released when consumer stops.
+    """
+    # ------------------------------------------------------------- 01
+    # first batch decides layout {file_key: (offset, nbytes, dtype)}
+    if num_batches == 0:
+        return
+    _first = _read_npy_batch(npy_memmaps, 0, batch_size, transform)
+    _layout = {}
+    _size = 0
+    for _fk, _array in _first.items():
+        _array = np.asarray(_array)
+        _layout[_fk] = (_size, _array.nbytes, _array.dtype)
+        # align every array to 64 bytes
+        _size += (_array.nbytes + 63) // 64 * 64
+    if num_batches == 1:
+        yield _first
+        return
+
+    # ------------------------------------------------------------- 02
+    # start workers
+    _num_slots = max(prefetch, num_workers) + 1
+    _slots = [
+        shared_memory.SharedMemory(create=True, size=max(_size, 1))
+        for _ in range(_num_slots)
+    ]
+    _ctx = mp.get_context()
+    _tasks = _ctx.Queue()
+    _results = _ctx.Queue()
+    _stop = _ctx.Event()
+    _workers = [
+        _ctx.Process(
+            target=_npy_loader_worker,
+            kwargs=dict(
+                files={_fk: _.file_path for _fk, _ in npy_memmaps.items()},
+                shuffle_seed=shuffle_seed, batch_size=batch_size,
+                transform=transform, slot_names=[_.name for _ in _slots],
+                layout=_layout, tasks=_tasks, results=_results,
+                stop=_stop,
+            ),
+            daemon=True,
+        ) for _ in range(num_workers)
+    ]
+    for _worker in _workers:
+        _worker.start()
+
+    # ------------------------------------------------------------- 03
+    # batch i is written in slot i % num_slots ... slot is reused only after
+    # consumer asks for next batch
+    try:
+        for _index in range(1, min(_num_slots + 1, num_batches)):
+            _tasks.put((_index, _index % _num_slots))
+        yield _first
+        del _first
+        _ready = {}
+        for _index in range(1, num_batches):
+            # wait for batch
+            while _index not in _ready:
+                try:
+                    _result = _results.get(timeout=0.1)
+                    _ready[_result[0]] = _result
+                except queue.Empty:
+                    for _worker in _workers:
+                        if not _worker.is_alive():
+                            raise RuntimeError(
+                                f"Loader worker {_worker.name} exited "
+                                f"unexpectedly with exit code "
+                                f"{_worker.exitcode}"
+                            )
+            _, _slot, _shapes, _error = _ready.pop(_index)
+            if _error is not None:
+                _exc, _tb = _error
+                if _exc is None:
+                    _exc = RuntimeError(
+                        f"Loader worker failed for batch {_index}"
+                    )
+                raise _exc from _RemoteTraceback(_tb)
+            # yield views on slot
+            yield {
+                _fk: np.ndarray(
+                    _shapes[_fk], dtype=_dtype,
+                    buffer=_slots[_slot].buf, offset=_offset,
+                )
+                for _fk, (_offset, _, _dtype) in _layout.items()
+            }
+            # consumer asked for next batch so slot can be reused
+            if _index + _num_slots < num_batches:
+                _tasks.put((_index + _num_slots, _slot))
+    finally:
+        # ------------------------------------------------------------- 04
+        # shut down workers and release shared memory ... workers stop
+        # after batch they are reading (None wakes up idle workers) and are
+        # terminated if that takes long
+        _stop.set()
+        for _ in _workers:
+            _tasks.put(None)
+        for _worker in _workers:
+            _worker.join(timeout=_LOADER_JOIN_TIMEOUT)
+            if _worker.is_alive():
+                _worker.terminate()
+                _worker.join()
+        for _queue in [_tasks, _results]:
+            _queue.cancel_join_thread()
+            _queue.close()
+        for _slot in _slots:
+            try:
+                _slot.close()
+            except BufferError:
+                # consumer still holds views ... memory is released when
+                # they are garbage collected
+                ...
+            _slot.unlink()
+
+
+class NpyFileGroupInternal(m.Internal):
+
+    # generator of batches returned by `NpyFileGroup.on_iter` (see
+    # `NpyFileGroup.on_exit`)
+    batches: t.Optional[t.Generator] = None
+
+    def vars_that_can_be_overwritten(self) -> t.List[str]:
+        return super().vars_that_can_be_overwritten() + ['batches']
+
+
 @dataclasses.dataclass(frozen=True)
 class NpyFileGroup(FileGroup, abc.ABC):
     """
@@ -1404,6 +2030,11 @@ class NpyFileGroup(FileGroup, abc.ABC):
       python garbage collection will not take over
     """
 
+    @property
+    @util.CacheResult
+    def internal(self) -> NpyFileGroupInternal:
+        return NpyFileGroupInternal(self)
+
     @property
     @abc.abstractmethod
     def shape(self) -> t.Dict[str, t.Tuple]:
@@ -1448,17 +2079,80 @@ class NpyFileGroup(FileGroup, abc.ABC):
             for fk in self.file_keys
         }
 
+    @property
+    def iterable_length(self) -> int:
+        _batch_size = self.internal.on_call_kwargs['batch_size']
+        if _batch_size is None:
+            e.code.NotAllowed(
+                msgs=[
+                    f"Supply `batch_size` while calling {self.__class__} "
+                    f"to iterate over batches"
+                ]
+            )
+        _len = max(self.lengths.values())
+        if self.internal.on_call_kwargs['drop_last']:
+            return _len // _batch_size
+        return (_len + _batch_size - 1) // _batch_size
+
     # noinspection PyMethodOverriding
     def __call__(
         self, *,
         on_iter_show_progress_bar: bool = True,
         shuffle_seed: SHUFFLE_SEED_TYPE,
+        batch_size: int = None,
+        drop_last: bool = False,
+        prefetch: int = 2,
+        num_threads: int = 1,
+        num_workers: int = 0,
+        transform: t.Callable[
+            [t.Dict[str, np.ndarray]], t.Dict[str, np.ndarray]
+        ] = None,
     ) -> "NpyFileGroup":
+        """
+        Args:
+            on_iter_show_progress_bar: show progress bar while iterating
+            shuffle_seed: shuffle seed for all NpyMemMap's
+            batch_size: needed only for iterating ... when iterating dicts
+              with batches for all file_keys are yielded (files with single
+              value are yielded as it is)
+            drop_last: do not yield last batch if it is smaller than
+              batch_size
+            prefetch: number of batches fetched ahead in background while
+              iterating (0 means batches are read when asked for)
+            num_threads: number of threads that fetch batches ahead
+            num_workers: if more than 0 batches are fetched ahead by these
+              many worker processes in shared memory (see
+              `_prefetch_in_processes`) instead of threads ... note that
+              then yielded batches are valid only till next batch
+            transform: function applied on dict of batches in thread or
+              worker process that fetches it (must be picklable if
+              multiprocessing start method is not fork)
+        """
+        # validate
+        if batch_size is not None and batch_size <= 0:
+            e.code.NotAllowed(
+                msgs=[f"`batch_size` must be positive, found {batch_size}"]
+            )
+        if prefetch < 0 or num_threads <= 0 or num_workers < 0:
+            e.code.NotAllowed(
+                msgs=[
+                    f"`prefetch` and `num_workers` must be non negative and "
+                    f"`num_threads` must be positive, found {prefetch}, "
+                    f"{num_workers} and {num_threads}"
+                ]
+            )
+
         # call super
         # noinspection PyTypeChecker
         return super().__call__(
             on_iter_show_progress_bar=on_iter_show_progress_bar,
-            shuffle_seed=shuffle_seed
+            shuffle_seed=shuffle_seed,
+            batch_size=batch_size,
+            drop_last=drop_last,
+            prefetch=prefetch,
+            num_threads=num_threads,
+            num_workers=num_workers,
+            transform=transform,
         )
 
     def on_enter(self):
@@ -1471,15 +2165,89 @@ class NpyFileGroup(FileGroup, abc.ABC):
                 'shuffle_seed'
             ]  # type: SHUFFLE_SEED_TYPE
 
+        # non deterministic shuffle is resolved once so that all NpyMemmaps
+        # have same shuffle indices and rows across files remain aligned
+        # ... a local generator is used so that global numpy random state is
+        # not touched
+        if not self.has_arbitrary_lengths:
+            _rng = np.random.default_rng()
+            if str(shuffle_seed) == NON_DETERMINISTIC_SHUFFLE:
+                shuffle_seed = _rng.permutation(max(self.lengths.values()))
+            elif isinstance(
+                shuffle_seed, (BlockShuffle, WindowedShuffle, FeistelShuffle)
+            ) and shuffle_seed.seed is None:
+                shuffle_seed = dataclasses.replace(
+                    shuffle_seed, seed=int(_rng.integers(0, 2 ** 31 - 1))
+                )
+            # so that loader worker processes use the resolved seed
+            self.internal.on_call_kwargs['shuffle_seed'] = shuffle_seed
+
         # make NpyMemmaps aware of seed
         for k, v in self.all_npy_mem_maps_cache.items():
             v(shuffle_seed=shuffle_seed)
             v.__enter__()
 
+    def on_iter(self) -> t.Iterable[t.Dict[str, np.ndarray]]:
+        # ---------------------------------------------------------- 01
+        # get kwargs passed in call
+        _kwargs = self.internal.on_call_kwargs
+        _batch_size = _kwargs['batch_size']
+        if _batch_size is None:
+            return super().on_iter()
+        if self.has_arbitrary_lengths:
+            e.code.NotAllowed(
+                msgs=[
+                    f"Cannot iterate over batches as files have different "
+                    f"lengths",
+                    self.lengths,
+                ]
+            )
+
+        # ---------------------------------------------------------- 02
+        # batches are read in background worker processes
+        if _kwargs['num_workers'] > 0:
+            self.internal.batches = _prefetch_in_processes(
+                npy_memmaps=self.all_npy_mem_maps_cache,
+                shuffle_seed=_kwargs['shuffle_seed'],
+                batch_size=_batch_size,
+                num_batches=self.iterable_length,
+                transform=_kwargs['transform'],
+                prefetch=_kwargs['prefetch'],
+                num_workers=_kwargs['num_workers'],
+            )
+            return self.internal.batches
+
+        # ---------------------------------------------------------- 03
+        # batches are read in background threads
+        self.internal.batches = _prefetch_in_threads(
+            fn=self._read_batch,
+            items=[
+                _ * _batch_size for _ in range(self.iterable_length)
+            ],
+            prefetch=_kwargs['prefetch'],
+            threads=_kwargs['num_threads'],
+        )
+        return self.internal.batches
+
+    def _read_batch(self, start: int) -> t.Dict[str, np.ndarray]:
+        return _read_npy_batch(
+            npy_memmaps=self.all_npy_mem_maps_cache,
+            start=start,
+            batch_size=self.internal.on_call_kwargs['batch_size'],
+            transform=self.internal.on_call_kwargs['transform'],
+        )
+
     def on_exit(self):
         # call super
         super().on_exit()
 
+        # when loop breaks early batch generator is still suspended ... close
+        # it so that prefetch threads or worker processes stop before memmaps
+        # they read from are closed
+        if self.internal.batches is not None:
+            self.internal.batches.close()
+            self.internal.batches = None
+
         # exit numpy memmaps
         # We have opened up all NpyMemMap's with shuffle_seed='DO_NOT_USE' ...
         # for use within `with` context ... so now we close it
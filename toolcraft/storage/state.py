@@ -3,6 +3,9 @@ Module that will hold code to do state management
 """
 
 import dataclasses
+import os
+import stat
+import sys
 import pathlib
 import typing as t
 import datetime
@@ -13,6 +16,24 @@ from .. import util, settings
 from .. import marshalling as m
 
 
+def _atomic_write_text(path: pathlib.Path, text: str):
+    """
+    Write to a process specific temp file and rename it over path so that
+    other processes reading the state file never see it half written.
+    """
+    _temp_path = path.parent / f".{path.name}.{os.getpid()}.tmp"
+    _temp_path.write_text(text)
+    try:
+        os.replace(_temp_path, path)
+    except PermissionError:
+        # windows cannot replace read only file i.e. info file that other
+        # process created and made read only in the meantime
+        if sys.platform != "win32":
+            raise
+        os.chmod(path, stat.S_IWRITE)
+        os.replace(_temp_path, path)
+
+
 class Suffix:
     info = ".info"
     config = ".config"
@@ -128,8 +149,9 @@ class Info(StateFile):
                 )
         else:
             # handle info file and make it read only
-            # ... write hashable info
-            self.path.write_text(_yaml)
+            # ... write hashable info (atomically as other processes might
+            #     be creating the same info file)
+            _atomic_write_text(self.path, _yaml)
             # ... make read only as done only once
             util.io_make_path_read_only(self.path)
 
@@ -296,7 +318,20 @@ class Config(StateFile):
 
         # -------------------------------------------------- 03
         # write to disk
-        self.path.write_text(_current_state)
+        _atomic_write_text(self.path, _current_state)
+
+    def reload(self):
+        """
+        Re-read config from disk without syncing back. Needed when other
+        processes might have updated the config file after this instance
+        was created (read it while holding some cross process lock).
+        """
+        if self.path.exists():
+            _hashable_dict_from_disk = \
+                m.FrozenDict.from_yaml(self.path.read_text())
+            self.__dict__.update(
+                _hashable_dict_from_disk.get()
+            )
 
     def reset(self):
         """
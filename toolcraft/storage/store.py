@@ -26,16 +26,28 @@ import pathlib
 import enum
 import pyarrow.dataset as pds
 import dataclasses
+import asyncio
+import concurrent.futures
+import functools
+import threading
+import weakref
 
 from .. import marshalling as m
 from .. import error as e
 from .. import util
 from .df_file import \
-    DfFile, FILTERS_TYPE, FILTER_VALUE_TYPE, bake_expression
+    DfFile, DfFileFormat, DfFileCompactionPolicy, DfFileWriteBuffer, \
+    DfFileWritePipeline, DfFileStreamedWrite, DfFileReadCache, \
+    FILTERS_TYPE, FILTER_VALUE_TYPE, bake_expression, read_df_files
 from . import Folder
 
 
-MODE_TYPE = t.Literal['r', 'rw', 'd', 'e', 'a', 'w']
+MODE_TYPE = t.Literal['r', 'rw', 'd', 'e', 'a', 'w', 's', 'agg', 'rs']
+
+# StoreFieldsFolder and DfFile instances are created on first call of
+# decorated method ... calls can happen from many threads (see
+# `StoreFieldsAio`) so creation is guarded
+_ON_CALL_LOCK = threading.RLock()
 
 
 @dataclasses.dataclass(frozen=True)
@@ -60,6 +72,14 @@ class StoreFieldsFolder(Folder):
     def contains(self) -> t.Type[DfFile]:
         return DfFile
 
+    def close_streams(self):
+        """
+        Finalizes files kept open by StoreFields with `streamed_write`
+        (see `DfFile.close_streams`)
+        """
+        for _df_file in self.items.values():  # type: DfFile
+            _df_file.close_streams()
+
     def init_validate(self):
         # call super
         super().init_validate()
@@ -90,6 +110,9 @@ class Mode(enum.Enum):
     read_write = "rw"
     delete = "d"
     exists = "e"
+    stream = "s"
+    aggregate = "agg"
+    read_since = "rs"
 
     @property
     def is_streaming_possible(self) -> bool:
@@ -99,7 +122,10 @@ class Mode(enum.Enum):
         property states that read_write mode can never be used with
         write and read_write.
         """
-        if self in [self.append, self.delete, self.exists, self.read]:
+        if self in [
+            self.append, self.delete, self.exists, self.read, self.stream,
+            self.aggregate, self.read_since,
+        ]:
             return True
         elif self in [self.read_write, self.write]:
             return False
@@ -127,7 +153,8 @@ class Mode(enum.Enum):
         ]:
             return True
         elif self in [
-            self.read, self.exists
+            self.read, self.exists, self.stream, self.aggregate,
+            self.read_since,
         ]:
             return False
         else:
@@ -168,7 +195,10 @@ class OnCallReturn(t.NamedTuple):
         store_field: "StoreField",
         df_file: DfFile,
         **kwargs
-    ) -> t.Union[bool, pa.Table]:
+    ) -> t.Union[
+        bool, pa.Table, t.Iterator[pa.RecordBatch], t.List[str],
+        t.Tuple[pa.Table, int],
+    ]:
         """
         Process based on mode
 
@@ -182,38 +212,28 @@ class OnCallReturn(t.NamedTuple):
         """
         # ------------------------------------------------------- 01
         if self.mode is Mode.read:
-            _exists = df_file.exists(
+            # single pass read i.e. dataset discovery, scan and empty check
+            # happen only once
+            _table = df_file.read_if_exists(
                 columns=self.columns,
                 filter_expression=self.filter_expression,
-                return_table=True
+                filters=self.filters,
+                read_cache=store_field.read_cache,
             )
-            if isinstance(_exists, pa.Table):
-                return _exists
-            elif isinstance(_exists, bool):
-                if _exists:
-                    return df_file.read(
-                        columns=self.columns,
-                        filter_expression=self.filter_expression,
-                    )
-                else:
-                    e.validation.NotAllowed(
-                        msgs=[
-                            f"There is nothing to read on the disk. Please "
-                            f"check if exists before performing read."
-                        ]
-                    )
-                    raise
-            else:
-                e.code.ShouldNeverHappen(
+            if _table is None:
+                e.validation.NotAllowed(
                     msgs=[
-                        f"Cannot recognize type {type(_exists)}"
+                        f"There is nothing to read on the disk. Please "
+                        f"check if exists before performing read."
                     ]
                 )
                 raise
+            return _table
         # ------------------------------------------------------- 02
         elif self.mode is Mode.write:
             _exists = df_file.exists(
                 columns=self.columns,
+                filters=self.filters,
                 filter_expression=self.filter_expression,
                 return_table=False
             )
@@ -230,74 +250,174 @@ class OnCallReturn(t.NamedTuple):
                 return df_file.append(
                     value=store_field.dec_fn(for_hashable, **kwargs),
                     yields=store_field.yields,
+                    compaction_policy=store_field.compaction_policy,
+                    write_buffer=store_field.write_buffer,
+                    write_pipeline=store_field.write_pipeline,
                 )
         # ------------------------------------------------------- 03
         elif self.mode is Mode.append:
+            # files for streamed writes can be kept open only within with
+            # context of for_hashable as they are finalized on its exit
+            _streamed_write = None
+            if for_hashable.is_called:
+                _streamed_write = store_field.streamed_write
             # noinspection PyTypeChecker
             return df_file.append(
                 value=store_field.dec_fn(for_hashable, **kwargs),
                 yields=store_field.yields,
+                compaction_policy=store_field.compaction_policy,
+                write_buffer=store_field.write_buffer,
+                write_pipeline=store_field.write_pipeline,
+                streamed_write=_streamed_write,
             )
         # ------------------------------------------------------- 04
         elif self.mode is Mode.delete:
-            return df_file.delete_(filters=self.filters)
+            # dry_run reports files that would be deleted (or rewritten)
+            # while threads bounds parallel removal of files
+            _mode_options = self.mode_options or {}
+            _unknown = set(_mode_options.keys()) - {'dry_run', 'threads'}
+            if bool(_unknown):
+                e.code.NotAllowed(
+                    msgs=[
+                        f"Unsupported mode_options {_unknown} for mode "
+                        f"{self.mode}",
+                        f"Supported mode_options are `dry_run` and `threads`"
+                    ]
+                )
+            return df_file.delete_(filters=self.filters, **_mode_options)
         # ------------------------------------------------------- 05
         elif self.mode is Mode.exists:
             return df_file.exists(
                 columns=self.columns,
+                filters=self.filters,
                 filter_expression=self.filter_expression,
                 return_table=False
             )
         # ------------------------------------------------------- 06
         elif self.mode is Mode.read_write:
-            # check if exists
-            _exists = df_file.exists(
+            # read if exists ... note that this is single pass read
+            _table = df_file.read_if_exists(
                 columns=self.columns,
                 filter_expression=self.filter_expression,
-                return_table=True
+                filters=self.filters,
+                read_cache=store_field.read_cache,
+            )
+            if _table is not None:
+                return _table
+            # else create table
+            _yields = store_field.yields
+            _value = store_field.dec_fn(for_hashable, **kwargs)
+            # noinspection PyTypeChecker
+            df_file.append(
+                value=_value,
+                yields=_yields,
+                compaction_policy=store_field.compaction_policy,
+                write_buffer=store_field.write_buffer,
+                write_pipeline=store_field.write_pipeline,
             )
-            if isinstance(_exists, pa.Table):
-                return _exists
-            elif isinstance(_exists, bool):
-                # if something existed then it should have been a table so
-                # raise error ...
-                if _exists:
-                    e.code.CodingError(
-                        msgs=[
-                            f"Ideally this should be table as we used "
-                            f"return_table=True",
-                            f"If nothing exists it should be false ... check "
-                            f"the code ..."
-                        ]
-                    )
-                # else create table
-                else:
-                    _yields = store_field.yields
-                    _value = store_field.dec_fn(for_hashable, **kwargs)
-                    # noinspection PyTypeChecker
-                    df_file.append(
-                        value=_value,
-                        yields=_yields,
-                    )
 
-                    # the _value will be generator if yields was mentioned so
-                    # we need to read it else we return _value
-                    if _yields:
-                        return df_file.read(
-                            columns=self.columns,
-                            filter_expression=self.filter_expression,
-                        )
-                    else:
-                        # noinspection PyTypeChecker
-                        return _value
+            # the _value will be generator if yields was mentioned so
+            # we need to read it else we return _value
+            if _yields:
+                return df_file.read(
+                    columns=self.columns,
+                    filter_expression=self.filter_expression,
+                    filters=self.filters,
+                )
             else:
-                e.code.ShouldNeverHappen(
+                # noinspection PyTypeChecker
+                return _value
+        # ------------------------------------------------------- 07
+        elif self.mode is Mode.stream:
+            # lazy iterator of record batches ... note that unlike read mode
+            # we do not raise error when nothing exists as that can only be
+            # known while iterating
+            _mode_options = self.mode_options or {}
+            _unknown = set(_mode_options.keys()) - {'batch_size', 'readahead'}
+            if bool(_unknown):
+                e.code.NotAllowed(
                     msgs=[
-                        f"Cannot recognize type {type(_exists)}"
+                        f"Unsupported mode_options {_unknown} for mode "
+                        f"{self.mode}",
+                        f"Supported mode_options are `batch_size` and "
+                        f"`readahead`"
                     ]
                 )
-                raise
-        # ------------------------------------------------------- 07
+            return df_file.read_batches(
+                columns=self.columns,
+                filter_expression=self.filter_expression,
+                filters=self.filters,
+                batch_size=_mode_options.get('batch_size', None),
+                readahead=_mode_options.get('readahead', 1),
+            )
+        # ------------------------------------------------------- 08
+        elif self.mode is Mode.aggregate:
+            # group by aggregations computed while scanning batches so that
+            # only small result table is in memory
+            _mode_options = self.mode_options or {}
+            _unknown = set(_mode_options.keys()) - {
+                'group_by', 'aggregations', 'batch_size', 'threads'
+            }
+            if bool(_unknown):
+                e.code.NotAllowed(
+                    msgs=[
+                        f"Unsupported mode_options {_unknown} for mode "
+                        f"{self.mode}",
+                        f"Supported mode_options are `group_by`, "
+                        f"`aggregations`, `batch_size` and `threads`"
+                    ]
+                )
+            if 'aggregations' not in _mode_options.keys():
+                e.code.NotAllowed(
+                    msgs=[
+                        f"Please supply `aggregations` in mode_options for "
+                        f"mode {self.mode}"
+                    ]
+                )
+            if self.columns is not None:
+                e.code.NotAllowed(
+                    msgs=[
+                        f"The `columns` kwarg cannot be used with mode "
+                        f"{self.mode} as columns are decided by "
+                        f"`group_by` and `aggregations`"
+                    ]
+                )
+            return df_file.aggregate(
+                group_by=_mode_options.get('group_by', None) or [],
+                aggregations=_mode_options['aggregations'],
+                filter_expression=self.filter_expression,
+                filters=self.filters,
+                batch_size=_mode_options.get('batch_size', None),
+                threads=_mode_options.get('threads', 1),
+            )
+        # ------------------------------------------------------- 09
+        elif self.mode is Mode.read_since:
+            # incremental read of rows appended after watermark ... returns
+            # table along with new watermark to be used for next call
+            _mode_options = self.mode_options or {}
+            _unknown = set(_mode_options.keys()) - {'watermark'}
+            if bool(_unknown):
+                e.code.NotAllowed(
+                    msgs=[
+                        f"Unsupported mode_options {_unknown} for mode "
+                        f"{self.mode}",
+                        f"Supported mode_options are `watermark`"
+                    ]
+                )
+            if 'watermark' not in _mode_options.keys():
+                e.code.NotAllowed(
+                    msgs=[
+                        f"Please supply `watermark` in mode_options for "
+                        f"mode {self.mode} (use 0 for first call)"
+                    ]
+                )
+            return df_file.read_since(
+                watermark=_mode_options['watermark'],
+                columns=self.columns,
+                filter_expression=self.filter_expression,
+                filters=self.filters,
+            )
+        # ------------------------------------------------------- 10
         else:
             e.code.ShouldNeverHappen(
                 msgs=[f"Unsupported mode {self.mode}"]
@@ -318,6 +438,170 @@ def is_store_field(property_or_fn) -> bool:
         )
 
 
+class StoreFieldsAio:
+    """
+    Awaitable variants of methods decorated with StoreField (available as
+    `hashable.aio`) for asyncio based code i.e.
+
+    >>> await hashable.aio.store_metrics(mode='r', epoch=0)
+
+    The calls are offloaded to a bounded thread pool (shared by all
+    hashables, see `max_workers`) so that arrow io never blocks the event
+    loop and many reads across different DfFile's run concurrently.
+
+    Calls that write or delete (see `Mode.is_write_or_delete_mode`) are
+    executed one at a time per DfFile in the order the calls were made.
+    Note that for this the call is scheduled right away (as asyncio task)
+    i.e. even before it is awaited.
+
+    For mode `s` an async iterator over batches is returned.
+    """
+
+    # set before first call to change size of thread pool
+    max_workers: int = 8
+    _executor = None  # type: t.Optional[concurrent.futures.ThreadPoolExecutor]
+    _executor_lock = threading.Lock()
+    # per event loop ... asyncio.Lock per DfFile to order writes
+    _write_locks = \
+        weakref.WeakKeyDictionary()  # type: t.MutableMapping[t.Any, t.Dict]
+
+    def __init__(self, hashable: m.HashableClass):
+        self.hashable = hashable
+
+    @classmethod
+    def executor(cls) -> concurrent.futures.ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=cls.max_workers,
+                    thread_name_prefix="store_field_aio",
+                )
+            return cls._executor
+
+    def __getattr__(self, item: str) -> t.Callable[..., asyncio.Future]:
+        # do not pretend to have private or dunder attributes
+        if item.startswith("_"):
+            raise AttributeError(item)
+        _method = getattr(self.hashable.__class__, item, None)
+        if not inspect.isfunction(_method) or not is_store_field(_method):
+            e.code.CodingError(
+                msgs=[
+                    f"Method `{item}` of class {self.hashable.__class__} "
+                    f"is not decorated with {StoreField}"
+                ]
+            )
+
+        def _aio_fn(**kwargs) -> asyncio.Future:
+            return asyncio.ensure_future(self._call(item, kwargs))
+        return _aio_fn
+
+    async def _call(self, name: str, kwargs: t.Dict[str, t.Any]) -> t.Any:
+        _loop = asyncio.get_event_loop()
+        _fn = functools.partial(getattr(self.hashable, name), **kwargs)
+        _mode = Mode.mode_from_str(kwargs.get(StoreField.LITERAL.mode, None))
+
+        # --------------------------------------------------- 01
+        # writes and deletes are ordered per DfFile
+        if _mode.is_write_or_delete_mode:
+            _locks = self._write_locks.setdefault(_loop, {})
+            _key = (self.hashable.store_fields_location / name).as_posix()
+            if _key not in _locks.keys():
+                _locks[_key] = asyncio.Lock()
+            async with _locks[_key]:
+                return await _loop.run_in_executor(self.executor(), _fn)
+
+        # --------------------------------------------------- 02
+        # streaming reads i.e. batches are also fetched in thread pool
+        if _mode is Mode.stream:
+            _batches = await _loop.run_in_executor(self.executor(), _fn)
+            return self._iterate(_batches)
+
+        # --------------------------------------------------- 03
+        # other reads run concurrently
+        return await _loop.run_in_executor(self.executor(), _fn)
+
+    async def _iterate(
+        self, batches: t.Iterator[pa.RecordBatch]
+    ) -> t.AsyncIterator[pa.RecordBatch]:
+        _loop = asyncio.get_event_loop()
+        _done = object()
+        while True:
+            _batch = await _loop.run_in_executor(
+                self.executor(), next, batches, _done)
+            if _batch is _done:
+                return
+            yield _batch
+
+
+def read_store_field(
+    hashables: t.List[m.HashableClass],
+    store_field_name: str,
+    columns: t.Optional[t.List[str]] = None,
+    filters: t.Optional[FILTERS_TYPE] = None,
+    owner_column: str = "owner",
+    owner: t.Literal['name', 'hex_hash'] = 'name',
+) -> t.Optional[pa.Table]:
+    """
+    Reads StoreField of many hashables (e.g. from hyperparameter sweep) with
+    one scan instead of calling decorated method for every hashable which
+    would discover and scan every DfFile separately (see `read_df_files`).
+
+    Args:
+        hashables: hashables whose class has StoreField store_field_name
+        store_field_name: name of method decorated with StoreField
+        columns: columns to read (owner_column can be also used)
+        filters: filters (owner_column can be also used)
+        owner_column: name of extra column that identifies hashable
+        owner: property of hashable used as value for owner_column
+
+    Returns:
+        table or None if nothing exists on disk for supplied filters
+    """
+    # ------------------------------------------------------- 01
+    # get DfFile's
+    _df_files = {}  # type: t.Dict[str, DfFile]
+    for _hashable in hashables:
+        # ---------------------------------------------------- 01.01
+        # validate
+        _method = getattr(_hashable.__class__, store_field_name, None)
+        if not inspect.isfunction(_method) or not is_store_field(_method):
+            e.code.CodingError(
+                msgs=[
+                    f"Method `{store_field_name}` of class "
+                    f"{_hashable.__class__} is not decorated with "
+                    f"{StoreField}"
+                ]
+            )
+        _owner = getattr(_hashable, owner)
+        if _owner in _df_files.keys():
+            e.code.NotAllowed(
+                msgs=[
+                    f"Found hashables with same {owner} `{_owner}` ... "
+                    f"please supply unique hashables"
+                ]
+            )
+        # ---------------------------------------------------- 01.02
+        # skip hashables which never stored anything
+        if not (_hashable.store_fields_location / store_field_name).exists():
+            continue
+        # ---------------------------------------------------- 01.03
+        # get DfFile ... the config on disk is loaded when created
+        _folder = _hashable.store_fields_folder
+        if store_field_name in _folder.items.keys():
+            _df_files[_owner] = _folder.items[store_field_name]
+        else:
+            _df_files[_owner] = DfFile(
+                for_hashable=store_field_name, parent_folder=_folder
+            )
+
+    # ------------------------------------------------------- 02
+    # one scan
+    return read_df_files(
+        df_files=_df_files, owner_column=owner_column,
+        columns=columns, filters=filters,
+    )
+
+
 class StoreField:
     """
     Will be used as a decorator.
@@ -343,10 +627,15 @@ class StoreField:
     # noinspection PyUnusedLocal
     def __init__(
         self, *,
-        streamed_write: bool = False,
+        streamed_write: t.Union[bool, DfFileStreamedWrite] = False,
         partition_cols: t.Optional[t.List[str]] = None,
         yields: bool = False,
         table_schema: pa.Schema = None,
+        file_format: DfFileFormat = None,
+        compaction_policy: DfFileCompactionPolicy = None,
+        write_buffer: DfFileWriteBuffer = None,
+        write_pipeline: DfFileWritePipeline = None,
+        read_cache: DfFileReadCache = None,
     ):
         """
         Decorating for_hashable's methods or properties with this class will
@@ -357,15 +646,17 @@ class StoreField:
 
         Args:
             streamed_write:
-              If the pandas dataframe will be written as a stream
+              If True (or DfFileStreamedWrite to configure rotation) then
+              appends within with context of for_hashable are written to
+              files that are kept open till the context exits instead of new
+              file per append. Note that the rows become visible to readers
+              only after exit. Outside with context appends are as usual.
             partition_cols:
               Pivots the table for efficient grouping of columnar data
             yields:
               The decorated function yields pd.Dataframe instead of return.
-              todo: While yielding generator computes values and we loop over
-                it ... can we parallelize yield ?? such that data-frames are
-                computed and stored in parallel ... check for parallel-io and
-                parallel-compute
+              Note that with `write_pipeline` the yielded tables are written
+              in parallel while generator computes next tables.
             table_schema:
               Schema of the table that will be returned ... if provided we
               will validate it with first write
@@ -374,13 +665,49 @@ class StoreField:
                  else we will use it to validate against the table to be
                  written .... later we can overwrite self._table_schema so
                  that it happens only once
+            file_format:
+              File format (ipc or parquet along with compression options)
+              used to store the table on disk. If None uncompressed ipc is
+              used. Note that this is persisted in DfFile config and can only
+              be changed when there is no data on the disk.
+            compaction_policy:
+              If provided the partition folders written to by every append
+              are checked against this policy and the small files are merged
+              (in background thread if policy says so). Useful when the
+              method is called very often as every call writes new files.
+            write_buffer:
+              Only for `yields=True`. If provided the yielded tables are
+              concatenated and written when buffered rows/bytes reach the
+              thresholds instead of writing file for every yielded table.
+            write_pipeline:
+              Only for `yields=True`. If provided the yielded tables are
+              encoded and written by pool of writer threads while generator
+              computes next tables. Results are exactly same as serial
+              writes.
+            read_cache:
+              If provided the tables read with read (and read_write) mode are
+              cached in memory and same reads are served from cache till
+              DfFile changes. Share the instance across StoreFields to bound
+              their memory together. Check `read_cache.stats` for hits,
+              misses and evictions.
         """
         # ------------------------------------------------------- 01
         # store inside instance
-        self.streamed_write = streamed_write
+        if streamed_write is True:
+            streamed_write = DfFileStreamedWrite()
+        elif streamed_write is False:
+            streamed_write = None
+        self.streamed_write = \
+            streamed_write  # type: t.Optional[DfFileStreamedWrite]
         self.partition_cols = partition_cols
         self.yields = yields
         self.table_schema = table_schema
+        self.file_format = \
+            DfFileFormat() if file_format is None else file_format
+        self.compaction_policy = compaction_policy
+        self.write_buffer = write_buffer
+        self.write_pipeline = write_pipeline
+        self.read_cache = read_cache
 
         # ------------------------------------------------------- 02
         # validate - note that this is decorator so you can afford to do lot
@@ -458,11 +785,33 @@ class StoreField:
         )
 
         # ------------------------------------------------------- 02
+        # get DfFile (under thread lock see `_ON_CALL_LOCK`)
+        with _ON_CALL_LOCK:
+            _df_file = self.get_df_file(for_hashable=for_hashable)
+
+        # ------------------------------------------------------- 03
+        # now process
+        _ret_table = _on_call_ret_tuple.process(
+            for_hashable=for_hashable,
+            store_field=self,
+            df_file=_df_file,
+            **kwargs
+        )
+
+        # ------------------------------------------------------- 04
+        return _ret_table
+
+    def get_df_file(self, for_hashable: m.HashableClass) -> DfFile:
+        """
+        Returns DfFile for for_hashable (which is created along with
+        config if not yet created)
+        """
+        # ------------------------------------------------------- 01
         # get store_fields_folder the Folder that manages all DfFiles for
         # for_hashable
         _folder = for_hashable.store_fields_folder
 
-        # ------------------------------------------------------- 03
+        # ------------------------------------------------------- 02
         # get DfFile
         _item = self.dec_fn_name
         if _item in _folder.items.keys():
@@ -476,26 +825,47 @@ class StoreField:
                 for_hashable=_item, parent_folder=_folder
             )
             # we need to update config for partition_cols and table_schema
-            _c = _df_file.config
-            if _c.schema != self.table_schema:
-                _c.schema = self.table_schema
-            if _c.partition_cols != self.partition_cols:
-                _c.partition_cols = self.partition_cols
+            # note that other processes might be creating same DfFile so
+            # we update config under cross process lock after re-reading
+            # it from disk
+            with _df_file.config_lock():
+                _c = _df_file.config
+                _c.reload()
+                # note that when schema is not provided it is inferred on
+                # first write (maybe by other process) so we do not reset it
+                if self.table_schema is not None and \
+                        _c.schema != self.table_schema:
+                    _c.schema = self.table_schema
+                if _c.partition_cols != self.partition_cols:
+                    _c.partition_cols = self.partition_cols
+                if _c.get_file_format() != self.file_format:
+                    # changing file format is possible only when nothing is
+                    # stored on disk as we never mix formats within DfFile
+                    if not _df_file.is_empty:
+                        e.code.NotAllowed(
+                            msgs=[
+                                f"The file format for StoreField "
+                                f"`{self.dec_fn_name}` has changed while "
+                                f"there is data on the disk.",
+                                {
+                                    "on_disk": _c.get_file_format(),
+                                    "requested": self.file_format,
+                                },
+                                f"Please delete the data before changing file "
+                                f"format."
+                            ]
+                        )
+                    _c.file_format = self.file_format.as_dict()
+                    # internal might be already updated from config in
+                    # DfFile.init so refresh it
+                    if _df_file.internal.is_updated:
+                        _df_file.internal.file_format = self.file_format
             # track using _folder
             # the above instance creation automatically adds to items in _folder
             # _folder.add_item(hashable=_df_file)
 
-        # ------------------------------------------------------- 04
-        # now process
-        _ret_table = _on_call_ret_tuple.process(
-            for_hashable=for_hashable,
-            store_field=self,
-            df_file=_df_file,
-            **kwargs
-        )
-
-        # ------------------------------------------------------- 05
-        return _ret_table
+        # ------------------------------------------------------- 03
+        return _df_file
 
     def validate_on_call_and_get_things(
         self, for_hashable: m.HashableClass,
@@ -608,12 +978,12 @@ class StoreField:
         # Bake expression for filters
         # if something to filter then validate and bake expression
         # Note on validation
-        #  + write and delete related modes only allow filters applied to pivot
-        #    columns
-        #    + delete mode can also work on some or all pivot columns plus it
-        #      can also use other comparisons for group select like <=, >= etc.
-        #    + write related modes require all pivot filters and they should
-        #      be specified via partition column kwargs
+        #  + write related modes only allow filters applied to pivot columns
+        #    + they require all pivot filters and they should be specified
+        #      via partition column kwargs
+        #  + delete mode can work on some or all pivot columns plus it can
+        #    also use other comparisons for group select like <=, >= etc.
+        #    + filters on other columns delete rows (see DfFile.delete_)
         #  + read related modes work on any filters and are not restricted on
         #    pivot only filters
         _filter_expression = None  # type: t.Optional[pds.Expression]
@@ -647,14 +1017,15 @@ class StoreField:
                                 self.partition_cols
                             ]
                         )
-                # Now cook expression from filters ... note that for delete
-                # mode we anyways fix columns to pivot only because of kwarg
-                # _columns_allowed
+                # Now cook expression from filters ... note that for write
+                # modes we fix columns to pivot only because of kwarg
+                # _columns_allowed while delete mode allows any column
                 _filter_expression = bake_expression(
                     _elements=_f_all,
                     _err_msg=f"Filters used for mode {_mode} are not "
                              f"appropriate ....",
-                    _columns_allowed=self.partition_cols,
+                    _columns_allowed=None if _mode is Mode.delete
+                    else self.partition_cols,
                 )
             # --------------------------------------------------- 07.02.02
             # when read related modes i.e. read and exists allow anything
@@ -904,6 +1275,79 @@ class StoreField:
         """
         note that this is decorator so you can afford to do lot  of validations
         """
+        # ------------------------------------------------------- 00
+        # check file_format
+        e.validation.ShouldBeInstanceOf(
+            value=self.file_format, value_types=(DfFileFormat, ),
+            msgs=[
+                f"Please use {DfFileFormat} to supply file_format"
+            ]
+        )
+        if self.compaction_policy is not None:
+            e.validation.ShouldBeInstanceOf(
+                value=self.compaction_policy,
+                value_types=(DfFileCompactionPolicy, ),
+                msgs=[
+                    f"Please use {DfFileCompactionPolicy} to supply "
+                    f"compaction_policy"
+                ]
+            )
+        if self.write_buffer is not None:
+            e.validation.ShouldBeInstanceOf(
+                value=self.write_buffer,
+                value_types=(DfFileWriteBuffer, ),
+                msgs=[
+                    f"Please use {DfFileWriteBuffer} to supply write_buffer"
+                ]
+            )
+            if not self.yields:
+                e.code.NotAllowed(
+                    msgs=[
+                        f"write_buffer can only be used when the decorated "
+                        f"method yields i.e. with `yields=True`"
+                    ]
+                )
+        if self.write_pipeline is not None:
+            e.validation.ShouldBeInstanceOf(
+                value=self.write_pipeline,
+                value_types=(DfFileWritePipeline, ),
+                msgs=[
+                    f"Please use {DfFileWritePipeline} to supply "
+                    f"write_pipeline"
+                ]
+            )
+            if not self.yields:
+                e.code.NotAllowed(
+                    msgs=[
+                        f"write_pipeline can only be used when the decorated "
+                        f"method yields i.e. with `yields=True`"
+                    ]
+                )
+
+        if self.read_cache is not None:
+            e.validation.ShouldBeInstanceOf(
+                value=self.read_cache,
+                value_types=(DfFileReadCache, ),
+                msgs=[
+                    f"Please use {DfFileReadCache} to supply read_cache"
+                ]
+            )
+        if self.streamed_write is not None:
+            e.validation.ShouldBeInstanceOf(
+                value=self.streamed_write,
+                value_types=(DfFileStreamedWrite, ),
+                msgs=[
+                    f"Please use bool or {DfFileStreamedWrite} to supply "
+                    f"streamed_write"
+                ]
+            )
+            if self.write_pipeline is not None:
+                e.code.NotAllowed(
+                    msgs=[
+                        f"write_pipeline cannot be used with streamed_write"
+                    ]
+                )
+
         # ------------------------------------------------------- 01
         # check partition_cols
         if bool(self.partition_cols):
@@ -7,11 +7,13 @@ import typing as t
 import pyarrow as pa
 import numpy as np
 import sys
+import os
 import inspect
 import abc
 import gc
 import types
 import hashlib
+import json
 import datetime
 import pathlib
 import traceback
@@ -438,14 +440,101 @@ class Compare:
     ...
 
 
+class _DirHandle:
+    """
+    Minimal file like wrapper over directory file descriptor used by
+    FileLock.
+    """
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def close(self):
+        os.close(self.fd)
+
+
 class FileLock:
     """
-    todo: Explore filelock to lock the files
-      https://stackoverflow.com/questions/489861/locking-a-file-in-python
-    >>> import filelock
+    Cross process lock that uses a lock file on the disk.
+
+    Uses `fcntl.flock` on posix where both shared (read) and exclusive
+    (write) locks are supported. On windows we use `msvcrt.locking` which
+    only supports exclusive locks so shared locks also become exclusive.
+
+    Note that locks are per open file so two FileLock instances on same path
+    will block each other even within same process or thread. So do not nest
+    them.
+
+    Path can also be an existing directory. On posix the directory itself is
+    locked and no lock file is left behind. Windows cannot lock directories
+    so there a sibling lock file `.<dir_name>.lock` is locked instead.
 
+    >>> with FileLock(path=pathlib.Path("some.lock"), shared=True):
+    ...     ...
+
+    Inspired from
+      https://stackoverflow.com/questions/489861/locking-a-file-in-python
     """
-    ...
+
+    def __init__(self, path: pathlib.Path, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self._file = None
+
+    def __enter__(self) -> "FileLock":
+        if self._file is not None:
+            e.code.CodingError(
+                msgs=[
+                    f"FileLock for {self.path} is already acquired ..."
+                ]
+            )
+        if self.path.is_dir():
+            if sys.platform == "win32":
+                self._file = open(
+                    self.path.parent / f".{self.path.name}.lock", "a+")
+            else:
+                self._file = _DirHandle(os.open(self.path, os.O_RDONLY))
+        else:
+            self._file = open(self.path, "a+")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.01)
+            else:
+                import fcntl
+                fcntl.flock(
+                    self._file.fileno(),
+                    fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+                )
+        except BaseException:
+            self._file.close()
+            self._file = None
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._file is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
 
 
 class StringFmt:
@@ -1866,8 +1955,29 @@ def np_to_lnp(data: np.ndarray) -> t.List:
     return _make_list(_data=data)
 
 
+# field metadata keys used by `np_to_pa_field` to record per row shape and
+# dtype of n-dim arrays stored as nested `pa.FixedSizeListArray`
+NDARRAY_SHAPE_KEY = b"toolcraft.ndarray.shape"
+NDARRAY_DTYPE_KEY = b"toolcraft.ndarray.dtype"
+
+
 def np_to_pa(data: np.ndarray) -> pa.Array:
     """
+    Convert n-dim array to arrow array where first dim is the length of
+    array and remaining dims are nested `pa.FixedSizeListArray` over one
+    flat values buffer.
+
+    For fixed width dtypes the values buffer shares memory with `data` (or
+    with its C-contiguous native byte order copy) so no per element python
+    objects are created. Use `np_to_pa_field` to also record shape and dtype
+    in field metadata.
+
+    Note that arrow has no datetime64/timedelta64 units other than s, ms,
+    us and ns (and days for datetime64 i.e. date32) so other units are cast
+    to seconds (`pa_to_np` restores them from field metadata). Arrays with
+    zero size trailing dims cannot be fixed size lists so they are nested
+    variable size lists like older versions of `np_to_pa` did.
+
     Unit test code
 
     a = np.zeros((2, 3, 4, 5), dtype=np.uint8)
@@ -1876,11 +1986,87 @@ def np_to_pa(data: np.ndarray) -> pa.Array:
     print(a.shape, a.dtype)
     print(_a.shape, _a.dtype)
     """
-    return pa.array(np_to_lnp(data=data))
+    # ---------------------------------------------------- 01
+    # validate
+    if data.ndim == 0:
+        e.code.CodingError(
+            msgs=[
+                f"Expected array with at least one dim but found scalar "
+                f"array {data}"
+            ]
+        )
+
+    # ---------------------------------------------------- 02
+    # make C-contiguous with native byte order ... no copy if already so
+    _data = np.ascontiguousarray(data)
+    if not _data.dtype.isnative:
+        _data = _data.astype(_data.dtype.newbyteorder("="))
+    # cast datetime64/timedelta64 units not supported by arrow to seconds
+    _is_date = False
+    if _data.dtype.kind in "mM":
+        _unit = np.datetime_data(_data.dtype)[0]
+        _is_date = _data.dtype.kind == "M" and _unit == "D"
+        if _unit not in ["s", "ms", "us", "ns"] and not _is_date:
+            _data = _data.astype(f"{_data.dtype.kind}8[s]")
+    _flat = _data.reshape(-1)
+
+    # ---------------------------------------------------- 03
+    # flat values ... wrap buffer for fixed width dtypes (note that arrow
+    # bool is bit packed and date32 is 4 bytes wide so they need a copy)
+    if _flat.dtype.kind in "iufmM" and not _is_date:
+        _values = pa.Array.from_buffers(
+            pa.from_numpy_dtype(_flat.dtype), len(_flat),
+            [None, pa.py_buffer(_flat)],
+        )
+    else:
+        _values = pa.array(_flat)
+
+    # ---------------------------------------------------- 04
+    # fixed size lists cannot have zero size so use nested lists
+    if 0 in _data.shape[1:]:
+        _type = _values.type
+        for _ in _data.shape[1:]:
+            _type = pa.list_(_type)
+        return pa.array(np_to_lnp(data=_data), type=_type)
+
+    # ---------------------------------------------------- 05
+    # nest from inner most dim outwards
+    for _size in reversed(_data.shape[1:]):
+        _values = pa.FixedSizeListArray.from_arrays(_values, _size)
+
+    # ---------------------------------------------------- 06
+    return _values
+
+
+def np_to_pa_field(name: str, data: np.ndarray) -> pa.Field:
+    """
+    Field for column that will hold `np_to_pa(data)` where per row shape and
+    dtype are recorded in metadata so that `pa_to_np` can restore them.
+    """
+    return pa.field(
+        name, np_to_pa(data[:0]).type,
+        metadata={
+            NDARRAY_SHAPE_KEY: json.dumps(list(data.shape[1:])).encode(),
+            NDARRAY_DTYPE_KEY: data.dtype.str.encode(),
+        },
+    )
 
 
-def pa_to_np(data: t.Union[pa.Array, pa.ChunkedArray]) -> np.ndarray:
+def pa_to_np(
+    data: t.Union[pa.Array, pa.ChunkedArray],
+    field: t.Optional[pa.Field] = None,
+) -> np.ndarray:
     """
+    Convert arrow array to n-dim array.
+
+    Nested `pa.FixedSizeListArray` (see `np_to_pa`) are flattened level by
+    level and reshaped, which is zero-copy for fixed width dtypes without
+    nulls and single chunk. Variable size lists (i.e. data stored by older
+    versions of `np_to_pa`) fall back to rebuilding from python objects.
+
+    If `field` with metadata from `np_to_pa_field` is provided the shape is
+    validated and dtype is restored.
+
     Unit test code
 
     a = np.zeros((2, 3, 4, 5), dtype=np.uint8)
@@ -1889,11 +2075,16 @@ def pa_to_np(data: t.Union[pa.Array, pa.ChunkedArray]) -> np.ndarray:
     print(a.shape, a.dtype)
     print(_a.shape, _a.dtype)
     """
-    if isinstance(data, pa.Array):
-        data = data.to_numpy(zero_copy_only=False)
-    elif isinstance(data, pa.ChunkedArray):
-        data = data.to_numpy()
-    else:
+    # ---------------------------------------------------- 01
+    # get one array from chunks
+    if isinstance(data, pa.ChunkedArray):
+        if data.num_chunks == 1:
+            data = data.chunk(0)
+        elif data.num_chunks == 0:
+            data = pa.array([], type=data.type)
+        else:
+            data = pa.concat_arrays(data.chunks)
+    elif not isinstance(data, pa.Array):
         e.code.CodingError(
             msgs=[
                 f"Expected {pa.Array} or {pa.ChunkedArray} but found "
@@ -1901,14 +2092,103 @@ def pa_to_np(data: t.Union[pa.Array, pa.ChunkedArray]) -> np.ndarray:
             ]
         )
 
-    def _make_list(_data):
-        if _data.dtype != object:
-            return _data
-        else:
-            return [_make_list(_) for _ in _data]
+    # ---------------------------------------------------- 02
+    # flatten nested fixed size lists
+    _shape = [len(data)]
+    _values = data
+    while pa.types.is_fixed_size_list(_values.type) and \
+            _values.null_count == 0:
+        _shape.append(_values.type.list_size)
+        _values = _values.flatten()
+
+    # ---------------------------------------------------- 03
+    # convert
+    if pa.types.is_nested(_values.type):
+        # legacy path for variable size lists and lists with nulls
+        def _make_list(_data):
+            if _data.dtype != object:
+                return _data
+            else:
+                return [_make_list(_) for _ in _data]
+
+        # noinspection PyTypeChecker
+        _ret = np.asarray(
+            _make_list(_data=data.to_numpy(zero_copy_only=False))
+        )
+    else:
+        _ret = _values.to_numpy(zero_copy_only=False).reshape(_shape)
+
+    # ---------------------------------------------------- 04
+    # use field metadata if available
+    _metadata = {} if field is None else (field.metadata or {})
+    if NDARRAY_SHAPE_KEY in _metadata:
+        _expected_shape = tuple(json.loads(_metadata[NDARRAY_SHAPE_KEY]))
+        # nested lists with zero size dims lose the dims after them
+        if _ret.size == 0:
+            _ret = _ret.reshape((len(_ret),) + _expected_shape)
+        if _ret.shape[1:] != _expected_shape:
+            e.validation.NotAllowed(
+                msgs=[
+                    f"Field {field.name} expects per row shape "
+                    f"{_expected_shape} but found {_ret.shape[1:]}"
+                ]
+            )
+    if NDARRAY_DTYPE_KEY in _metadata:
+        _dtype = np.dtype(_metadata[NDARRAY_DTYPE_KEY].decode())
+        if _ret.dtype != _dtype:
+            _ret = _ret.astype(_dtype)
+
+    # ---------------------------------------------------- 05
+    return _ret
 
-    # noinspection PyTypeChecker
-    return np.asarray(_make_list(_data=data))
+
+def pa_fixed_size_lists_to_lists(
+    table: pa.Table, schema: pa.Schema
+) -> pa.Table:
+    """
+    Converts columns of table that are nested `pa.FixedSizeListArray` (see
+    `np_to_pa`) to nested variable size lists where schema expects them.
+
+    This is needed for StoreFields whose schema was inferred from tables
+    made by older versions of `np_to_pa` (which made variable size lists)
+    so that new tables can still be appended to them. Other columns are
+    not touched so that any real schema mismatch is still caught later.
+    """
+    def _to_lists(
+        _data: pa.Array, _type: pa.DataType
+    ) -> t.Optional[pa.Array]:
+        if _data.type == _type:
+            return _data
+        if not pa.types.is_fixed_size_list(_data.type) or \
+                not pa.types.is_list(_type) or _data.null_count > 0:
+            return None
+        _values = _to_lists(_data.flatten(), _type.value_type)
+        if _values is None:
+            return None
+        _size = _data.type.list_size
+        _offsets = pa.array(
+            np.arange(0, (len(_data) + 1) * _size, _size, dtype=np.int32)
+        )
+        return pa.ListArray.from_arrays(_offsets, _values)
+
+    if table.schema == schema:
+        return table
+    _columns, _fields = [], []
+    for _field, _column in zip(table.schema, table.columns):
+        if _field.name in schema.names and \
+                pa.types.is_fixed_size_list(_field.type):
+            _schema_field = schema.field(_field.name)
+            _chunks = [
+                _to_lists(_, _schema_field.type) for _ in _column.chunks
+            ]
+            if None not in _chunks:
+                _column = pa.chunked_array(_chunks, type=_schema_field.type)
+                _field = _schema_field
+        _columns.append(_column)
+        _fields.append(_field)
+    return pa.Table.from_arrays(
+        _columns, schema=pa.schema(_fields, metadata=table.schema.metadata)
+    )
 
 
 def one_hot_to_simple_labels(oh_label: pd.Series) -> pd.Series: